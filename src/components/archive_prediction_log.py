@@ -0,0 +1,278 @@
+# Importing packages
+import sys
+import os
+import glob
+import json
+import time
+import uuid
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone, timedelta
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from src.components.config_entity import ArchiveConfig
+from src.components.config_entity import DatabaseConfig
+from src.components.config_entity import DriftAggregatesConfig
+from src.components.drift_aggregates import DriftAggregateStore
+from src.components.database import apply_sqlite_pragmas
+from src.utils import stream_sql_query, format_db_timestamp
+from src.exception import CustomException
+from src.logger import logging
+
+# The schema of the archived rows, one row per request with its prediction
+ARCHIVE_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('Podcast_Name', pa.string()),
+    ('Episode_Length_minutes', pa.float64()),
+    ('Genre', pa.string()),
+    ('Publication_Day', pa.string()),
+    ('Publication_Time', pa.string()),
+    ('created_at', pa.timestamp('us')),
+    ('pred_id', pa.int64()),
+    ('prediction', pa.float64()),
+    ('prediction_created_at', pa.timestamp('us')),
+    ('date', pa.string())
+])
+
+# Creating a class to archive the old part of the prediction log
+class PredictionLogArchiver():
+    '''
+    This class moves the requests older than the retention horizon, with their
+    predictions, out of the SQLite database into zstd-compressed Parquet files
+    partitioned by day. The rows are streamed into the archive first, then deleted from
+    SQLite in small transactions so the web application is never locked out for long,
+    and finally the database file is compacted. A manifest records the write and the
+    deletion that are in progress, so an interrupted run is rolled back or completed by
+    the next one instead of archiving the same rows twice.
+    
+    Only requests which the incremental drift detection has already aggregated, up to its
+    watermark, are archived, since it only reads the live tables. The request with the
+    highest id is always kept, so that SQLite never numbers new requests from the ids of
+    archived ones.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, config:ArchiveConfig=None, db_config:DatabaseConfig=None,
+                 aggregates_config:DriftAggregatesConfig=None):
+        '''
+        This is the constructor for the PredictionLogArchiver class.
+        '''
+        self.config = config or ArchiveConfig()
+        self.db_config = db_config or DatabaseConfig()
+        self.aggregates_config = aggregates_config or DriftAggregatesConfig()
+        self.manifest_path = os.path.join(self.config.archive_dir, '_manifest.json')
+    
+    # Creating a method to read the manifest of the archive
+    def load_manifest(self)->dict:
+        '''
+        This method returns the manifest of the archive, or an empty manifest if the
+        archive has not been written yet.
+        '''
+        if not os.path.exists(self.manifest_path):
+            return {'runs': [], 'pending_write': None, 'pending_delete': None}
+        with open(self.manifest_path, 'r') as file_obj:
+            return dict({'pending_write': None}, **json.load(file_obj))
+    
+    # Creating a method to write the manifest of the archive
+    def save_manifest(self, manifest:dict):
+        '''
+        This method writes the manifest of the archive, replacing the previous one in a
+        single rename.
+        '''
+        os.makedirs(self.config.archive_dir, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as file_obj:
+            json.dump(manifest, file_obj, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+    
+    # Creating a method to open a writable connection to the database
+    def connect(self):
+        '''
+        This method opens a writable connection to the database with the configured
+        connection settings.
+        '''
+        conn = sqlite3.connect(self.db_config.db_path, timeout=self.db_config.busy_timeout_ms / 1000.0)
+        apply_sqlite_pragmas(conn, self.db_config)
+        return conn
+    
+    # Creating a method to remove the files of an interrupted write
+    def remove_partial_write(self, run_id:str)->int:
+        '''
+        This method deletes the Parquet files which a run wrote before it was recorded in
+        the manifest, and returns the number of deleted files.
+        '''
+        file_paths = glob.glob(os.path.join(self.config.archive_dir, '*', f"part-{run_id}-*.parquet"))
+        for file_path in file_paths:
+            os.remove(file_path)
+        return len(file_paths)
+    
+    # Creating a method to stream the rows to archive
+    def read_rows_to_archive(self, cutoff:str, max_id:int):
+        '''
+        This method yields the requests created before the cutoff, up to max_id and
+        except the request with the highest id, joined with their predictions, as Arrow
+        record batches with the archive schema.
+        '''
+        query = (
+            "SELECT d.id, d.Podcast_Name, d.Episode_Length_minutes, d.Genre, d.Publication_Day, "
+            "d.Publication_Time, d.created_at, p.pred_id, p.prediction, p.created_at AS prediction_created_at "
+            "FROM data d LEFT JOIN predictions p ON p.data_id = d.id "
+            "WHERE d.created_at < ? AND d.id <= ? AND d.id < (SELECT MAX(id) FROM data) ORDER BY d.id"
+        )
+        for chunk in stream_sql_query(query, params=(cutoff, max_id), chunk_size=self.config.chunk_size,
+                                      db_path=self.db_config.db_path):
+            if chunk.empty:
+                continue
+            for column in ('created_at', 'prediction_created_at'):
+                chunk[column] = pd.to_datetime(chunk[column], format='ISO8601')
+            chunk['date'] = chunk['created_at'].dt.strftime('%Y-%m-%d')
+            yield pa.RecordBatch.from_pandas(chunk, schema=ARCHIVE_SCHEMA, preserve_index=False)
+    
+    # Creating a method to write the rows to archive into the Parquet files
+    def write_archive(self, cutoff:str, run_id:str, max_id:int)->dict:
+        '''
+        This method streams the rows created before the cutoff, up to max_id, into new
+        Parquet files under one folder per day, and returns the number of rows and the
+        largest request id that were archived.
+        '''
+        stats = {'rows': 0, 'max_id': None}
+        
+        def batches():
+            for batch in self.read_rows_to_archive(cutoff, max_id):
+                stats['rows'] += batch.num_rows
+                stats['max_id'] = max(stats['max_id'] or 0, pc.max(batch.column('id')).as_py())
+                yield batch
+        
+        ds.write_dataset(
+            pa.RecordBatchReader.from_batches(ARCHIVE_SCHEMA, batches()),
+            self.config.archive_dir,
+            format='parquet',
+            partitioning=ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive'),
+            file_options=ds.ParquetFileFormat().make_write_options(compression=self.config.compression),
+            basename_template=f"part-{run_id}-{{i}}.parquet",
+            max_rows_per_file=self.config.max_rows_per_file,
+            max_rows_per_group=min(self.config.max_rows_per_file, 1 << 20),
+            existing_data_behavior='overwrite_or_ignore'
+        )
+        return stats
+    
+    # Creating a method to delete the archived rows from the database
+    def delete_archived_rows(self, cutoff:str, max_id:int)->int:
+        '''
+        This method deletes the archived requests and their predictions from the database
+        in transactions of at most delete_batch_size requests, and returns the number of
+        deleted requests.
+        '''
+        deleted = 0
+        with closing(self.connect()) as conn:
+            while True:
+                with conn:
+                    ids = [row[0] for row in conn.execute(
+                        "SELECT id FROM data WHERE created_at < ? AND id <= ? ORDER BY id LIMIT ?",
+                        (cutoff, max_id, self.config.delete_batch_size)
+                    )]
+                    if not ids:
+                        break
+                    placeholders = ', '.join('?' * len(ids))
+                    conn.execute(f"DELETE FROM predictions WHERE data_id IN ({placeholders})", ids)
+                    conn.execute(f"DELETE FROM data WHERE id IN ({placeholders})", ids)
+                deleted += len(ids)
+        return deleted
+    
+    # Creating a method to compact the database file
+    def compact(self):
+        '''
+        This method checkpoints the write-ahead log and rebuilds the database file, which
+        returns the space of the deleted rows to the file system.
+        '''
+        with closing(self.connect()) as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    
+    # Creating a method to run the archival
+    def archive(self, before=None)->dict:
+        '''
+        This method archives the requests created before the retention horizon, deletes
+        them from the database and compacts the database file.
+        ========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        before : datetime or str - The requests created before this time are archived.
+        Defaults to retention_days before now.
+        
+        ---------------------
+        Returns:
+        ---------------------
+        summary : dict - The cutoff, the number of archived and deleted rows, the drift
+        watermark which bounded the archived ids, the size of the database file before and
+        after, and the duration of the run.
+        ========================================================================================
+        '''
+        try:
+            start = time.perf_counter()
+            if before is None:
+                before = datetime.now(timezone.utc) - timedelta(days=self.config.retention_days)
+            cutoff = format_db_timestamp(before)
+            size_before = os.path.getsize(self.db_config.db_path)
+            manifest = self.load_manifest()
+            deleted = 0
+            
+            # Completing the deletion of a previous run which was interrupted
+            pending = manifest.get('pending_delete')
+            if pending:
+                logging.info(f"Completing the interrupted deletion of the rows archived before {pending['cutoff']}.")
+                deleted += self.delete_archived_rows(pending['cutoff'], pending['max_id'])
+                manifest['pending_delete'] = None
+                self.save_manifest(manifest)
+            
+            # Removing the files of a write which was interrupted before it was recorded
+            pending_write = manifest.get('pending_write')
+            if pending_write:
+                removed = self.remove_partial_write(pending_write['run_id'])
+                logging.info(f"Removed {removed} files of the interrupted archive run {pending_write['run_id']}.")
+                manifest['pending_write'] = None
+                self.save_manifest(manifest)
+            
+            # Archiving only the rows which the incremental drift detection has aggregated
+            watermark = DriftAggregateStore(self.aggregates_config).watermark
+            
+            # Recording the write before it starts, then the rows before deleting them
+            run_id = uuid.uuid4().hex[:12]
+            manifest['pending_write'] = {'run_id': run_id, 'cutoff': cutoff}
+            self.save_manifest(manifest)
+            stats = self.write_archive(cutoff, run_id, watermark)
+            manifest['pending_write'] = None
+            if stats['rows']:
+                manifest['runs'].append({
+                    'run_id': run_id,
+                    'cutoff': cutoff,
+                    'rows': stats['rows'],
+                    'max_id': stats['max_id'],
+                    'created_at': format_db_timestamp(datetime.now(timezone.utc))
+                })
+                manifest['pending_delete'] = {'cutoff': cutoff, 'max_id': stats['max_id']}
+                self.save_manifest(manifest)
+                deleted += self.delete_archived_rows(cutoff, stats['max_id'])
+                manifest['pending_delete'] = None
+            self.save_manifest(manifest)
+            
+            if deleted and self.config.vacuum:
+                self.compact()
+            
+            summary = {
+                'cutoff': cutoff,
+                'archived_rows': stats['rows'],
+                'deleted_rows': deleted,
+                'drift_watermark': watermark,
+                'db_size_before': size_before,
+                'db_size_after': os.path.getsize(self.db_config.db_path),
+                'seconds': time.perf_counter() - start
+            }
+            logging.info(f"Archived the prediction log: {summary}")
+            return summary
+        
+        except Exception as e:
+            raise CustomException(e, sys)
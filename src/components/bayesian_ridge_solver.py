@@ -0,0 +1,307 @@
+# Importing packages
+import numpy as np
+from sklearn.linear_model import BayesianRidge
+
+# The BayesianRidge parameters which only change the evidence maximization loop, with
+# their defaults
+BAYESIAN_RIDGE_LOOP_DEFAULTS = {
+    'max_iter': 300,
+    'tol': 1e-3,
+    'alpha_1': 1e-6,
+    'alpha_2': 1e-6,
+    'lambda_1': 1e-6,
+    'lambda_2': 1e-6,
+    'alpha_init': None,
+    'lambda_init': None
+}
+BAYESIAN_RIDGE_LOOP_PARAMS = tuple(BAYESIAN_RIDGE_LOOP_DEFAULTS)
+
+# The parameters of the loop which only decide when it stops, and the others
+BAYESIAN_RIDGE_STOPPING_PARAMS = ('max_iter', 'tol')
+BAYESIAN_RIDGE_PRIOR_PARAMS = tuple(
+    name for name in BAYESIAN_RIDGE_LOOP_PARAMS if name not in BAYESIAN_RIDGE_STOPPING_PARAMS
+)
+
+# Creating a class to hold the sufficient statistics of a linear regression
+class SufficientStatistics():
+    '''
+    This class holds the sufficient statistics of a linear regression: the number of
+    rows, the means of the features and the target, and the centered cross-products of
+    the features and the target. Statistics of disjoint sets of rows are merged exactly,
+    with the pairwise update of Chan et al., so they can be computed per fold or per chunk
+    of rows and combined without another pass over the data.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, n_features:int):
+        '''
+        This is the constructor for the SufficientStatistics class.
+        '''
+        self.n_features = n_features
+        self.n = 0
+        self.mean = np.zeros(n_features + 1)
+        self.comoment = np.zeros((n_features + 1, n_features + 1))
+    
+    # Creating a method to compute the statistics of a set of rows
+    @classmethod
+    def from_arrays(cls, X, y)->'SufficientStatistics':
+        '''
+        This method computes the statistics of the rows of the feature matrix X and the
+        target vector y.
+        '''
+        Z = np.column_stack([np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.float64)])
+        if not np.isfinite(Z).all():
+            raise ValueError('The features and target must not contain NaN or infinity.')
+        stats = cls(Z.shape[1] - 1)
+        stats.n = Z.shape[0]
+        if stats.n:
+            stats.mean = Z.mean(axis=0)
+            Z -= stats.mean
+            stats.comoment = Z.T @ Z
+        return stats
+    
+    # Creating a method to merge the statistics of other rows into these
+    def merge(self, other:'SufficientStatistics')->'SufficientStatistics':
+        '''
+        This method merges the statistics of a disjoint set of rows into these, and
+        returns them.
+        '''
+        if other.n_features != self.n_features:
+            raise ValueError('Statistics with different numbers of features cannot be merged.')
+        if other.n == 0:
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * (self.n * other.n / n)
+        self.mean = self.mean + delta * (other.n / n)
+        self.n = n
+        return self
+    
+    # Creating a method to update the statistics with more rows
+    def update(self, X, y)->'SufficientStatistics':
+        '''
+        This method adds the rows of the feature matrix X and the target vector y to the
+        statistics, and returns them.
+        '''
+        return self.merge(self.from_arrays(X, y))
+    
+    # Creating a method to combine the statistics of several sets of rows
+    @classmethod
+    def combine(cls, stats_list:list)->'SufficientStatistics':
+        '''
+        This method returns the statistics of the union of disjoint sets of rows.
+        '''
+        combined = cls(stats_list[0].n_features)
+        for stats in stats_list:
+            combined.merge(stats)
+        return combined
+    
+    # Creating properties for the blocks of the centered cross-products
+    @property
+    def x_mean(self)->np.ndarray:
+        '''
+        This property returns the mean of every feature.
+        '''
+        return self.mean[:-1]
+    
+    @property
+    def y_mean(self)->float:
+        '''
+        This property returns the mean of the target.
+        '''
+        return float(self.mean[-1])
+    
+    @property
+    def xtx(self)->np.ndarray:
+        '''
+        This property returns the centered cross-products of the features.
+        '''
+        return self.comoment[:-1, :-1]
+    
+    @property
+    def xty(self)->np.ndarray:
+        '''
+        This property returns the centered cross-products of the features with the
+        target.
+        '''
+        return self.comoment[:-1, -1]
+    
+    @property
+    def yty(self)->float:
+        '''
+        This property returns the centered sum of squares of the target.
+        '''
+        return float(self.comoment[-1, -1])
+    
+    # Creating a method to compute the squared errors of linear models on these rows
+    def sum_squared_errors(self, coef:np.ndarray, intercept:np.ndarray)->np.ndarray:
+        '''
+        This method returns, for every model in the rows of coef and intercept, the sum of
+        the squared errors of its predictions on these rows, computed from the statistics
+        alone.
+        '''
+        coef = np.atleast_2d(coef)
+        residual_mean = self.y_mean - np.atleast_1d(intercept) - coef @ self.x_mean
+        sse = (
+            self.yty
+            - 2.0 * (coef @ self.xty)
+            + np.einsum('ij,jk,ik->i', coef, self.xtx, coef)
+            + self.n * residual_mean ** 2
+        )
+        return np.maximum(sse, 0.0)
+
+
+# Creating a class to fit BayesianRidge models from sufficient statistics
+class BayesianRidgeSolver():
+    '''
+    This class runs the evidence maximization of scikit-learn's BayesianRidge from the
+    sufficient statistics of the training rows. The Gram matrix is decomposed once, after
+    which every iteration of every candidate only costs a few operations per feature, so a
+    whole grid of priors and convergence settings is fitted at the price of a single fit.
+    The updates, convergence check and final coefficients follow BayesianRidge.fit with
+    fit_intercept=True, for training sets with more rows than features.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, stats:SufficientStatistics):
+        '''
+        This is the constructor for the BayesianRidgeSolver class. It decomposes the
+        centered Gram matrix of the training rows.
+        '''
+        if stats.n <= stats.n_features:
+            raise ValueError('The solver needs more rows than features.')
+        self.stats = stats
+        eigen_vals, eigen_vecs = np.linalg.eigh(stats.xtx)
+        self.eigen_vals = np.clip(eigen_vals, 0.0, None)
+        self.eigen_vecs = eigen_vecs
+        self.projected_xty = eigen_vecs.T @ stats.xty
+    
+    # Creating a method to fit a grid of candidates
+    def fit(self, candidates:list)->dict:
+        '''
+        This method fits one BayesianRidge model per candidate. Candidates which only
+        differ in max_iter and tol follow the same sequence of iterations and differ only
+        in where they stop, so the loop runs once per combination of the other parameters,
+        until its strictest candidate stops. Each candidate then takes the iteration at
+        which it would have stopped, and candidates which stop at the same iteration share
+        one model.
+        =========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        candidates : list - The candidates, as dictionaries of BayesianRidge parameters. Missing
+        parameters take their BayesianRidge defaults.
+        
+        ---------------------
+        Returns:
+        ---------------------
+        fitted : dict - The coef, intercept, alpha, lambda and n_iter of every candidate, as
+        arrays with one row per candidate, the index of the distinct model of every candidate
+        in model_index and the number of distinct models in n_models.
+        =========================================================================================
+        '''
+        eps = np.finfo(np.float64).eps
+        n = self.stats.n
+        w = self.eigen_vals
+        b = self.projected_xty
+        
+        # Grouping the candidates which only differ in their stopping parameters
+        candidates = [dict(BAYESIAN_RIDGE_LOOP_DEFAULTS, **candidate) for candidate in candidates]
+        group_keys = {}
+        group_index = np.array([
+            group_keys.setdefault(tuple(c[name] for name in BAYESIAN_RIDGE_PRIOR_PARAMS), len(group_keys))
+            for c in candidates
+        ])
+        max_iter = np.array([c['max_iter'] for c in candidates], dtype=np.int64)
+        tol = np.array([c['tol'] for c in candidates], dtype=np.float64)
+        groups = [dict(zip(BAYESIAN_RIDGE_PRIOR_PARAMS, key)) for key in group_keys]
+        
+        def column(name):
+            values = [group[name] for group in groups]
+            return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        
+        alpha_1, alpha_2 = column('alpha_1'), column('alpha_2')
+        lambda_1, lambda_2 = column('lambda_1'), column('lambda_2')
+        alpha_, lambda_ = column('alpha_init'), column('lambda_init')
+        alpha_ = np.where(np.isnan(alpha_), 1.0 / (self.stats.yty / n + eps), alpha_)
+        lambda_ = np.where(np.isnan(lambda_), 1.0, lambda_)
+        group_max_iter = np.zeros(len(groups), dtype=np.int64)
+        np.maximum.at(group_max_iter, group_index, max_iter)
+        group_min_tol = np.full(len(groups), np.inf)
+        np.minimum.at(group_min_tol, group_index, tol)
+        
+        # Computing the posterior mean in the eigenbasis and the residual sum of squares
+        def update_coef(alpha_, lambda_):
+            u = b / (w + (lambda_ / alpha_)[:, None])
+            rmse_ = self.stats.yty - 2.0 * (u @ b) + (u ** 2) @ w
+            return u, np.maximum(rmse_, 0.0)
+        
+        # Running the loop of every group, recording the updated alpha and lambda and the
+        # change of the coefficients at every iteration
+        n_steps = int(group_max_iter.max())
+        alpha_history = np.empty((len(groups), n_steps))
+        lambda_history = np.empty((len(groups), n_steps))
+        change_history = np.full((len(groups), n_steps), np.inf)
+        active = np.arange(len(groups))
+        coef_old = None
+        iter_ = 0
+        while active.size:
+            u, rmse_ = update_coef(alpha_[active], lambda_[active])
+            coef = u @ self.eigen_vecs.T
+            a, l = alpha_[active], lambda_[active]
+            gamma_ = np.sum((a[:, None] * w) / (l[:, None] + a[:, None] * w), axis=1)
+            lambda_[active] = (gamma_ + 2 * lambda_1[active]) / (np.sum(u ** 2, axis=1) + 2 * lambda_2[active])
+            alpha_[active] = (n - gamma_ + 2 * alpha_1[active]) / (rmse_ + 2 * alpha_2[active])
+            alpha_history[active, iter_] = alpha_[active]
+            lambda_history[active, iter_] = lambda_[active]
+            
+            # Stopping the groups whose every candidate converged or reached its max_iter
+            done = iter_ + 1 >= group_max_iter[active]
+            if coef_old is not None:
+                change_history[active, iter_] = np.sum(np.abs(coef_old - coef), axis=1)
+                done |= change_history[active, iter_] < group_min_tol[active]
+            active, coef_old = active[~done], coef[~done]
+            iter_ += 1
+        
+        # Finding the iteration at which every candidate stops, and its distinct model
+        converged = change_history[group_index] < tol[:, None]
+        first_converged = np.where(converged.any(axis=1), converged.argmax(axis=1), n_steps)
+        stop = np.minimum(first_converged, max_iter - 1)
+        models, model_index = np.unique(group_index * n_steps + stop, return_inverse=True)
+        model_group, model_stop = models // n_steps, models % n_steps
+        
+        alpha_ = alpha_history[model_group, model_stop]
+        lambda_ = lambda_history[model_group, model_stop]
+        u, _ = update_coef(alpha_, lambda_)
+        coef = u @ self.eigen_vecs.T
+        return {
+            'coef': coef[model_index],
+            'intercept': (self.stats.y_mean - coef @ self.stats.x_mean)[model_index],
+            'alpha': alpha_[model_index],
+            'lambda': lambda_[model_index],
+            'n_iter': stop + 1,
+            'model_index': model_index,
+            'n_models': len(models)
+        }
+    
+    # Creating a method to build a fitted BayesianRidge model
+    def create_estimator(self, params:dict=None, feature_names:list=None)->BayesianRidge:
+        '''
+        This method fits one candidate and returns it as a BayesianRidge model with the
+        same fitted attributes as BayesianRidge.fit on the rows behind the statistics, so
+        it predicts, serializes and logs like any fitted model.
+        '''
+        params = params or {}
+        fitted = self.fit([{name: params[name] for name in BAYESIAN_RIDGE_LOOP_PARAMS if name in params}])
+        model = BayesianRidge(**params)
+        alpha_, lambda_ = fitted['alpha'][0], fitted['lambda'][0]
+        model.coef_ = fitted['coef'][0]
+        model.intercept_ = float(fitted['intercept'][0])
+        model.alpha_ = alpha_
+        model.lambda_ = lambda_
+        model.n_iter_ = int(fitted['n_iter'][0])
+        model.sigma_ = (1.0 / alpha_) * ((self.eigen_vecs / (self.eigen_vals + lambda_ / alpha_)) @ self.eigen_vecs.T)
+        model.X_offset_ = self.stats.x_mean.copy()
+        model.X_scale_ = np.ones(self.stats.n_features)
+        model.n_features_in_ = self.stats.n_features
+        if feature_names is not None:
+            model.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        return model
@@ -0,0 +1,204 @@
+# Importing packages
+import sys
+import time
+import queue
+import atexit
+import threading
+from concurrent.futures import Future
+import pandas as pd
+from src.components.config_entity import CoalescerConfig
+from src.components.make_predictions import MakePredictions
+from src.exception import CustomException
+from src.logger import logging
+
+# Creating a class to coalesce concurrent prediction requests into batches
+class PredictionCoalescer():
+    '''
+    This class groups prediction requests that arrive within a short window into one
+    vectorized call of MakePredictions.make_batch_predictions and hands every caller its
+    own rows of the result. When only one request is in flight it is scored immediately,
+    so the window is only paid when there are other requests to share the batch with.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, config:CoalescerConfig=None, predictor:MakePredictions=None):
+        '''
+        This is the constructor for the PredictionCoalescer class.
+        '''
+        self.config = config or CoalescerConfig()
+        self.predictor = predictor or MakePredictions()
+        self.queue = queue.Queue(maxsize=self.config.max_queue_size)
+        self._stop_event = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._thread = None
+        self._exit_registered = False
+        self._in_flight = 0
+        self.requests = 0
+        self.batches = 0
+        self.rows = 0
+        self.max_batch_rows_seen = 0
+        self.fallbacks = 0
+    
+    # Creating a method to start the background worker
+    def start(self):
+        '''
+        This method starts the background worker thread that runs the batches.
+        '''
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='prediction-coalescer', daemon=True)
+        self._thread.start()
+        if not self._exit_registered:
+            atexit.register(self.stop)
+            self._exit_registered = True
+    
+    # Creating a method to submit a prediction request
+    def submit(self, features:pd.DataFrame)->Future:
+        '''
+        This method queues a prediction request and returns a future which resolves to
+        the predictions for its rows.
+        =========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        features : pandas dataframe - This is the feature data of the request.
+        
+        ---------------------
+        Returns:
+        ---------------------
+        future : Future - Resolves to a numpy array with one prediction per row.
+        =========================================================================================
+        '''
+        future = Future()
+        
+        # Scoring the request directly when the worker is not running
+        if self._thread is None or self._stop_event.is_set():
+            try:
+                future.set_result(self.predictor.make_batch_predictions(features))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        
+        with self._stats_lock:
+            self._in_flight += 1
+            self.requests += 1
+        try:
+            self.queue.put_nowait((features, future))
+        except queue.Full:
+            with self._stats_lock:
+                self._in_flight -= 1
+            future.set_exception(RuntimeError('The prediction coalescer queue is full.'))
+        return future
+    
+    # Creating a method to make a prediction through the coalescer
+    def predict(self, features:pd.DataFrame)->float:
+        '''
+        This method makes the prediction for a single-row request and waits for the result.
+        It returns the same value as MakePredictions.make_predictions.
+        '''
+        try:
+            return float(self.submit(features).result()[0])
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to collect the next batch of requests
+    def _next_batch(self)->list:
+        '''
+        This method waits for a request and then keeps collecting requests until the window
+        has passed, the batch holds max_batch_rows rows or no other request is in flight.
+        '''
+        try:
+            first = self.queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        n_rows = len(first[0])
+        deadline = time.monotonic() + self.config.window_ms / 1000.0
+        while n_rows < self.config.max_batch_rows:
+            with self._stats_lock:
+                others_waiting = self._in_flight > len(batch)
+            if not others_waiting:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            n_rows += len(item[0])
+        return batch
+    
+    # Creating a method to run a batch of requests
+    def _run_batch(self, batch:list):
+        '''
+        This method scores a batch of requests in one call and resolves their futures. If
+        the batch fails, every request is scored on its own so that one bad request does
+        not fail the others.
+        '''
+        try:
+            features = pd.concat([item[0] for item in batch], ignore_index=True)
+            preds = self.predictor.make_batch_predictions(features)
+            offset = 0
+            for item_features, future in batch:
+                future.set_result(preds[offset:offset + len(item_features)])
+                offset += len(item_features)
+            with self._stats_lock:
+                self.batches += 1
+                self.rows += len(features)
+                self.max_batch_rows_seen = max(self.max_batch_rows_seen, len(features))
+        
+        except Exception as e:
+            logging.warning(f"A coalesced batch of {len(batch)} requests failed, scoring them one by one: {e}")
+            with self._stats_lock:
+                self.fallbacks += 1
+            for item_features, future in batch:
+                if future.done():
+                    continue
+                try:
+                    future.set_result(self.predictor.make_batch_predictions(item_features))
+                except Exception as item_error:
+                    future.set_exception(item_error)
+        
+        finally:
+            with self._stats_lock:
+                self._in_flight -= len(batch)
+    
+    # Creating the loop of the background worker
+    def _run(self):
+        '''
+        This method is the loop of the background worker thread.
+        '''
+        while not (self._stop_event.is_set() and self.queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._run_batch(batch)
+    
+    # Creating a method to stop the background worker
+    def stop(self):
+        '''
+        This method stops the background worker after the queued requests are scored.
+        '''
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(5.0)
+        self._thread = None
+    
+    # Creating a method to report the coalescer metrics
+    def stats(self)->dict:
+        '''
+        This method returns the request, batch and row counters of the coalescer.
+        '''
+        with self._stats_lock:
+            return {
+                'requests': self.requests,
+                'batches': self.batches,
+                'rows': self.rows,
+                'mean_batch_rows': self.rows / self.batches if self.batches else 0.0,
+                'max_batch_rows': self.max_batch_rows_seen,
+                'fallbacks': self.fallbacks,
+                'queue_depth': self.queue.qsize()
+            }
@@ -0,0 +1,358 @@
+# Importing packages
+import sys
+import json
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import StandardScaler
+from feature_engine.encoding import DecisionTreeEncoder
+from src.exception import CustomException
+from src.logger import logging
+
+# Creating a class to hold the compiled form of the preprocessor and linear model
+class CompiledLinearModel():
+    '''
+    This class holds the preprocessor object and a linear model folded into an intercept,
+    one slope per numerical feature and one lookup table per categorical feature. Each
+    lookup table maps a category directly to its contribution to the prediction, so a
+    prediction is a handful of additions instead of a ColumnTransformer and pyfunc call.
+    '''
+    # Creating the constructor for the class
+    def __init__(
+        self,
+        intercept:float,
+        num_cols:list,
+        num_slopes:np.ndarray,
+        num_fill_values:np.ndarray,
+        cat_cols:list,
+        cat_tables:dict,
+        cat_unseen:dict
+        ):
+        '''
+        This is the constructor for the CompiledLinearModel class.
+        ========================================================================================
+        -----------------------
+        Parameters:
+        -----------------------
+        intercept : float - The model intercept with every constant offset folded into it.
+        num_cols : list - The numerical columns, in the order of num_slopes.
+        num_slopes : numpy array - The contribution of one unit of each numerical feature.
+        num_fill_values : numpy array - The imputation value of each numerical feature.
+        cat_cols : list - The categorical columns, in the order of the lookup tables.
+        cat_tables : dict - For every categorical column, a dict from category to contribution.
+        cat_unseen : dict - For every categorical column, the contribution of an unseen
+        category, or None if unseen categories are rejected like the full pipeline does.
+        ========================================================================================
+        '''
+        self.intercept = float(intercept)
+        self.num_cols = list(num_cols)
+        self.num_slopes = np.asarray(num_slopes, dtype=float)
+        self.num_fill_values = np.asarray(num_fill_values, dtype=float)
+        self.cat_cols = list(cat_cols)
+        self.cat_tables = cat_tables
+        self.cat_unseen = cat_unseen
+        self._num_items = list(zip(self.num_cols, self.num_slopes.tolist(), self.num_fill_values.tolist()))
+    
+    # Creating a method to build the derived features the preprocessor expects
+    def _derive_features(self, features:pd.DataFrame)->pd.DataFrame:
+        '''
+        This method adds the Pub_Day_Time feature in the same way as
+        TransformData.generate_features, without modifying the input dataframe.
+        '''
+        if 'Pub_Day_Time' in self.cat_cols and 'Pub_Day_Time' not in features.columns:
+            features = features.assign(
+                Pub_Day_Time=features['Publication_Day'] + '_' + features['Publication_Time']
+            )
+        return features
+    
+    # Creating a method to make predictions for a dataframe of episodes
+    def predict(self, features:pd.DataFrame)->np.ndarray:
+        '''
+        This method makes predictions for every row of the dataframe. The dataframe can
+        contain either the raw features or the output of TransformData.generate_features.
+        ========================================================================================
+        -----------------------
+        Parameters:
+        -----------------------
+        features : pandas dataframe - The feature data, with one row per episode.
+        
+        -----------------------
+        Returns:
+        -----------------------
+        preds : numpy array - The unrounded predictions.
+        ========================================================================================
+        '''
+        try:
+            features = self._derive_features(features)
+            preds = np.full(len(features), self.intercept, dtype=float)
+            
+            # Adding the numerical contributions
+            num_values = features[self.num_cols].to_numpy(dtype=float)
+            num_values = np.where(np.isnan(num_values), self.num_fill_values, num_values)
+            preds += num_values @ self.num_slopes
+            
+            # Adding the categorical contributions from the lookup tables
+            for col in self.cat_cols:
+                contributions = features[col].map(self.cat_tables[col]).to_numpy(dtype=float)
+                missing = np.isnan(contributions)
+                if missing.any():
+                    if self.cat_unseen[col] is None:
+                        unseen = features[col][missing].unique().tolist()
+                        raise ValueError(f"Unseen categories {unseen} in {col}.")
+                    contributions[missing] = self.cat_unseen[col]
+                preds += contributions
+            
+            return preds
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to make a prediction for a single episode
+    def predict_record(self, record:dict)->float:
+        '''
+        This method makes a prediction for a single episode given as a dictionary of raw
+        features. It uses plain Python lookups, so a single prediction takes microseconds.
+        ========================================================================================
+        -----------------------
+        Parameters:
+        -----------------------
+        record : dict - The raw features of one episode.
+        
+        -----------------------
+        Returns:
+        -----------------------
+        pred : float - The unrounded prediction.
+        ========================================================================================
+        '''
+        try:
+            if 'Pub_Day_Time' in self.cat_cols and 'Pub_Day_Time' not in record:
+                record = dict(record, Pub_Day_Time=f"{record['Publication_Day']}_{record['Publication_Time']}")
+            
+            pred = self.intercept
+            for col, slope, fill_value in self._num_items:
+                value = record.get(col)
+                value = fill_value if value is None or value != value else float(value)
+                pred += slope * value
+            for col in self.cat_cols:
+                contribution = self.cat_tables[col].get(record[col], self.cat_unseen[col])
+                if contribution is None:
+                    raise ValueError(f"Unseen category {record[col]} in {col}.")
+                pred += contribution
+            
+            return float(pred)
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to convert the compiled model into a dictionary
+    def to_dict(self)->dict:
+        '''
+        This method returns the compiled model as a JSON-serializable dictionary.
+        '''
+        return {
+            'intercept': self.intercept,
+            'num_cols': self.num_cols,
+            'num_slopes': self.num_slopes.tolist(),
+            'num_fill_values': self.num_fill_values.tolist(),
+            'cat_cols': self.cat_cols,
+            'cat_tables': self.cat_tables,
+            'cat_unseen': self.cat_unseen
+        }
+    
+    # Creating a method to save the compiled model
+    def save(self, file_path:str):
+        '''
+        This method saves the compiled model as a JSON file.
+        '''
+        try:
+            with open(file_path, 'w') as file_obj:
+                json.dump(self.to_dict(), file_obj)
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to load a compiled model
+    @classmethod
+    def load(cls, file_path:str):
+        '''
+        This method loads a compiled model from a JSON file written by the save method.
+        '''
+        try:
+            with open(file_path, 'r') as file_obj:
+                return cls(**json.load(file_obj))
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+# Creating a class to compile the preprocessor and a linear model
+class CompileLinearModel():
+    '''
+    This class folds the fitted preprocessor object (a SimpleImputer and StandardScaler for
+    the numerical features and a DecisionTreeEncoder and StandardScaler for the categorical
+    features) and a fitted linear model, such as BayesianRidge, into a CompiledLinearModel.
+    The compiled model is verified against the full pipeline before it is returned.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, tolerance:float=1e-6):
+        '''
+        This is the constructor for the CompileLinearModel class. The tolerance is the
+        largest absolute difference allowed between the compiled and the full pipeline.
+        '''
+        self.tolerance = tolerance
+    
+    # Creating a method to fetch the scaling of a fitted StandardScaler
+    def _scaler_params(self, scaler:StandardScaler, n_features:int):
+        '''
+        This method returns the mean and scale applied by a fitted StandardScaler.
+        '''
+        mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+        return np.asarray(mean, dtype=float), np.asarray(scale, dtype=float)
+    
+    # Creating a method to compile the preprocessor and model
+    def compile_model(self, preprocessor_obj:ColumnTransformer, model)->CompiledLinearModel:
+        '''
+        This method compiles the preprocessor object and the linear model. A ValueError is
+        raised if either of them does not have the supported structure.
+        ========================================================================================
+        -----------------------
+        Parameters:
+        -----------------------
+        preprocessor_obj : scikit-learn ColumnTransformer - The fitted preprocessor object.
+        model : scikit-learn linear model - The fitted model with coef_ and intercept_.
+        
+        -----------------------
+        Returns:
+        -----------------------
+        compiled_model : CompiledLinearModel - The compiled model.
+        ========================================================================================
+        '''
+        try:
+            logging.info('Compiling the preprocessor object and the model.')
+            
+            coef = np.asarray(getattr(model, 'coef_', None), dtype=float)
+            if coef.ndim != 1 or not hasattr(model, 'intercept_'):
+                raise ValueError(f"{type(model).__name__} is not a single-output linear model.")
+            intercept = float(model.intercept_)
+            
+            # Mapping every output column of the preprocessor to its model coefficient
+            output_names = list(preprocessor_obj.get_feature_names_out())
+            if hasattr(model, 'feature_names_in_') and list(model.feature_names_in_) != output_names:
+                raise ValueError('The model was not fitted on the output of the preprocessor object.')
+            if len(output_names) != coef.shape[0]:
+                raise ValueError('The model and preprocessor object have a different number of features.')
+            output_coef = dict(zip(output_names, coef))
+            
+            num_cols, num_slopes, num_fill_values = [], [], []
+            cat_cols, cat_tables, cat_unseen = [], {}, {}
+            
+            for name, pipeline, cols in preprocessor_obj.transformers_:
+                if name == 'remainder':
+                    if pipeline != 'drop' and len(cols) > 0:
+                        raise ValueError('Remainder columns are not supported.')
+                    continue
+                steps = [step for _, step in pipeline.steps]
+                col_coef = np.array([output_coef[f'{name}__{col}'] for col in cols])
+                
+                # Numerical pipeline: impute, then scale
+                if len(steps) == 2 and isinstance(steps[0], SimpleImputer) and isinstance(steps[1], StandardScaler):
+                    mean, scale = self._scaler_params(steps[1], len(cols))
+                    slopes = col_coef / scale
+                    intercept -= float(np.sum(slopes * mean))
+                    num_cols.extend(cols)
+                    num_slopes.extend(slopes.tolist())
+                    num_fill_values.extend(np.asarray(steps[0].statistics_, dtype=float).tolist())
+                
+                # Categorical pipeline: decision tree encoding, then scale
+                elif len(steps) == 2 and isinstance(steps[0], DecisionTreeEncoder) and isinstance(steps[1], StandardScaler):
+                    encoder = steps[0]
+                    mean, scale = self._scaler_params(steps[1], len(cols))
+                    for i, col in enumerate(cols):
+                        slope = col_coef[i] / scale[i]
+                        cat_cols.append(col)
+                        cat_tables[col] = {
+                            str(category): float(slope * (value - mean[i]))
+                            for category, value in encoder.encoder_dict_[col].items()
+                        }
+                        if encoder.unseen == 'encode':
+                            cat_unseen[col] = float(slope * (encoder.fill_value - mean[i]))
+                        else:
+                            cat_unseen[col] = None
+                
+                else:
+                    raise ValueError(f"The {name} transformer has an unsupported structure.")
+            
+            compiled_model = CompiledLinearModel(
+                intercept=intercept,
+                num_cols=num_cols,
+                num_slopes=np.array(num_slopes),
+                num_fill_values=np.array(num_fill_values),
+                cat_cols=cat_cols,
+                cat_tables=cat_tables,
+                cat_unseen=cat_unseen
+            )
+            
+            logging.info('Successfully compiled the preprocessor object and the model.')
+            
+            return compiled_model
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to build a dataframe that exercises every lookup table entry
+    def create_probe_data(self, compiled_model:CompiledLinearModel)->pd.DataFrame:
+        '''
+        This method builds a dataframe in which every known category of every categorical
+        feature appears at least once, together with a spread of numerical values including
+        a missing value.
+        '''
+        n_rows = max([len(table) for table in compiled_model.cat_tables.values()] + [8])
+        rng = np.random.default_rng(42)
+        data = {}
+        for col, fill_value in zip(compiled_model.num_cols, compiled_model.num_fill_values):
+            values = rng.uniform(0.0, 2.0 * max(abs(fill_value), 1.0), n_rows)
+            values[0] = np.nan
+            data[col] = values
+        for col in compiled_model.cat_cols:
+            categories = list(compiled_model.cat_tables[col])
+            data[col] = [categories[i % len(categories)] for i in range(n_rows)]
+        return pd.DataFrame(data)
+    
+    # Creating a method to verify the compiled model against the full pipeline
+    def verify_compiled_model(self, compiled_model:CompiledLinearModel, preprocessor_obj:ColumnTransformer, model, features:pd.DataFrame=None)->float:
+        '''
+        This method compares the compiled model with the full pipeline and raises a
+        ValueError if any prediction differs by more than the tolerance.
+        ========================================================================================
+        -----------------------
+        Parameters:
+        -----------------------
+        compiled_model : CompiledLinearModel - The compiled model.
+        preprocessor_obj : scikit-learn ColumnTransformer - The fitted preprocessor object.
+        model : scikit-learn linear model - The fitted model.
+        features : pandas dataframe - The features to compare on, in the layout produced by
+        TransformData.generate_features. Defaults to the probe data.
+        
+        -----------------------
+        Returns:
+        -----------------------
+        max_difference : float - The largest absolute difference between the predictions.
+        ========================================================================================
+        '''
+        try:
+            if features is None:
+                features = self.create_probe_data(compiled_model)
+            features = features[list(preprocessor_obj.feature_names_in_)]
+            expected = np.asarray(model.predict(preprocessor_obj.transform(features)), dtype=float).reshape(-1)
+            actual = compiled_model.predict(features)
+            max_difference = float(np.max(np.abs(expected - actual)))
+            if not max_difference <= self.tolerance:
+                raise ValueError(
+                    f"The compiled model differs from the full pipeline by {max_difference}."
+                )
+            return max_difference
+        
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -1,7 +1,7 @@
 # Importing packages
 import os
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 # Creating a class to store the configuration for the data ingestion
 @dataclass
@@ -12,6 +12,7 @@ class DataIngestionConfig():
     '''
     train_data_path : str = os.path.join('artifacts', 'train_data.parquet')
     test_data_path : str = os.path.join('artifacts', 'test_data.parquet')
+    reference_profile_path : str = os.path.join('artifacts', 'reference_profile.json')
     raw_data_path : str = 'https://github.com/abbeymaj80/my-ml-datasets/raw/refs/heads/master/project_datasets/podcast/podcast_train.parquet'
     
 
@@ -33,6 +34,7 @@ class CreateFeatureStoreConfig():
     '''
     xform_train_data : str = os.path.join('feature_store', 'xform_train_data.parquet')
     xform_test_data : str = os.path.join('feature_store', 'xform_test_data.parquet')
+    row_group_size : int = 100000
 
 
 # Creating a class to store the model
@@ -42,6 +44,52 @@ class ModelTrainerConfig():
     This class defines the path to artifact folder where the model is stored.
     '''
     model_path : str = os.path.join('artifacts', 'model.joblib')
+
+# Creating a class to store the configuration for the out-of-core training
+@dataclass
+class OutOfCoreTrainingConfig():
+    '''
+    This class stores the configuration for the out-of-core training, which streams the
+    feature store in batches of batch_size rows instead of loading it. The model is
+    searched and fitted from the sufficient statistics of the batches and the test RMSE is
+    accumulated batch by batch, so the memory used does not grow with the dataset.
+    Setting PODCAST_OUT_OF_CORE=1 enables it in the training pipeline.
+    '''
+    enabled : bool = field(
+        default_factory=lambda: os.environ.get('PODCAST_OUT_OF_CORE', '0').lower() in ('1', 'true', 'yes')
+    )
+    batch_size : int = 100000
+    target_column : str = 'Listening_Time_minutes'
+
+# Creating a class to store the configuration for the hyperparameter search
+@dataclass
+class ModelSearchConfig():
+    '''
+    This class stores the configuration for the hyperparameter search. The strategy is
+    'halving' (successive halving over the whole grid), 'random' (n_candidates sampled
+    from the grid) or 'bayesian' (sequential model-based optimization of up to
+    n_candidates, starting from n_initial random ones). The search stops once max_seconds have passed or
+    max_fits candidate fits on a fold were spent, whichever comes first; None leaves that
+    budget unbounded. PODCAST_SEARCH_STRATEGY and PODCAST_SEARCH_MAX_SECONDS set the
+    strategy and time budget of the training pipeline. With fold_preprocessing, the
+    preprocessor is fitted inside every cross-validation fold, so the scores do not leak;
+    the transformed folds are cached in memory, and on disk across runs when
+    preprocessing_cache_dir is set.
+    '''
+    strategy : str = field(default_factory=lambda: os.environ.get('PODCAST_SEARCH_STRATEGY', 'halving'))
+    max_seconds : float = field(
+        default_factory=lambda: float(os.environ['PODCAST_SEARCH_MAX_SECONDS'])
+        if os.environ.get('PODCAST_SEARCH_MAX_SECONDS') else None
+    )
+    max_fits : int = None
+    n_candidates : int = 20
+    n_initial : int = 5
+    halving_factor : int = 3
+    n_jobs : int = -1
+    verbose : int = 0
+    random_state : int = 42
+    fold_preprocessing : bool = True
+    preprocessing_cache_dir : str = None
     
 # Creating a class to store the mlflow model uri path
 @dataclass
@@ -55,9 +103,19 @@ class ModelURIConfig():
 @dataclass
 class DatabaseConfig():
     '''
-    This class stores the path to the SQLite database.
+    This class stores the path to the SQLite database and the settings applied to
+    every connection. WAL journaling lets the analytics readers run alongside the
+    writer, and the read-only pool keeps a few connections open for reuse. A reader
+    waits at most read_pool_timeout seconds for a pooled connection.
     '''
     db_path : str = os.path.join('db', 'podcast.db')
+    journal_mode : str = 'WAL'
+    synchronous : str = 'NORMAL'
+    cache_size_kib : int = 65536
+    mmap_size : int = 268435456
+    busy_timeout_ms : int = 5000
+    read_pool_size : int = 4
+    read_pool_timeout : float = 30.0
 
 # Creating a class to store the path to the drift detection report
 @dataclass
@@ -67,4 +125,277 @@ class DriftDetectorConfig():
     '''
     current_date = datetime.now().strftime('%Y_%m_%d')
     report_name = current_date + '_drift_report.html'
-    report_path : str = os.path.join('reports', report_name)
\ No newline at end of file
+    report_path : str = os.path.join('reports', report_name)
+
+# Creating a class to store the configuration for the in-process model store
+@dataclass
+class ModelStoreConfig():
+    '''
+    This class stores the configuration for the process-wide model store, which
+    caches the preprocessor object and the latest model. Batches of at most
+    compiled_record_max_rows rows are scored record by record with the compiled model,
+    larger ones in one vectorized pass.
+    '''
+    run_config_dir : str = 'run_config'
+    reload_check_interval : float = 5.0
+    use_compiled_model : bool = True
+    compiled_model_tolerance : float = 1e-6
+    compiled_record_max_rows : int = 32
+
+# Creating a class to store the configuration for the batch prediction api
+@dataclass
+class BatchPredictionConfig():
+    '''
+    This class stores the configuration for the batch prediction api.
+    '''
+    max_batch_size : int = 5000
+    feature_columns : tuple = (
+        'Podcast_Name',
+        'Episode_Length_minutes',
+        'Genre',
+        'Publication_Day',
+        'Publication_Time'
+    )
+
+
+# Creating a class to store the configuration for the local model cache
+@dataclass
+class ModelCacheConfig():
+    '''
+    This class stores the path to the local model cache and the tracking settings used
+    to fill it. Setting PODCAST_OFFLINE=1 stops the cache from contacting DagsHub, and
+    PODCAST_MLFLOW_TRACKING_URI can point to a file-based MLflow store instead.
+    '''
+    cache_dir : str = os.path.join('artifacts', 'models')
+    tracking_uri : str = field(
+        default_factory=lambda: os.environ.get('PODCAST_MLFLOW_TRACKING_URI', ModelURIConfig().model_uri)
+    )
+    offline : bool = field(
+        default_factory=lambda: os.environ.get('PODCAST_OFFLINE', '0').lower() in ('1', 'true', 'yes')
+    )
+
+# Creating a class to store the configuration for the prediction cache
+@dataclass
+class PredictionCacheConfig():
+    '''
+    This class stores the configuration for the in-process prediction cache. A ttl of
+    0 keeps the entries until they are evicted or the model changes.
+    '''
+    max_size : int = 10000
+    ttl_seconds : float = 0.0
+
+# Creating a class to store the configuration for the write-behind prediction writer
+@dataclass
+class WriteBehindConfig():
+    '''
+    This class stores the configuration for the write-behind writer, which persists the
+    request and prediction rows from a background thread. Setting
+    PODCAST_WRITE_BEHIND=1 enables it in the web application.
+    '''
+    enabled : bool = field(
+        default_factory=lambda: os.environ.get('PODCAST_WRITE_BEHIND', '0').lower() in ('1', 'true', 'yes')
+    )
+    max_queue_size : int = 10000
+    batch_size : int = 500
+    flush_interval : float = 0.2
+    shutdown_timeout : float = 10.0
+
+# Creating a class to store the configuration for the prediction coalescer
+@dataclass
+class CoalescerConfig():
+    '''
+    This class stores the configuration for the prediction coalescer, which groups
+    concurrent single-row predictions into one vectorized batch. Setting
+    PODCAST_COALESCE_WINDOW_MS to a positive number of milliseconds enables it in the web
+    application.
+    '''
+    window_ms : float = field(
+        default_factory=lambda: float(os.environ.get('PODCAST_COALESCE_WINDOW_MS', '0'))
+    )
+    max_batch_rows : int = 64
+    max_queue_size : int = 10000
+
+# Creating a class to store the configuration for the startup warmup
+@dataclass
+class WarmupConfig():
+    '''
+    This class stores the configuration for the startup warmup, which loads the model and
+    scores a synthetic episode before the web application reports itself as ready.
+    Setting PODCAST_WARMUP=0 disables it.
+    '''
+    enabled : bool = field(
+        default_factory=lambda: os.environ.get('PODCAST_WARMUP', '1').lower() in ('1', 'true', 'yes')
+    )
+    background : bool = True
+    batch_rows : int = 64
+    max_attempts : int = 3
+    retry_interval : float = 5.0
+    sample_episode : dict = field(default_factory=lambda: {
+        'Podcast_Name': 'Tech Talks',
+        'Episode_Length_minutes': 60.0,
+        'Genre': 'Technology',
+        'Publication_Day': 'Monday',
+        'Publication_Time': 'Morning'
+    })
+
+# Creating a class to store the configuration for the stage metrics
+@dataclass
+class MetricsConfig():
+    '''
+    This class stores the configuration for the in-memory stage latency metrics. The
+    quantiles are computed over the most recent window_size samples of every stage.
+    '''
+    namespace : str = 'podcast'
+    window_size : int = 4096
+    quantiles : tuple = (0.5, 0.95, 0.99)
+
+# Creating a class to store the configuration for the incremental drift detection
+@dataclass
+class DriftAggregatesConfig():
+    '''
+    This class stores the configuration for the incremental drift detection. The
+    per-day feature aggregates and the watermark (the last processed data.id) are stored
+    in state_path. The numeric features are binned on fixed edges, given as (low, high,
+    number of bins), with an extra bin on either side for values outside the range.
+    '''
+    state_path : str = os.path.join('artifacts', 'drift_state.json')
+    chunk_size : int = 50000
+    numeric_edges : dict = field(default_factory=lambda: {
+        'Episode_Length_minutes': (0.0, 125.0, 50),
+        'Listening_Time_minutes': (0.0, 125.0, 50)
+    })
+    categorical_columns : tuple = ('Podcast_Name', 'Genre', 'Publication_Day', 'Publication_Time')
+    target_column : str = 'Listening_Time_minutes'
+    psi_threshold : float = 0.2
+    drift_share : float = 0.5
+
+# Creating a class to store the configuration for the native drift engine
+@dataclass
+class NativeDriftConfig():
+    '''
+    This class stores the configuration for the native drift engine. The defaults follow
+    Evidently's DataDriftPreset: statistical tests with a p-value threshold for small
+    references, distances with a fixed threshold for large ones, and dataset drift when
+    half of the input columns drifted.
+    '''
+    numerical_columns : tuple = ('Episode_Length_minutes',)
+    categorical_columns : tuple = ('Podcast_Name', 'Genre', 'Publication_Day', 'Publication_Time')
+    target_column : str = 'Listening_Time_minutes'
+    small_reference_rows : int = 1000
+    p_value_threshold : float = 0.05
+    distance_threshold : float = 0.1
+    drift_share : float = 0.5
+
+# Creating a class to store the configuration for the streaming reader
+@dataclass
+class StreamingReaderConfig():
+    '''
+    This class stores the configuration for the streaming reader of the prediction log,
+    which reads the tables in chunks of chunk_size rows with explicit dtypes: categoricals
+    for the text columns and float32 for the numeric columns.
+    '''
+    chunk_size : int = 50000
+    table_dtypes : dict = field(default_factory=lambda: {
+        'data': {
+            'id': 'int64',
+            'Podcast_Name': 'category',
+            'Episode_Length_minutes': 'float32',
+            'Genre': 'category',
+            'Publication_Day': 'category',
+            'Publication_Time': 'category'
+        },
+        'predictions': {
+            'pred_id': 'int64',
+            'data_id': 'int64',
+            'prediction': 'float32'
+        }
+    })
+    prediction_log_dtypes : dict = field(default_factory=lambda: {
+        'Podcast_Name': 'category',
+        'Episode_Length_minutes': 'float32',
+        'Genre': 'category',
+        'Publication_Day': 'category',
+        'Publication_Time': 'category',
+        'Listening_Time_minutes': 'float32'
+    })
+
+# Creating a class to store the configuration for the drift backfill
+@dataclass
+class DriftBackfillConfig():
+    '''
+    This class stores the configuration for the drift backfill, which computes the drift
+    of every daily, weekly or monthly window of the prediction log in parallel and writes
+    one result per window to output_dir. Without max_workers, one worker per CPU is used.
+    '''
+    output_dir : str = os.path.join('reports', 'backfill')
+    frequency : str = 'monthly'
+    max_workers : int = None
+
+# Creating a class to store the configuration for the drift metrics store
+@dataclass
+class DriftMetricsConfig():
+    '''
+    This class stores the configuration for the drift metrics store, a separate SQLite
+    database to which every drift run appends its per-column statistics, so that
+    dashboards and alerts can query the drift history without regenerating reports.
+    '''
+    db_path : str = os.path.join('db', 'drift_metrics.db')
+    run_config_dir : str = 'run_config'
+
+# Creating a class to store the configuration for the drift sampling
+@dataclass
+class DriftSamplingConfig():
+    '''
+    This class stores the configuration for the sampling of the drift detection data. The
+    reference and the current data each get half of memory_budget_mb, where every row is
+    assumed to cost memory_overhead times its size in the dataframe, since the drift
+    report copies the data while it runs. With time_budget_seconds, the number of rows is
+    also capped at what the drift engine processes at rows_per_second within the budget.
+    The reference is sampled per stratum and the prediction log with a reservoir, both
+    with a fixed seed.
+    '''
+    enabled : bool = True
+    memory_budget_mb : float = 512.0
+    memory_overhead : float = 3.0
+    time_budget_seconds : float = None
+    rows_per_second : float = 1000000.0
+    strata : tuple = ('Genre', 'Publication_Day')
+    seed : int = 42
+    chunk_size : int = 50000
+
+# Creating a class to store the configuration for the prediction log archive
+@dataclass
+class ArchiveConfig():
+    '''
+    This class stores the configuration for the archive of the prediction log. Requests
+    older than retention_days are moved into zstd-compressed Parquet files partitioned by
+    day under archive_dir, deleted from SQLite in batches of delete_batch_size rows and,
+    with vacuum set, the database file is compacted afterwards. The readers of the
+    prediction log union the archive with the live tables.
+    '''
+    archive_dir : str = os.path.join('db', 'archive')
+    retention_days : int = 90
+    delete_batch_size : int = 1000
+    compression : str = 'zstd'
+    chunk_size : int = 50000
+    max_rows_per_file : int = 1000000
+    vacuum : bool = True
+
+# Creating a class to store the configuration for the online drift sketches
+@dataclass
+class DriftSketchConfig():
+    '''
+    This class stores the configuration for the online drift sketches, which the web
+    application updates with every served request. The sketches are kept per time bucket
+    of bucket_seconds for retention_seconds, and every process writes its sketches to its
+    own file in sketch_dir every checkpoint_interval seconds, so that the sketches of all
+    worker processes can be merged. Setting PODCAST_DRIFT_SKETCHES=1 enables them in the
+    web application.
+    '''
+    enabled : bool = field(
+        default_factory=lambda: os.environ.get('PODCAST_DRIFT_SKETCHES', '0').lower() in ('1', 'true', 'yes')
+    )
+    sketch_dir : str = os.path.join('db', 'sketches')
+    bucket_seconds : int = 300
+    retention_seconds : int = 86400
+    checkpoint_interval : float = 30.0
@@ -1,7 +1,9 @@
 # Importing packages
 import sys
+import math
 import pandas as pd
 from src.utils import get_current_time
+from src.components.config_entity import BatchPredictionConfig
 from src.exception import CustomException
 from src.logger import logging
 
@@ -69,4 +71,79 @@ class CreateCustomData():
             return df
         
         except Exception as e:
-            raise CustomException(e, sys)
\ No newline at end of file
+            raise CustomException(e, sys)
+
+# Creating a class to create custom data from a batch of episodes
+class CreateCustomBatchData():
+    '''
+    This class is responsible for converting a batch of episodes, received as a list of
+    dictionaries from the batch prediction api, into a single pandas dataframe. The
+    constructor validates the episodes so that invalid input is rejected before any
+    prediction is made.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, episodes:list):
+        '''
+        This is the constructor for the create custom batch data class. A ValueError
+        is raised if the episodes are not a non-empty list of valid episodes.
+        '''
+        self.batch_config = BatchPredictionConfig()
+        self.feature_columns = list(self.batch_config.feature_columns)
+        
+        if not isinstance(episodes, list) or len(episodes) == 0:
+            raise ValueError("The request body must be a non-empty JSON array of episodes.")
+        
+        if len(episodes) > self.batch_config.max_batch_size:
+            raise ValueError(f"A batch can contain at most {self.batch_config.max_batch_size} episodes.")
+        
+        for position, episode in enumerate(episodes):
+            if not isinstance(episode, dict):
+                raise ValueError(f"Episode {position} must be a JSON object.")
+            missing = [col for col in self.feature_columns if episode.get(col) is None]
+            if missing:
+                raise ValueError(f"Episode {position} is missing {', '.join(missing)}.")
+            try:
+                length = float(episode['Episode_Length_minutes'])
+            except (TypeError, ValueError):
+                raise ValueError(f"Episode {position} has a non-numeric Episode_Length_minutes.")
+            # NaN and infinity would reach the model and could not be returned as valid JSON
+            if not math.isfinite(length):
+                raise ValueError(f"Episode {position} has a non-finite Episode_Length_minutes.")
+        
+        self.episodes = episodes
+    
+    # Creating a method to convert the batch of episodes into a pandas dataframe
+    def create_dataframe(self):
+        '''
+        This method converts the batch of episodes into a single pandas dataframe, with one
+        row per episode, in the same column layout as CreateCustomData.
+        ========================================================================================
+        -----------------------
+        Returns:
+        -----------------------
+        df : pandas dataframe - A pandas dataframe with one row per episode.
+        ========================================================================================
+        '''
+        try:
+            logging.info(f"Creating a dataframe from a batch of {len(self.episodes)} episodes.")
+            
+            # Building the columns of the dataframe in one pass over the episodes
+            data = {
+                col: [episode[col] for episode in self.episodes] for col in self.feature_columns
+            }
+            df = pd.DataFrame(data)
+            df = df.astype({
+                'Podcast_Name': str,
+                'Episode_Length_minutes': float,
+                'Genre': str,
+                'Publication_Day': str,
+                'Publication_Time': str
+            })
+            df.insert(0, 'time', get_current_time())
+            
+            logging.info("Successfully created a dataframe from the batch of episodes.")
+            
+            return df
+        
+        except Exception as e:
+            raise CustomException(e, sys)
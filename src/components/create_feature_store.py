@@ -45,9 +45,13 @@ class CreateFeatureStore():
             dir_name = os.path.dirname(self.feature_store_config.xform_train_data)
             os.makedirs(dir_name, exist_ok=True)
             
-            # Storing the transformed datasets in the feature store
-            train_data.to_parquet(self.feature_store_config.xform_train_data, index=False, compression='gzip')
-            test_data.to_parquet(self.feature_store_config.xform_test_data, index=False, compression='gzip')
+            # Storing the transformed datasets in the feature store, in bounded row groups so
+            # the out-of-core training can stream them
+            row_group_size = self.feature_store_config.row_group_size
+            train_data.to_parquet(self.feature_store_config.xform_train_data, index=False, compression='gzip',
+                                  row_group_size=row_group_size)
+            test_data.to_parquet(self.feature_store_config.xform_test_data, index=False, compression='gzip',
+                                 row_group_size=row_group_size)
             
             logging.info("Feature store created successfully.")
             
@@ -8,6 +8,8 @@ from sklearn.model_selection import train_test_split
 from src.exception import CustomException
 from src.logger import logging
 from src.components.config_entity import DataIngestionConfig
+from src.components.drift_aggregates import ReferenceProfile
+from src.utils import compute_file_digest
 
 # Creating a class to ingest the data
 class DataIngestion():
@@ -67,6 +69,9 @@ class DataIngestion():
             train_data.to_parquet(self.ingestion_config.train_data_path, index=False, compression='gzip')
             test_data.to_parquet(self.ingestion_config.test_data_path, index=False, compression='gzip')
             
+            # Storing the reference profile of the train dataset for drift detection
+            self.create_reference_profile(train_data)
+            
             logging.info('Data ingestion process sucessfully completed.')
             
             return (
@@ -75,4 +80,36 @@ class DataIngestion():
             )
         
         except Exception as e:
-            raise CustomException(e, sys)
\ No newline at end of file
+            raise CustomException(e, sys)
+    
+    # Creating a method to store the reference profile of the train dataset
+    def create_reference_profile(self, train_data:pd.DataFrame)->str:
+        '''
+        This method builds the reference profile of the train dataset, which holds the
+        histograms and category frequencies used by drift detection, tags it with the
+        digest of the stored train dataset and saves it in the artifacts folder.
+        ====================================================================================
+        ---------------
+        Parameters:
+        ---------------
+        train_data : Pandas Dataframe - This is the train dataset.
+        
+        ---------------
+        Returns:
+        ---------------
+        profile path : str - This is the path to the reference profile.
+        ====================================================================================
+        '''
+        try:
+            logging.info('Creating the reference profile of the train dataset.')
+            
+            data_hash = compute_file_digest(self.ingestion_config.train_data_path)
+            profile = ReferenceProfile.create(train_data, data_hash)
+            profile.save(self.ingestion_config.reference_profile_path)
+            
+            logging.info('Reference profile created successfully.')
+            
+            return self.ingestion_config.reference_profile_path
+        
+        except Exception as e:
+            raise CustomException(e, sys)
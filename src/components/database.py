@@ -0,0 +1,234 @@
+# Importing packages
+import sys
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from src.components.config_entity import DatabaseConfig
+from src.exception import CustomException
+from src.logger import logging
+
+# Creating a function to apply the connection settings to a SQLite connection
+def apply_sqlite_pragmas(conn, config:DatabaseConfig=None, read_only:bool=False):
+    '''
+    This function applies the connection settings from DatabaseConfig to a SQLite
+    connection. Writers switch the database to WAL journaling, which lets readers run
+    without blocking the writer; readers are additionally marked as query only.
+    ========================================================================================
+    ---------------------
+    Parameters:
+    ---------------------
+    conn : sqlite3 connection - This is the connection to configure.
+    config : DatabaseConfig - This is the database configuration.
+    read_only : bool - This determines whether the connection is used for reading only.
+    ========================================================================================
+    '''
+    config = config or DatabaseConfig()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {int(config.busy_timeout_ms)}")
+        if not read_only:
+            cursor.execute(f"PRAGMA journal_mode = {config.journal_mode}")
+        cursor.execute(f"PRAGMA synchronous = {config.synchronous}")
+        cursor.execute(f"PRAGMA cache_size = {-int(config.cache_size_kib)}")
+        cursor.execute(f"PRAGMA mmap_size = {int(config.mmap_size)}")
+        cursor.execute("PRAGMA temp_store = MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only = 1")
+    finally:
+        cursor.close()
+
+# Creating a function to build the SQLAlchemy engine options for the web application
+def create_engine_options(config:DatabaseConfig=None)->dict:
+    '''
+    This function returns the SQLAlchemy engine options for the SQLite database, which
+    wait for the busy timeout instead of failing immediately when the database is locked.
+    '''
+    config = config or DatabaseConfig()
+    return {
+        'connect_args': {
+            'timeout': config.busy_timeout_ms / 1000.0,
+            'check_same_thread': False
+        }
+    }
+
+
+# Creating a class to pool read-only connections to the SQLite database
+class ReadOnlyConnectionPool():
+    '''
+    This class keeps a small pool of read-only connections to the SQLite database for the
+    analytics readers, such as drift detection. The connections are opened once and
+    reused, and because the database uses WAL journaling they never block the writer.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, db_path:str=None, config:DatabaseConfig=None):
+        '''
+        This is the constructor for the ReadOnlyConnectionPool class.
+        '''
+        self.config = config or DatabaseConfig()
+        self.db_path = os.path.abspath(db_path or self.config.db_path)
+        self._idle = queue.LifoQueue(maxsize=self.config.read_pool_size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+    
+    # Creating a method to open a new read-only connection
+    def _open_connection(self):
+        '''
+        This method opens and configures a new read-only connection.
+        '''
+        if not os.path.exists(self.db_path):
+            raise FileNotFoundError(f"The database {self.db_path} does not exist.")
+        conn = sqlite3.connect(
+            f"file:{self.db_path}?mode=ro",
+            uri=True,
+            timeout=self.config.busy_timeout_ms / 1000.0,
+            check_same_thread=False
+        )
+        apply_sqlite_pragmas(conn, self.config, read_only=True)
+        return conn
+    
+    # Creating a method to borrow a connection from the pool
+    @contextmanager
+    def connection(self):
+        '''
+        This method lends a read-only connection from the pool and returns it to the pool
+        afterwards. When every pooled connection is in use, the caller waits up to
+        read_pool_timeout seconds for one to be returned and a TimeoutError is raised
+        after that.
+        ========================================================================================
+        ---------------------
+        Returns:
+        ---------------------
+        conn : sqlite3 connection - A read-only connection to the database.
+        ========================================================================================
+        '''
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.config.read_pool_size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = self._open_connection()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.config.read_pool_timeout)
+                except queue.Empty:
+                    raise TimeoutError(
+                        f"No read-only connection to {self.db_path} was released within "
+                        f"{self.config.read_pool_timeout}s. Streaming readers hold their connection "
+                        "until they are exhausted or closed."
+                    )
+        try:
+            yield conn
+        except Exception:
+            # Dropping the connection in case it was left in a bad state
+            conn.close()
+            with self._lock:
+                self._created -= 1
+            conn = None
+            raise
+        finally:
+            if conn is not None:
+                if self._closed:
+                    conn.close()
+                else:
+                    self._idle.put(conn)
+    
+    # Creating a method to close the pooled connections
+    def close(self):
+        '''
+        This method closes every idle connection in the pool.
+        '''
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+# Creating the registry of read-only pools, one per database file
+_read_pools = {}
+_read_pools_lock = threading.Lock()
+
+# Creating a function to fetch the shared read-only pool of a database
+def get_read_pool(db_path:str=None)->ReadOnlyConnectionPool:
+    '''
+    This function returns the process-wide read-only connection pool for the database,
+    creating it on first use.
+    ========================================================================================
+    ---------------------
+    Parameters:
+    ---------------------
+    db_path : str - This is the path to the database. Defaults to DatabaseConfig.db_path.
+    
+    ---------------------
+    Returns:
+    ---------------------
+    pool : ReadOnlyConnectionPool - The shared pool for the database.
+    ========================================================================================
+    '''
+    try:
+        db_path = os.path.abspath(db_path or DatabaseConfig().db_path)
+        with _read_pools_lock:
+            pool = _read_pools.get(db_path)
+            if pool is None:
+                logging.info(f"Creating the read-only connection pool for {db_path}.")
+                pool = ReadOnlyConnectionPool(db_path)
+                _read_pools[db_path] = pool
+            return pool
+    
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+# Creating the indexes used by the prediction log reads. The names match the indexes
+# that SQLAlchemy creates for the indexed columns of the models.
+PREDICTION_LOG_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_predictions_data_id ON predictions (data_id)",
+    "CREATE INDEX IF NOT EXISTS ix_data_created_at ON data (created_at)"
+)
+
+# Creating a function to add the prediction log indexes to an existing database
+def create_indexes(conn):
+    '''
+    This function adds the indexes on predictions.data_id and data.created_at to a
+    database created before the columns were indexed. Tables that do not exist yet are
+    skipped, as create_all adds the indexes together with the tables.
+    ========================================================================================
+    ---------------------
+    Parameters:
+    ---------------------
+    conn : sqlite3 connection - This is a writable connection to the database.
+    ========================================================================================
+    '''
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if not {'data', 'predictions'} <= tables:
+            return
+        for statement in PREDICTION_LOG_INDEXES:
+            conn.execute(statement)
+        conn.commit()
+    
+    except Exception as e:
+        raise CustomException(e, sys)
+
+# Creating a function to forget the read-only pools of a parent process
+def reset_read_pools():
+    '''
+    This function empties the registry of read-only pools without closing them. It is
+    called at the start of a worker process, since connections inherited from the parent
+    process must not be used in the child.
+    '''
+    with _read_pools_lock:
+        _read_pools.clear()
@@ -1,13 +1,332 @@
 import sys
 import os
-from datetime import datetime, timezone
+import re
+import itertools
+from datetime import datetime, timezone, timedelta
+import json
+import numpy as np
 import pandas as pd 
+from scipy.stats import ks_2samp, chi2, norm
 from evidently import Dataset, DataDefinition, Report, Regression
 from evidently.presets import DataDriftPreset
 from src.components.config_entity import DataIngestionConfig
 from src.components.config_entity import DriftDetectorConfig
-from src.utils import read_sql_data
+from src.components.config_entity import DriftAggregatesConfig
+from src.components.config_entity import DatabaseConfig
+from src.components.config_entity import NativeDriftConfig
+from src.components.config_entity import StreamingReaderConfig
+from src.components.config_entity import DriftMetricsConfig
+from src.components.config_entity import DriftSamplingConfig
+from src.components.config_entity import DriftSketchConfig
+from src.components.drift_aggregates import DriftAggregateStore, FeatureAggregates
+from src.components.drift_aggregates import NumericAggregate, compute_psi, align_category_counts
+from src.components.drift_aggregates import ReferenceProfile
+from src.components.drift_metrics import DriftMetricsStore
+from src.components.drift_sampling import compute_sample_size, measure_bytes_per_row
+from src.components.drift_sampling import stratified_sample, reservoir_sample
+from src.components.drift_sketches import OnlineDriftSketches
+from src.utils import read_prediction_log, stream_sql_query, compute_file_digest
+from src.utils import build_prediction_log_query, stream_archive, ARCHIVE_COLUMNS
 from src.exception import CustomException
+from src.logger import logging
+from src.metrics import stage_timer
+
+# Creating a class to compute drift statistics with NumPy
+class NativeDriftEngine():
+    '''
+    This class compares current data with reference data using vectorized NumPy passes
+    instead of an Evidently report. For every column it computes the population stability
+    index and the Jensen-Shannon distance, plus the Kolmogorov-Smirnov test and the
+    Wasserstein distance for numerical columns and the chi-square test for categorical
+    columns. The drift decision of every column uses the same test and threshold that
+    Evidently's DataDriftPreset picks by default, so both engines agree on which columns
+    drifted. The reference is summarized once by fit and reused for every comparison.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, config:NativeDriftConfig=None):
+        '''
+        This is the constructor for the NativeDriftEngine class.
+        '''
+        self.config = config or NativeDriftConfig()
+        self.reference = {}
+        self.reference_rows = 0
+    
+    # Creating a method to summarize the reference data
+    def fit(self, reference_df:pd.DataFrame)->'NativeDriftEngine':
+        '''
+        This method summarizes the reference data: the sorted values of every numerical
+        column and the category counts of every categorical column. Missing values are
+        dropped, as Evidently does.
+        '''
+        try:
+            self.reference_rows = len(reference_df)
+            numerical = list(self.config.numerical_columns) + [self.config.target_column]
+            for column in numerical:
+                if column not in reference_df.columns:
+                    continue
+                values = np.sort(self._clean_numeric(reference_df[column]))
+                self.reference[column] = {
+                    'type': 'num',
+                    'sorted': values,
+                    'unique': np.unique(values),
+                    'std': float(np.std(values))
+                }
+            for column in self.config.categorical_columns:
+                counts = reference_df[column].dropna().value_counts()
+                counts = counts[counts > 0]
+                self.reference[column] = {'type': 'cat', 'counts': counts}
+            return self
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a helper to drop missing and infinite values
+    @staticmethod
+    def _clean_numeric(values)->np.ndarray:
+        '''
+        This method returns the values as floats, without the missing and infinite ones.
+        '''
+        values = np.asarray(values, dtype=float)
+        return values[np.isfinite(values)]
+    
+    # Creating helpers for the distances between two distributions
+    @staticmethod
+    def _psi(reference_percents:np.ndarray, current_percents:np.ndarray)->float:
+        '''
+        This method returns the population stability index between two binned
+        distributions.
+        '''
+        return float(np.sum((reference_percents - current_percents) * np.log(reference_percents / current_percents)))
+    
+    @staticmethod
+    def _jensenshannon(reference_percents:np.ndarray, current_percents:np.ndarray)->float:
+        '''
+        This method returns the Jensen-Shannon distance between two binned distributions.
+        '''
+        p = reference_percents / reference_percents.sum()
+        q = current_percents / current_percents.sum()
+        m = (p + q) / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            kl_p = np.where(p > 0, p * np.log(p / m), 0.0).sum()
+            kl_q = np.where(q > 0, q * np.log(q / m), 0.0).sum()
+        return float(np.sqrt(max((kl_p + kl_q) / 2, 0.0)))
+    
+    @staticmethod
+    def _fill_zeroes(percents:np.ndarray)->np.ndarray:
+        '''
+        This method replaces the empty bins with a small share, as Evidently does, so that
+        the distances stay finite.
+        '''
+        percents = percents.copy()
+        smallest = percents[percents != 0].min()
+        percents[percents == 0] = smallest / 10 ** 6 if smallest <= 0.0001 else 0.0001
+        return percents
+    
+    # Creating a method to bin a numerical column
+    def _numeric_percents(self, reference:dict, current:np.ndarray):
+        '''
+        This method returns the share of the reference and current values in each bin.
+        Columns with more than 20 reference values are binned on Sturges edges over both
+        samples, other columns are compared value by value.
+        '''
+        ref_sorted = reference['sorted']
+        if len(reference['unique']) > 20:
+            low = min(ref_sorted[0], current.min())
+            high = max(ref_sorted[-1], current.max())
+            n_bins = int(np.ceil(np.log2(len(ref_sorted) + len(current)) + 1))
+            edges = np.histogram_bin_edges([low, high], bins=n_bins, range=(low, high))
+            ref_counts = np.diff(np.searchsorted(ref_sorted, edges, side='left')).astype(float)
+            ref_counts[-1] += np.count_nonzero(ref_sorted == edges[-1])
+            cur_counts = np.histogram(current, edges)[0].astype(float)
+        else:
+            keys = np.union1d(reference['unique'], current)
+            ref_counts = (np.searchsorted(ref_sorted, keys, side='right') -
+                          np.searchsorted(ref_sorted, keys, side='left')).astype(float)
+            cur_sorted = np.sort(current)
+            cur_counts = (np.searchsorted(cur_sorted, keys, side='right') -
+                          np.searchsorted(cur_sorted, keys, side='left')).astype(float)
+        return ref_counts / len(ref_sorted), cur_counts / len(current)
+    
+    # Creating a method to compare a numerical column
+    def _compare_numeric(self, column:str, current:np.ndarray)->dict:
+        '''
+        This method computes the statistics of a numerical column and the drift decision
+        of the test Evidently would pick for it.
+        '''
+        reference = self.reference[column]
+        ref_sorted = reference['sorted']
+        cur_sorted = np.sort(current)
+        n_ref, n_cur = len(ref_sorted), len(cur_sorted)
+        
+        # Computing the distance between the two empirical distribution functions
+        points = np.concatenate([ref_sorted, cur_sorted])
+        points.sort(kind='mergesort')
+        ref_cdf = np.searchsorted(ref_sorted, points, side='right') / n_ref
+        cur_cdf = np.searchsorted(cur_sorted, points, side='right') / n_cur
+        ks_statistic = float(np.max(np.abs(ref_cdf - cur_cdf)))
+        wasserstein = float(np.sum(np.abs(ref_cdf - cur_cdf)[:-1] * np.diff(points)))
+        wasserstein_norm = wasserstein / max(reference['std'], 0.001)
+        
+        ref_percents, cur_percents = self._numeric_percents(reference, current)
+        n_values = len(np.union1d(reference['unique'], cur_sorted))
+        stats_ = {
+            'column_type': 'num',
+            'psi': self._psi(self._fill_zeroes(ref_percents), self._fill_zeroes(cur_percents)),
+            'jensenshannon': self._jensenshannon(ref_percents, cur_percents),
+            'ks_statistic': ks_statistic,
+            'wasserstein_norm': wasserstein_norm
+        }
+        
+        # Picking the test the same way as Evidently
+        if n_ref <= self.config.small_reference_rows:
+            if n_values <= 5:
+                return dict(stats_, **self._decide_categorical_test(
+                    pd.Series(ref_sorted), pd.Series(cur_sorted), n_values
+                ))
+            p_value = float(ks_2samp(ref_sorted, cur_sorted)[1])
+            return dict(stats_, method='ks', score=p_value, threshold=self.config.p_value_threshold,
+                        drift=p_value <= self.config.p_value_threshold)
+        if n_values <= 5:
+            score = stats_['jensenshannon']
+            return dict(stats_, method='jensenshannon', score=score, threshold=self.config.distance_threshold,
+                        drift=score >= self.config.distance_threshold)
+        return dict(stats_, method='wasserstein', score=wasserstein_norm, threshold=self.config.distance_threshold,
+                    drift=wasserstein_norm >= self.config.distance_threshold)
+    
+    # Creating a method to run the chi-square or z test on category counts
+    def _decide_categorical_test(self, reference:pd.Series, current:pd.Series, n_values:int)->dict:
+        '''
+        This method runs the chi-square test, or the z test for two categories, on raw
+        reference and current values.
+        '''
+        ref_counts = reference.value_counts()
+        cur_counts = current.value_counts()
+        keys = ref_counts.index.union(cur_counts.index)
+        ref_counts = ref_counts.reindex(keys, fill_value=0).to_numpy(dtype=float)
+        cur_counts = cur_counts.reindex(keys, fill_value=0).to_numpy(dtype=float)
+        if n_values > 2:
+            p_value = self._chi_square(ref_counts, cur_counts)
+            method = 'chisquare'
+        else:
+            p_value = self._z_test(ref_counts, cur_counts)
+            method = 'z'
+        return {'method': method, 'score': p_value, 'threshold': self.config.p_value_threshold,
+                'drift': p_value < self.config.p_value_threshold}
+    
+    # Creating helpers for the chi-square and z tests
+    @staticmethod
+    def _chi_square(ref_counts:np.ndarray, cur_counts:np.ndarray)->float:
+        '''
+        This method returns the p-value of the chi-square test of the current counts
+        against the reference counts.
+        '''
+        expected = ref_counts * (cur_counts.sum() / ref_counts.sum())
+        with np.errstate(divide='ignore', invalid='ignore'):
+            statistic = float(np.sum((cur_counts - expected) ** 2 / expected))
+        return float(chi2.sf(statistic, len(ref_counts) - 1))
+    
+    @staticmethod
+    def _z_test(ref_counts:np.ndarray, cur_counts:np.ndarray)->float:
+        '''
+        This method returns the p-value of the two-proportion z-test of a binary column.
+        '''
+        if len(ref_counts) == 1:
+            return 1.0
+        n_ref, n_cur = ref_counts.sum(), cur_counts.sum()
+        p_ref, p_cur = ref_counts[1] / n_ref, cur_counts[1] / n_cur
+        pooled = (p_ref * n_ref + p_cur * n_cur) / (n_ref + n_cur)
+        z = (p_ref - p_cur) / np.sqrt(pooled * (1 - pooled) * (1.0 / n_ref + 1.0 / n_cur))
+        return float(2 * (1 - norm.cdf(np.abs(z))))
+    
+    # Creating a method to compare a categorical column
+    def _compare_categorical(self, column:str, current:pd.Series)->dict:
+        '''
+        This method computes the statistics of a categorical column and the drift decision
+        of the test Evidently would pick for it.
+        '''
+        ref_counts = self.reference[column]['counts']
+        cur_counts = current.value_counts()
+        cur_counts = cur_counts[cur_counts > 0]
+        keys = ref_counts.index.union(cur_counts.index)
+        ref_array = ref_counts.reindex(keys, fill_value=0).to_numpy(dtype=float)
+        cur_array = cur_counts.reindex(keys, fill_value=0).to_numpy(dtype=float)
+        ref_percents = ref_array / ref_array.sum()
+        cur_percents = cur_array / cur_array.sum()
+        
+        stats_ = {
+            'column_type': 'cat',
+            'psi': self._psi(self._fill_zeroes(ref_percents), self._fill_zeroes(cur_percents)),
+            'jensenshannon': self._jensenshannon(ref_percents, cur_percents),
+            'chisquare_p_value': self._chi_square(ref_array, cur_array)
+        }
+        
+        # Picking the test the same way as Evidently
+        if ref_array.sum() <= self.config.small_reference_rows:
+            if len(keys) > 2:
+                p_value = stats_['chisquare_p_value']
+                return dict(stats_, method='chisquare', score=p_value, threshold=self.config.p_value_threshold,
+                            drift=p_value < self.config.p_value_threshold)
+            p_value = self._z_test(ref_array, cur_array)
+            return dict(stats_, method='z', score=p_value, threshold=self.config.p_value_threshold,
+                        drift=p_value < self.config.p_value_threshold)
+        score = stats_['jensenshannon']
+        return dict(stats_, method='jensenshannon', score=score, threshold=self.config.distance_threshold,
+                    drift=score >= self.config.distance_threshold)
+    
+    # Creating a method to compare the current data with the reference
+    def compare(self, current_df:pd.DataFrame)->dict:
+        '''
+        This method compares every monitored column of the current data with the fitted
+        reference. The dataset drifts when the share of drifted input columns reaches
+        drift_share. The target is reported separately and, as in Evidently's
+        DataDriftPreset, does not count towards the dataset drift.
+        ========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        current_df : Pandas dataframe - The current data, with the input columns and the
+        predicted target.
+        
+        ---------------------
+        Returns:
+        ---------------------
+        result : dict - The share of drifted input columns, the dataset drift decision and
+        the statistics and decision of every column.
+        ========================================================================================
+        '''
+        try:
+            columns = {}
+            for column, reference in self.reference.items():
+                if column not in current_df.columns:
+                    continue
+                if reference['type'] == 'num':
+                    current = self._clean_numeric(current_df[column])
+                    if current.size == 0:
+                        continue
+                    columns[column] = self._compare_numeric(column, current)
+                else:
+                    current = current_df[column].dropna()
+                    if current.empty:
+                        continue
+                    columns[column] = self._compare_categorical(column, current)
+            
+            inputs = [c for c in columns if c != self.config.target_column]
+            drifted = sum(columns[c]['drift'] for c in inputs)
+            share = drifted / len(inputs) if inputs else 0.0
+            return {
+                'engine': 'native',
+                'reference_rows': self.reference_rows,
+                'rows': len(current_df),
+                'drifted_columns': drifted,
+                'drift_share': share,
+                'dataset_drift': bool(inputs) and share >= self.config.drift_share,
+                'target_drift': columns.get(self.config.target_column, {}).get('drift'),
+                'columns': columns
+            }
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+
 
 # Creating a class to detect data drift within the feature and targets
 class DetectDataDrift():
@@ -15,59 +334,183 @@ class DetectDataDrift():
     This class is used to detect data drifts in the features and target.
     '''
     # Creating the constructor for the class
-    def __init__(self):
+    def __init__(self, aggregates_config:DriftAggregatesConfig=None, db_config:DatabaseConfig=None,
+                 metrics_config:DriftMetricsConfig=None, sampling_config:DriftSamplingConfig=None):
         '''
         This is the constructor for the DetectDrift class.
         '''
         self.report_config = DriftDetectorConfig()
         self.ingestion_config = DataIngestionConfig()
+        self.aggregates_config = aggregates_config or DriftAggregatesConfig()
+        self.db_config = db_config or DatabaseConfig()
+        self.metrics_store = DriftMetricsStore(metrics_config)
+        self.sampling_config = sampling_config or DriftSamplingConfig()
+        self._reference_aggregates = None
+        self._native_engine = None
+        self._reference_total_rows = None
 
     # Creating a method to read the data from the database
-    def read_data_from_db(self):
+    def read_data_from_db(self, start=None, end=None):
         '''
-        This method reads the data from both tables in the database, merges the tables
-        and the returns the merged dataset.
+        This method reads the logged requests joined with their predictions and returns the
+        relevant features, with the prediction renamed to "Listening_Time_minutes". The
+        join, the projection and the optional created_at range are run in SQLite, so only
+        the requested period is loaded.
+        ========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        start : datetime or str - Only requests created at or after this time are read.
+        end : datetime or str - Only requests created before this time are read.
+        ========================================================================================
         '''
         try:
-            # Reading the data from the "data" table
-            data_df = read_sql_data(table='data')
-            
-            # Reading the data from the "predictions" table
-            preds_df = read_sql_data(table='predictions')
-            
-            # Merging both data dataframes
-            merged_df = data_df.merge(preds_df, left_on='id', right_on='data_id', how='left')
-            
-            # Defining which features to keep (other than the target feature)
-            cols_to_keep = [
-                'Podcast_Name',
-                'Episode_Length_minutes',
-                'Genre',
-                'Publication_Day',
-                'Publication_Time',
-                'prediction'
-            ]
-            # Keeping only the relevant features
-            merged_df = merged_df[cols_to_keep]
-            
-            # Renaming the "prediction" feature to "Listening_Time_minutes"
-            merged_df.rename(columns={'prediction': 'Listening_Time_minutes'}, inplace=True)
-            
-            return merged_df
+            return read_prediction_log(start=start, end=end, db_path=self.db_config.db_path)
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to sample the reference data
+    def sample_reference(self, train_df:pd.DataFrame)->pd.DataFrame:
+        '''
+        This method draws a sample of the training data, stratified by the configured
+        columns, with as many rows as fit in the sampling budget.
+        '''
+        try:
+            sample_size = compute_sample_size(measure_bytes_per_row(train_df), self.sampling_config)
+            sample = stratified_sample(train_df, sample_size, self.sampling_config.strata, self.sampling_config.seed)
+            logging.info(f"Sampled {len(sample)} of {len(train_df)} reference rows.")
+            return sample
         
         except Exception as e:
             raise CustomException(e, sys)
     
+    # Creating a method to sample the prediction log
+    def read_current_sample(self, start=None, end=None)->tuple:
+        '''
+        This method streams the archived and live requests joined with their predictions
+        and keeps a reservoir sample of them, with as many rows as fit in the sampling budget.
+        ========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        start : datetime or str - Only requests created at or after this time are sampled.
+        end : datetime or str - Only requests created before this time are sampled.
+        
+        ---------------------
+        Returns:
+        ---------------------
+        sample : Pandas dataframe - The sampled requests and their predictions.
+        total_rows : int - The number of requests in the period.
+        ========================================================================================
+        '''
+        try:
+            query, params = build_prediction_log_query(start, end)
+            chunks = itertools.chain(
+                stream_archive(ARCHIVE_COLUMNS['prediction_log'], start, end, chunk_size=self.sampling_config.chunk_size),
+                stream_sql_query(
+                    query, params=params, chunk_size=self.sampling_config.chunk_size, db_path=self.db_config.db_path
+                )
+            )
+            return reservoir_sample(chunks, self.sampling_config)
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    
+    # Creating a method to describe the samples of a drift run
+    def create_sampling_summary(self, reference_sample_rows:int, current_sample_rows:int,
+                                current_total_rows:int)->dict:
+        '''
+        This method returns the number of rows that were compared and the number of rows
+        they were sampled from, which are stored with the report of a drift run.
+        '''
+        return {
+            'enabled': self.sampling_config.enabled,
+            'seed': self.sampling_config.seed,
+            'reference_total_rows': self._reference_total_rows,
+            'reference_sample_rows': reference_sample_rows,
+            'current_total_rows': current_total_rows,
+            'current_sample_rows': current_sample_rows
+        }
+    
+    # Creating a method to summarize an Evidently report
+    @staticmethod
+    def summarize_evidently_report(my_eval, reference_rows:int=None, rows:int=None)->dict:
+        '''
+        This method extracts the per-column drift scores from an evaluated Evidently
+        report and returns them in the same format as the native drift engine.
+        '''
+        methods = {
+            'K-S p_value': 'ks',
+            'chi-square p_value': 'chisquare',
+            'Z-test p_value': 'z',
+            'Wasserstein distance (normed)': 'wasserstein',
+            'Jensen-Shannon distance': 'jensenshannon'
+        }
+        columns, drifted, share = {}, None, None
+        for metric in my_eval.dict()['metrics']:
+            match = re.match(r'ValueDrift\(column=(\w+),method=(.+),threshold=([\d.eE+-]+)\)', metric['metric_name'])
+            if match:
+                column, method, threshold = match.group(1), match.group(2), float(match.group(3))
+                score = float(metric['value'])
+                is_p_value = 'p_value' in method
+                columns[column] = {
+                    'method': methods.get(method, method),
+                    'score': score,
+                    'threshold': threshold,
+                    'drift': score < threshold if is_p_value else score >= threshold
+                }
+            elif metric['metric_name'].startswith('DriftedColumnsCount'):
+                drifted, share = int(metric['value']['count']), float(metric['value']['share'])
+                drift_share = float(re.search(r'drift_share=([\d.]+)', metric['metric_name']).group(1))
+        return {
+            'engine': 'evidently',
+            'reference_rows': reference_rows,
+            'rows': rows,
+            'drifted_columns': drifted,
+            'drift_share': share,
+            'dataset_drift': None if share is None else share >= drift_share,
+            'columns': columns
+        }
     
     # Creating a method to detect data drift
-    def detect_data_drift(self, save_report=True):
+    def detect_data_drift(self, save_report=True, engine='evidently', start=None, end=None,
+                          record_metrics:bool=None):
         '''
         This method detects whether this is any data drift in the features or target. The method
-        will leverage the read_data_from_db method to read the data from the database.
+        will leverage the read_data_from_db method to read the data from the database. When
+        sampling is enabled, the training data is sampled per stratum and the prediction log
+        with a reservoir, so that both fit in the sampling budget, and the sample sizes are
+        stored with the report.
+        ========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        save_report : bool - This determines whether the report is saved in the reports folder.
+        engine : str - Either "evidently", which builds an Evidently report and saves it as
+        HTML, or "native", which computes the same drift decisions with NumPy and saves them
+        as JSON.
+        start : datetime or str - Only requests created at or after this time are compared.
+        end : datetime or str - Only requests created before this time are compared.
+        record_metrics : bool - This determines whether the per-column metrics are appended
+        to the drift metrics store. Defaults to save_report.
+        
+        ---------------------
+        Returns:
+        ---------------------
+        result : dict or Evidently snapshot - The drift result of the native engine, or the
+        evaluated Evidently report. When no requests were logged in the window, the
+        Evidently engine returns an empty result with rows set to 0 instead.
+        ========================================================================================
         '''
         try:
+            if engine not in ('evidently', 'native'):
+                raise ValueError(f"Unknown drift engine {engine}. Allowed values are 'evidently' and 'native'.")
+            if record_metrics is None:
+                record_metrics = save_report
+            
             # Reading the training data and keeping only the relevant features
-            train_df = pd.read_parquet(self.ingestion_config.train_data_path)
             cols_to_keep = [
                 'Podcast_Name',
                 'Episode_Length_minutes',
@@ -76,10 +519,65 @@ class DetectDataDrift():
                 'Publication_Time',
                 'Listening_Time_minutes'
             ]
-            train_df = train_df[cols_to_keep]
+            sampling = self.sampling_config.enabled
+            if engine == 'evidently' or self._native_engine is None:
+                with stage_timer('drift', 'read_reference', log=True):
+                    train_df = pd.read_parquet(self.ingestion_config.train_data_path, columns=cols_to_keep)
+                self._reference_total_rows = len(train_df)
+                if sampling:
+                    with stage_timer('drift', 'sample_reference', log=True):
+                        train_df = self.sample_reference(train_df)
+            
+            # Reading the data from the database, keeping a bounded sample when sampling
+            with stage_timer('drift', 'read_db', log=True):
+                if sampling:
+                    db_df, current_total_rows = self.read_current_sample(start=start, end=end)
+                else:
+                    db_df = self.read_data_from_db(start=start, end=end)
+                    current_total_rows = len(db_df)
+            
+            # Comparing the data with the native engine, which keeps the summarized
+            # training data for the lifetime of the object
+            if engine == 'native':
+                if self._native_engine is None:
+                    with stage_timer('drift', 'fit_reference', log=True):
+                        self._native_engine = NativeDriftEngine().fit(train_df)
+                with stage_timer('drift', 'run_native', log=True):
+                    result = self._native_engine.compare(db_df)
+                result['sampling'] = self.create_sampling_summary(
+                    self._native_engine.reference_rows, len(db_df), current_total_rows
+                )
+                report_path = None
+                if save_report:
+                    with stage_timer('drift', 'save_report', log=True):
+                        report_path = os.path.splitext(self.report_config.report_path)[0] + '.json'
+                        os.makedirs(os.path.dirname(report_path), exist_ok=True)
+                        with open(report_path, 'w') as file_obj:
+                            json.dump(result, file_obj, indent=2, default=float)
+                if record_metrics:
+                    with stage_timer('drift', 'record_metrics', log=True):
+                        self.metrics_store.record_run(result, window_start=start, window_end=end, report_path=report_path)
+                return result
             
-            # Reading the data from the database
-            db_df = self.read_data_from_db()
+            # Skipping the Evidently report when no requests were logged in the window, as
+            # it cannot be built on an empty dataset, and recording an empty result instead
+            if db_df.empty:
+                logging.info(f"No requests were logged between {start} and {end}, skipping the drift report.")
+                result = {
+                    'engine': 'evidently',
+                    'reference_rows': len(train_df),
+                    'rows': 0,
+                    'drifted_columns': 0,
+                    'drift_share': 0.0,
+                    'dataset_drift': False,
+                    'target_drift': None,
+                    'columns': {},
+                    'sampling': self.create_sampling_summary(len(train_df), 0, current_total_rows)
+                }
+                if record_metrics:
+                    with stage_timer('drift', 'record_metrics', log=True):
+                        self.metrics_store.record_run(result, window_start=start, window_end=end)
+                return result
             
             # Defining the schema for the data
             schema = DataDefinition(
@@ -97,34 +595,307 @@ class DetectDataDrift():
                 DataDriftPreset()
             ])
             
-            # Running the report
-            my_eval = report.run(
-                reference_data=train_data, 
-                current_data=db_data
-            )
+            # Running the report, recording the sample sizes in its metadata
+            sampling_summary = self.create_sampling_summary(len(train_df), len(db_df), current_total_rows)
+            with stage_timer('drift', 'run_report', log=True):
+                my_eval = report.run(
+                    reference_data=train_data, 
+                    current_data=db_data,
+                    metadata={'sampling': {key: str(value) for key, value in sampling_summary.items()}}
+                )
             
             # Creating the report folder and saving the report if it does
             # not already exist.
             if save_report:
-                os.makedirs(os.path.dirname(self.report_config.report_path), exist_ok=True)
-                my_eval.save_html(self.report_config.report_path)
+                with stage_timer('drift', 'save_report', log=True):
+                    os.makedirs(os.path.dirname(self.report_config.report_path), exist_ok=True)
+                    my_eval.save_html(self.report_config.report_path)
+            
+            # Appending the per-column metrics to the drift metrics store
+            if record_metrics:
+                with stage_timer('drift', 'record_metrics', log=True):
+                    summary = self.summarize_evidently_report(my_eval, reference_rows=len(train_df), rows=len(db_df))
+                    summary['sampling'] = sampling_summary
+                    self.metrics_store.record_run(
+                        summary, window_start=start, window_end=end,
+                        report_path=self.report_config.report_path if save_report else None
+                    )
+            
+            return my_eval
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    
+    # Creating a method to read the rows above the watermark
+    def read_new_rows(self, watermark:int):
+        '''
+        This method reads the logged requests above the watermark, joined with their
+        predictions, in chunks of chunk_size rows and in the order of data.id.
+        ========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        watermark : int - This is the last data.id that was already aggregated.
+        
+        ---------------------
+        Returns:
+        ---------------------
+        chunks : iterator of Pandas dataframes - The new rows, with the prediction renamed to
+        Listening_Time_minutes and the day of the request in the day column, typed as in
+        the streaming reader.
+        ========================================================================================
+        '''
+        query = (
+            "SELECT d.id, d.Podcast_Name, d.Episode_Length_minutes, d.Genre, "
+            "d.Publication_Day, d.Publication_Time, p.prediction AS Listening_Time_minutes, "
+            "substr(d.created_at, 1, 10) AS day "
+            "FROM data d LEFT JOIN predictions p ON p.data_id = d.id "
+            "WHERE d.id > ? ORDER BY d.id"
+        )
+        dtypes = dict(StreamingReaderConfig().prediction_log_dtypes, id='int64', day='category')
+        return stream_sql_query(
+            query,
+            params=(watermark,),
+            dtypes=dtypes,
+            chunk_size=self.aggregates_config.chunk_size,
+            db_path=self.db_config.db_path
+        )
+    
+    # Creating a method to bring the drift aggregates up to date
+    def update_drift_aggregates(self)->DriftAggregateStore:
+        '''
+        This method reads only the rows logged since the last update, adds them to the
+        persisted per-day aggregates and moves the watermark forward.
+        ========================================================================================
+        ---------------------
+        Returns:
+        ---------------------
+        store : DriftAggregateStore - The updated per-day aggregates.
+        ========================================================================================
+        '''
+        try:
+            store = DriftAggregateStore(self.aggregates_config)
+            start_watermark = store.watermark
+            new_rows = 0
+            for chunk in self.read_new_rows(store.watermark):
+                store.add_rows(chunk)
+                new_rows += len(chunk)
+            if new_rows:
+                store.save()
+            logging.info(f"Aggregated {new_rows} new rows, watermark moved from {start_watermark} to {store.watermark}.")
+            return store
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to fetch the aggregates of the training data
+    def create_reference_aggregates(self)->FeatureAggregates:
+        '''
+        This method returns the aggregates of the training data from the reference profile
+        written by the data ingestion. The training dataset is only read when the profile
+        is missing, was built from a different dataset or on different bins, in which case
+        the profile is rebuilt. The result is kept for the lifetime of the object.
+        '''
+        try:
+            if self._reference_aggregates is None:
+                profile_path = self.ingestion_config.reference_profile_path
+                data_hash = compute_file_digest(self.ingestion_config.train_data_path)
+                profile = None
+                if os.path.exists(profile_path):
+                    profile = ReferenceProfile.load(profile_path, self.aggregates_config)
+                if profile is None or not profile.matches(data_hash, self.aggregates_config):
+                    logging.info('The reference profile is missing or out of date, rebuilding it.')
+                    columns = list(self.aggregates_config.numeric_edges) + list(self.aggregates_config.categorical_columns)
+                    train_df = pd.read_parquet(self.ingestion_config.train_data_path, columns=columns)
+                    profile = ReferenceProfile.create(train_df, data_hash, self.aggregates_config)
+                    profile.save(profile_path)
+                self._reference_aggregates = profile.aggregates
+            return self._reference_aggregates
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to compare aggregates with the reference aggregates
+    def compare_aggregates(self, current:FeatureAggregates, reference:FeatureAggregates)->dict:
+        '''
+        This method compares the aggregates of the current data with the reference
+        aggregates, using the population stability index of every feature. The dataset is
+        drifted when the share of drifted features reaches drift_share.
+        '''
+        features = {}
+        for column, current_aggregate in current.features.items():
+            reference_aggregate = reference.features[column]
+            if isinstance(current_aggregate, NumericAggregate):
+                reference_counts, current_counts = reference_aggregate.counts, current_aggregate.counts
+            else:
+                reference_counts, current_counts = align_category_counts(reference_aggregate, current_aggregate)
+            if current_aggregate.count == 0:
+                continue
+            psi = compute_psi(reference_counts, current_counts)
+            features[column] = {
+                'psi': psi,
+                'drift': psi >= self.aggregates_config.psi_threshold,
+                'count': current_aggregate.count
+            }
+        
+        drifted = sum(feature['drift'] for feature in features.values())
+        share = drifted / len(features) if features else 0.0
+        return {
+            'rows': current.rows,
+            'drifted_columns': drifted,
+            'drift_share': share,
+            'dataset_drift': bool(features) and share >= self.aggregates_config.drift_share,
+            'features': features
+        }
+    
+    # Creating a method to append an aggregate comparison to the drift metrics store
+    def record_aggregate_drift(self, result:dict, engine:str, reference_rows:int, window_start=None, window_end=None):
+        '''
+        This method appends the result of compare_aggregates to the drift metrics store.
+        '''
+        self.metrics_store.record_run(
+            {
+                'engine': engine,
+                'reference_rows': reference_rows,
+                'rows': result['rows'],
+                'drifted_columns': result['drifted_columns'],
+                'drift_share': result['drift_share'],
+                'dataset_drift': result['dataset_drift'],
+                'columns': {
+                    column: {'method': 'psi', 'score': feature['psi'], 'psi': feature['psi'],
+                             'threshold': self.aggregates_config.psi_threshold, 'drift': feature['drift']}
+                    for column, feature in result['features'].items()
+                }
+            },
+            window_start=window_start,
+            window_end=window_end
+        )
+    
+    # Creating a method to detect drift from the aggregates
+    def detect_incremental_drift(self, start_day:str=None, end_day:str=None, record_metrics:bool=True)->dict:
+        '''
+        This method brings the per-day aggregates up to date and compares the aggregates
+        of the requested period with the training data, using the population stability
+        index of every feature. The dataset is drifted when the share of drifted features
+        reaches drift_share.
+        ========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        start_day : str - The first day of the period, as YYYY-MM-DD. Defaults to the first
+        logged day.
+        end_day : str - The last day of the period, as YYYY-MM-DD. Defaults to the last
+        logged day.
+        record_metrics : bool - This determines whether the scores are appended to the drift
+        metrics store.
+        
+        ---------------------
+        Returns:
+        ---------------------
+        result : dict - The number of rows in the period, the share of drifted features,
+        whether the dataset drifted and the score and decision of every feature.
+        ========================================================================================
+        '''
+        try:
+            with stage_timer('drift', 'update_aggregates', log=True):
+                store = self.update_drift_aggregates()
+            reference = self.create_reference_aggregates()
+            
+            with stage_timer('drift', 'compare_aggregates', log=True):
+                current = store.window(start_day, end_day)
+                result = dict(
+                    {'start_day': start_day, 'end_day': end_day, 'watermark': store.watermark},
+                    **self.compare_aggregates(current, reference)
+                )
+            
+            if record_metrics:
+                self.record_aggregate_drift(
+                    result, 'incremental', reference.rows, start_day,
+                    None if end_day is None else pd.Timestamp(end_day) + pd.Timedelta(days=1)
+                )
+            return result
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    
+    # Creating a method to detect drift in the recently served requests
+    def detect_recent_drift(self, minutes:int=60, sketches:OnlineDriftSketches=None,
+                            sketch_config:DriftSketchConfig=None, record_metrics:bool=False)->dict:
+        '''
+        This method compares the requests served in the last minutes with the training
+        data, using the online drift sketches instead of the prediction log, so it answers
+        without touching the data and predictions tables. Inside the web application the
+        live sketches of the app are merged with the checkpoints of the other worker
+        processes; elsewhere the checkpoints of all processes are merged.
+        ========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        minutes : int - The length of the period, which is rounded out to whole sketch
+        buckets.
+        sketches : OnlineDriftSketches - The live sketches of the web application, if any.
+        sketch_config : DriftSketchConfig - The configuration of the sketches to load when
+        no live sketches are given.
+        record_metrics : bool - This determines whether the scores are appended to the drift
+        metrics store.
+        
+        ---------------------
+        Returns:
+        ---------------------
+        result : dict - The number of requests in the period, the share of drifted features,
+        whether the dataset drifted and the score and decision of every feature.
+        ========================================================================================
+        '''
+        try:
+            end = datetime.now(timezone.utc)
+            start = end - timedelta(minutes=minutes)
+            with stage_timer('drift', 'collect_sketches', log=True):
+                if sketches is not None:
+                    merged = sketches.collect()
+                else:
+                    merged = OnlineDriftSketches.load(sketch_config, self.aggregates_config)
+                current = merged.window(start, end)
+            reference = self.create_reference_aggregates()
+            
+            with stage_timer('drift', 'compare_sketches', log=True):
+                result = dict(
+                    {'start': start.isoformat(), 'end': end.isoformat(), 'minutes': minutes},
+                    **self.compare_aggregates(current, reference)
+                )
+            
+            if record_metrics:
+                self.record_aggregate_drift(result, 'sketch', reference.rows, start, end)
+            return result
         
         except Exception as e:
             raise CustomException(e, sys)
     
     
     # Creating a method to run the drift detection process on a scheduled time
-    def run_drift_detection(self):
+    def run_drift_detection(self, incremental:bool=False, engine:str='evidently'):
         '''
-        This method runs the drift detection process on a scheduled time.
+        This method runs the drift detection process on a scheduled time. In incremental
+        mode the per-day aggregates are brought up to date on every run, which only reads
+        the new rows, and the last 30 days are compared with the training data. Otherwise
+        the requests of the last 30 days are compared with the training data, using the
+        Evidently report or the native drift engine.
         '''
         try:
             # Fetching the current time
             today = datetime.now(timezone.utc)
             
+            # Running the incremental drift detection on every run
+            if incremental:
+                start_day = (today - timedelta(days=29)).strftime('%Y-%m-%d')
+                result = self.detect_incremental_drift(start_day=start_day)
+                logging.info(f"Incremental drift detection since {start_day}: {result}")
+                return result
+            
             # Running the drift detection process on the scheduled time
             if 1 <= today.day <= 7:
-                self.detect_data_drift()
+                self.detect_data_drift(engine=engine, start=today - timedelta(days=30))
             
             else:
                 print("Drift detection process not scheduled to run.")
@@ -0,0 +1,487 @@
+# Importing packages
+import sys
+import os
+import json
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from src.components.config_entity import DriftAggregatesConfig
+from src.exception import CustomException
+
+# Creating a class to aggregate a numeric feature
+class NumericAggregate():
+    '''
+    This class aggregates a numeric feature into a histogram on fixed edges, together
+    with the count, the number of missing values, the sum, the sum of squares and the
+    minimum and maximum. Aggregates built on the same edges can be merged, so the
+    aggregate of any period is the merge of the aggregates of its days.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, edges):
+        '''
+        This is the constructor for the NumericAggregate class. The edges are the inner
+        bin edges; values below the first or at or above the last edge are counted in an
+        extra bin on either side.
+        '''
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.count = 0
+        self.missing = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+    
+    # Creating a method to add values to the aggregate
+    def update(self, values):
+        '''
+        This method adds an array of values to the aggregate.
+        '''
+        values = np.asarray(values, dtype=float)
+        is_missing = np.isnan(values)
+        self.missing += int(is_missing.sum())
+        values = values[~is_missing]
+        if values.size == 0:
+            return
+        bins = np.searchsorted(self.edges, values, side='right')
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+        self.count += int(values.size)
+        self.total += float(values.sum())
+        self.total_sq += float(np.square(values).sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+    
+    # Creating a method to merge another aggregate into this one
+    def merge(self, other:'NumericAggregate'):
+        '''
+        This method adds the counts and moments of another aggregate on the same edges.
+        '''
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError('Numeric aggregates with different bin edges cannot be merged.')
+        self.counts += other.counts
+        self.count += other.count
+        self.missing += other.missing
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+    
+    # Creating properties for the moments
+    @property
+    def mean(self)->float:
+        '''
+        This property returns the mean of the aggregated values.
+        '''
+        return self.total / self.count if self.count else float('nan')
+    
+    @property
+    def std(self)->float:
+        '''
+        This property returns the sample standard deviation of the aggregated values.
+        '''
+        if self.count < 2:
+            return float('nan')
+        variance = (self.total_sq - self.total ** 2 / self.count) / (self.count - 1)
+        return float(np.sqrt(max(variance, 0.0)))
+    
+    # Creating methods to convert the aggregate to and from a dictionary
+    def to_dict(self)->dict:
+        '''
+        This method returns the aggregate as a JSON serializable dictionary.
+        '''
+        return {
+            'edges': self.edges.tolist(),
+            'counts': self.counts.tolist(),
+            'count': self.count,
+            'missing': self.missing,
+            'sum': self.total,
+            'sum_sq': self.total_sq,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None
+        }
+    
+    @classmethod
+    def from_dict(cls, data:dict)->'NumericAggregate':
+        '''
+        This method rebuilds an aggregate from the dictionary written by to_dict.
+        '''
+        aggregate = cls(data['edges'])
+        aggregate.counts = np.asarray(data['counts'], dtype=np.int64)
+        aggregate.count = data['count']
+        aggregate.missing = data['missing']
+        aggregate.total = data['sum']
+        aggregate.total_sq = data['sum_sq']
+        aggregate.min = data['min'] if data['min'] is not None else float('inf')
+        aggregate.max = data['max'] if data['max'] is not None else float('-inf')
+        return aggregate
+
+
+# Creating a class to aggregate a categorical feature
+class CategoricalAggregate():
+    '''
+    This class aggregates a categorical feature into the count of every category and the
+    number of missing values.
+    '''
+    # Creating the constructor for the class
+    def __init__(self):
+        '''
+        This is the constructor for the CategoricalAggregate class.
+        '''
+        self.counts = {}
+        self.missing = 0
+    
+    # Creating a method to add values to the aggregate
+    def update(self, values):
+        '''
+        This method adds an array of values to the aggregate. A list is counted directly,
+        which is faster for the few values of a single request.
+        '''
+        if isinstance(values, list):
+            for value in values:
+                if value is None or value != value:
+                    self.missing += 1
+                else:
+                    self.counts[str(value)] = self.counts.get(str(value), 0) + 1
+            return
+        values = pd.Series(values)
+        self.missing += int(values.isna().sum())
+        for category, count in values.value_counts(dropna=True).items():
+            # Categorical columns also report their unused categories, with a count of zero
+            if count:
+                self.counts[str(category)] = self.counts.get(str(category), 0) + int(count)
+    
+    # Creating a method to merge another aggregate into this one
+    def merge(self, other:'CategoricalAggregate'):
+        '''
+        This method adds the category counts of another aggregate.
+        '''
+        for category, count in other.counts.items():
+            self.counts[category] = self.counts.get(category, 0) + count
+        self.missing += other.missing
+    
+    @property
+    def count(self)->int:
+        '''
+        This property returns the number of aggregated values.
+        '''
+        return sum(self.counts.values())
+    
+    # Creating methods to convert the aggregate to and from a dictionary
+    def to_dict(self)->dict:
+        '''
+        This method returns the aggregate as a JSON serializable dictionary.
+        '''
+        return {'counts': dict(self.counts), 'missing': self.missing}
+    
+    @classmethod
+    def from_dict(cls, data:dict)->'CategoricalAggregate':
+        '''
+        This method rebuilds an aggregate from the dictionary written by to_dict.
+        '''
+        aggregate = cls()
+        aggregate.counts = dict(data['counts'])
+        aggregate.missing = data['missing']
+        return aggregate
+
+
+# Creating a class to hold the aggregates of every monitored feature
+class FeatureAggregates():
+    '''
+    This class holds one aggregate per monitored feature: a NumericAggregate for the
+    episode length and the listening time, and a CategoricalAggregate for the
+    categorical features.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, config:DriftAggregatesConfig=None):
+        '''
+        This is the constructor for the FeatureAggregates class.
+        '''
+        self.config = config or DriftAggregatesConfig()
+        self.features = {}
+        for column, (low, high, n_bins) in self.config.numeric_edges.items():
+            self.features[column] = NumericAggregate(np.linspace(low, high, n_bins + 1))
+        for column in self.config.categorical_columns:
+            self.features[column] = CategoricalAggregate()
+    
+    # Creating a method to add a dataframe to the aggregates
+    def update(self, df:pd.DataFrame):
+        '''
+        This method adds the rows of the dataframe to the aggregates. Columns that are not
+        in the dataframe are left unchanged.
+        '''
+        for column, aggregate in self.features.items():
+            if column in df.columns:
+                aggregate.update(df[column].to_numpy())
+    
+    # Creating a method to add request rows to the aggregates
+    def update_records(self, records:list, target_values:list=None):
+        '''
+        This method adds request rows, given as dictionaries, to the aggregates without
+        building a dataframe. The target values, if given, are added to the aggregate of
+        the target column, which for logged requests holds the predictions.
+        '''
+        for column, aggregate in self.features.items():
+            if target_values is not None and column == self.config.target_column:
+                values = list(target_values)
+            else:
+                values = [record.get(column) for record in records]
+            if isinstance(aggregate, NumericAggregate):
+                aggregate.update(np.array(values, dtype=float))
+            else:
+                aggregate.update(values)
+    
+    # Creating a method to merge other aggregates into these
+    def merge(self, other:'FeatureAggregates'):
+        '''
+        This method merges the aggregates of every feature of another FeatureAggregates.
+        '''
+        for column, aggregate in self.features.items():
+            if column in other.features:
+                aggregate.merge(other.features[column])
+    
+    # Creating a property for the number of aggregated rows
+    @property
+    def rows(self)->int:
+        '''
+        This property returns the number of aggregated rows.
+        '''
+        return max(
+            (aggregate.count + aggregate.missing for aggregate in self.features.values()),
+            default=0
+        )
+    
+    # Creating methods to convert the aggregates to and from a dictionary
+    def to_dict(self)->dict:
+        '''
+        This method returns the aggregates as a JSON serializable dictionary.
+        '''
+        return {column: aggregate.to_dict() for column, aggregate in self.features.items()}
+    
+    @classmethod
+    def from_dict(cls, data:dict, config:DriftAggregatesConfig=None)->'FeatureAggregates':
+        '''
+        This method rebuilds the aggregates from the dictionary written by to_dict.
+        '''
+        aggregates = cls(config)
+        for column, values in data.items():
+            if column in aggregates.config.numeric_edges:
+                aggregates.features[column] = NumericAggregate.from_dict(values)
+            else:
+                aggregates.features[column] = CategoricalAggregate.from_dict(values)
+        return aggregates
+
+
+# Creating a function to compute the population stability index
+def compute_psi(reference_counts, current_counts, eps:float=1e-4)->float:
+    '''
+    This function computes the population stability index between two histograms, or
+    between two aligned arrays of category counts.
+    ========================================================================================
+    ---------------------
+    Parameters:
+    ---------------------
+    reference_counts : array - The counts of the reference data.
+    current_counts : array - The counts of the current data, aligned with the reference.
+    eps : float - The share used for empty bins, so the index stays finite.
+    
+    ---------------------
+    Returns:
+    ---------------------
+    psi : float - The population stability index.
+    ========================================================================================
+    '''
+    reference = np.asarray(reference_counts, dtype=float)
+    current = np.asarray(current_counts, dtype=float)
+    reference = np.clip(reference / max(reference.sum(), 1.0), eps, None)
+    current = np.clip(current / max(current.sum(), 1.0), eps, None)
+    return float(np.sum((current - reference) * np.log(current / reference)))
+
+
+# Creating a function to align two categorical aggregates
+def align_category_counts(reference:CategoricalAggregate, current:CategoricalAggregate):
+    '''
+    This function returns the counts of both aggregates over the union of their
+    categories, in the same order.
+    '''
+    categories = sorted(set(reference.counts) | set(current.counts))
+    return (
+        np.array([reference.counts.get(c, 0) for c in categories], dtype=float),
+        np.array([current.counts.get(c, 0) for c in categories], dtype=float)
+    )
+
+
+# Creating a class to store the per-day aggregates and the watermark
+class DriftAggregateStore():
+    '''
+    This class stores the per-day feature aggregates of the logged requests and
+    predictions, together with the watermark, which is the last data.id that was
+    aggregated. Every update only reads the rows above the watermark, so its cost is
+    proportional to the new data. The state is written to a JSON file with an atomic
+    replace.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, config:DriftAggregatesConfig=None):
+        '''
+        This is the constructor for the DriftAggregateStore class.
+        '''
+        self.config = config or DriftAggregatesConfig()
+        self.watermark = 0
+        self.days = {}
+        self.load()
+    
+    # Creating a method to load the stored state
+    def load(self):
+        '''
+        This method loads the watermark and the per-day aggregates from the state file,
+        if it exists.
+        '''
+        try:
+            if not os.path.exists(self.config.state_path):
+                return
+            with open(self.config.state_path, 'r') as file_obj:
+                state = json.load(file_obj)
+            self.watermark = state['watermark']
+            self.days = {
+                day: FeatureAggregates.from_dict(data, self.config)
+                for day, data in state['days'].items()
+            }
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to save the state
+    def save(self):
+        '''
+        This method writes the watermark and the per-day aggregates to the state file.
+        '''
+        try:
+            os.makedirs(os.path.dirname(self.config.state_path) or '.', exist_ok=True)
+            state = {
+                'watermark': self.watermark,
+                'days': {day: aggregates.to_dict() for day, aggregates in sorted(self.days.items())}
+            }
+            tmp_path = self.config.state_path + '.tmp'
+            with open(tmp_path, 'w') as file_obj:
+                json.dump(state, file_obj)
+            os.replace(tmp_path, self.config.state_path)
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to add a chunk of new rows
+    def add_rows(self, df:pd.DataFrame):
+        '''
+        This method adds a chunk of rows, read above the watermark, to the aggregates of
+        their days and moves the watermark to the last row. The dataframe must contain
+        the id and day columns.
+        '''
+        if df.empty:
+            return
+        for day, day_df in df.groupby(df['day'].astype(object).fillna('unknown'), sort=False):
+            aggregates = self.days.get(day)
+            if aggregates is None:
+                aggregates = FeatureAggregates(self.config)
+                self.days[day] = aggregates
+            aggregates.update(day_df)
+        self.watermark = max(self.watermark, int(df['id'].max()))
+    
+    # Creating a method to merge the aggregates of a period
+    def window(self, start_day:str=None, end_day:str=None)->FeatureAggregates:
+        '''
+        This method merges the aggregates of every day between start_day and end_day,
+        both inclusive and given as YYYY-MM-DD. Without a start or an end, the period is
+        unbounded on that side.
+        '''
+        merged = FeatureAggregates(self.config)
+        for day, aggregates in self.days.items():
+            if day == 'unknown' and (start_day or end_day):
+                continue
+            if start_day is not None and day < start_day:
+                continue
+            if end_day is not None and day > end_day:
+                continue
+            merged.merge(aggregates)
+        return merged
+
+
+# Creating a class to store the reference profile of the training data
+class ReferenceProfile():
+    '''
+    This class holds the compact reference profile of the training data: the fixed-edge
+    histograms of the episode length and the listening time and the category frequency
+    tables of the categorical features, tagged with the sha256 digest of the training
+    dataset it was built from. Drift detection compares the logged data with the profile
+    instead of rereading the training dataset.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, data_hash:str, aggregates:FeatureAggregates, created_at:str=None):
+        '''
+        This is the constructor for the ReferenceProfile class.
+        '''
+        self.data_hash = data_hash
+        self.aggregates = aggregates
+        self.created_at = created_at or datetime.now(timezone.utc).isoformat()
+    
+    # Creating a method to build the profile from the training data
+    @classmethod
+    def create(cls, df:pd.DataFrame, data_hash:str, config:DriftAggregatesConfig=None)->'ReferenceProfile':
+        '''
+        This method aggregates the training dataframe into a reference profile.
+        '''
+        aggregates = FeatureAggregates(config)
+        aggregates.update(df)
+        return cls(data_hash, aggregates)
+    
+    # Creating a method to check whether the profile is usable
+    def matches(self, data_hash:str, config:DriftAggregatesConfig=None)->bool:
+        '''
+        This method returns True if the profile was built from the dataset with the given
+        digest and on the bins of the given configuration.
+        '''
+        expected = FeatureAggregates(config)
+        if data_hash != self.data_hash or set(expected.features) != set(self.aggregates.features):
+            return False
+        return all(
+            np.array_equal(aggregate.edges, self.aggregates.features[column].edges)
+            for column, aggregate in expected.features.items()
+            if isinstance(aggregate, NumericAggregate)
+        )
+    
+    # Creating a method to save the profile
+    def save(self, file_path:str):
+        '''
+        This method writes the profile to a JSON file with an atomic replace.
+        '''
+        try:
+            os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+            profile = {
+                'data_hash': self.data_hash,
+                'created_at': self.created_at,
+                'rows': self.aggregates.rows,
+                'features': self.aggregates.to_dict()
+            }
+            tmp_path = file_path + '.tmp'
+            with open(tmp_path, 'w') as file_obj:
+                json.dump(profile, file_obj, indent=2)
+            os.replace(tmp_path, file_path)
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to load the profile
+    @classmethod
+    def load(cls, file_path:str, config:DriftAggregatesConfig=None)->'ReferenceProfile':
+        '''
+        This method reads a profile from a JSON file.
+        '''
+        try:
+            with open(file_path, 'r') as file_obj:
+                profile = json.load(file_obj)
+            return cls(
+                profile['data_hash'],
+                FeatureAggregates.from_dict(profile['features'], config),
+                profile['created_at']
+            )
+        
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -0,0 +1,218 @@
+# Importing packages
+import sys
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from src.components.config_entity import DriftBackfillConfig
+from src.components.config_entity import DataIngestionConfig
+from src.components.config_entity import DatabaseConfig
+from src.components.config_entity import NativeDriftConfig
+from src.components.config_entity import DriftMetricsConfig
+from src.components.database import get_read_pool, reset_read_pools
+from src.components.detect_drift import NativeDriftEngine
+from src.components.drift_metrics import DriftMetricsStore
+from src.utils import read_prediction_log, fetch_archive_days
+from src.exception import CustomException
+from src.logger import logging
+
+# The reference and database shared by the tasks of a worker process
+_worker_engine = None
+_worker_db_path = None
+
+# Creating a function to set up a worker process
+def _init_worker(engine:NativeDriftEngine, db_path:str):
+    '''
+    This function stores the fitted reference and the database path in the worker
+    process, so the reference is sent to every worker once instead of once per window.
+    '''
+    global _worker_engine, _worker_db_path
+    reset_read_pools()
+    _worker_engine = engine
+    _worker_db_path = db_path
+
+# Creating a function to compute the drift of one window in a worker process
+def _compute_window(window:tuple)->dict:
+    '''
+    This function reads the requests of one window and compares them with the reference.
+    '''
+    start, end = window
+    current_df = read_prediction_log(start=start, end=end, db_path=_worker_db_path)
+    if current_df.empty:
+        result = {'engine': 'native', 'rows': 0, 'dataset_drift': None, 'columns': {}}
+    else:
+        result = _worker_engine.compare(current_df)
+    return dict(result, window_start=start.isoformat(), window_end=end.isoformat())
+
+
+# Creating a class to backfill the drift history
+class DriftBackfill():
+    '''
+    This class rebuilds the drift history of the prediction log. It splits the log into
+    daily, weekly or monthly windows, fits the native drift engine on the training data
+    once and computes the drift of every window in parallel in a process pool, writing
+    one JSON result per window and appending its metrics to the drift metrics store.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, config:DriftBackfillConfig=None, db_config:DatabaseConfig=None,
+                 native_config:NativeDriftConfig=None, metrics_config:DriftMetricsConfig=None):
+        '''
+        This is the constructor for the DriftBackfill class.
+        '''
+        self.config = config or DriftBackfillConfig()
+        self.db_config = db_config or DatabaseConfig()
+        self.native_config = native_config or NativeDriftConfig()
+        self.ingestion_config = DataIngestionConfig()
+        self.metrics_store = DriftMetricsStore(metrics_config)
+    
+    # Creating a method to fetch the time span of the prediction log
+    def fetch_log_bounds(self)->tuple:
+        '''
+        This method returns the creation times of the first and last logged request, or
+        None for both when the log is empty. Archived requests are only known by their
+        day, which is enough to align the windows.
+        '''
+        try:
+            with get_read_pool(self.db_config.db_path).connection() as conn:
+                first, last = conn.execute("SELECT MIN(created_at), MAX(created_at) FROM data").fetchone()
+            bounds = [pd.Timestamp(value) for value in (first, last) if value is not None]
+            archive_days = fetch_archive_days()
+            if archive_days:
+                last_archived = pd.Timestamp(archive_days[-1]) + pd.Timedelta(days=1, microseconds=-1)
+                bounds += [pd.Timestamp(archive_days[0]), last_archived]
+            if not bounds:
+                return None, None
+            return min(bounds), max(bounds)
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to split a period into windows
+    @staticmethod
+    def create_windows(start, end, frequency:str='monthly')->list:
+        '''
+        This method splits the period from start to end into consecutive windows aligned
+        on calendar days, weeks starting on Monday or months. Every window includes its
+        start and excludes its end, and the windows together cover the whole period.
+        ========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        start : datetime or str - The start of the period.
+        end : datetime or str - The end of the period, which is included in the last window.
+        frequency : str - Either "daily", "weekly" or "monthly".
+        
+        ---------------------
+        Returns:
+        ---------------------
+        windows : list - The (start, end) timestamps of every window.
+        ========================================================================================
+        '''
+        offsets = {
+            'daily': pd.offsets.Day(1),
+            'weekly': pd.offsets.Week(weekday=0),
+            'monthly': pd.offsets.MonthBegin(1)
+        }
+        if frequency not in offsets:
+            raise ValueError(f"Unknown frequency {frequency}. Allowed values are 'daily', 'weekly' and 'monthly'.")
+        
+        start = pd.Timestamp(start).normalize()
+        end = pd.Timestamp(end)
+        if frequency == 'weekly':
+            start = start - pd.Timedelta(days=start.weekday())
+        elif frequency == 'monthly':
+            start = start.replace(day=1)
+        
+        windows = []
+        while start <= end:
+            window_end = start + offsets[frequency]
+            windows.append((start, window_end))
+            start = window_end
+        return windows
+    
+    # Creating a method to fit the reference once
+    def fit_reference(self, reference_df:pd.DataFrame=None)->NativeDriftEngine:
+        '''
+        This method fits the native drift engine on the reference data, which defaults to
+        the training data.
+        '''
+        try:
+            if reference_df is None:
+                columns = (list(self.native_config.numerical_columns) + list(self.native_config.categorical_columns)
+                           + [self.native_config.target_column])
+                reference_df = pd.read_parquet(self.ingestion_config.train_data_path, columns=columns)
+            return NativeDriftEngine(self.native_config).fit(reference_df)
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to save the result of a window
+    def save_result(self, result:dict, frequency:str)->str:
+        '''
+        This method writes the result of one window to output_dir/<frequency>/ and returns
+        the path of the file.
+        '''
+        output_dir = os.path.join(self.config.output_dir, frequency)
+        os.makedirs(output_dir, exist_ok=True)
+        window_start = pd.Timestamp(result['window_start']).strftime('%Y_%m_%d')
+        file_path = os.path.join(output_dir, f"{window_start}_drift.json")
+        with open(file_path, 'w') as file_obj:
+            json.dump(result, file_obj, indent=2, default=float)
+        return file_path
+    
+    # Creating a method to run the backfill
+    def run(self, start=None, end=None, frequency:str=None, reference_df:pd.DataFrame=None)->list:
+        '''
+        This method computes the drift of every window between start and end in parallel
+        and writes one result per window. Without start or end, the period spans the
+        whole prediction log.
+        ========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        start : datetime or str - The start of the backfill.
+        end : datetime or str - The end of the backfill.
+        frequency : str - Either "daily", "weekly" or "monthly". Defaults to the configured
+        frequency.
+        reference_df : Pandas dataframe - The reference data. Defaults to the training data.
+        
+        ---------------------
+        Returns:
+        ---------------------
+        results : list - The drift result of every window, in window order.
+        ========================================================================================
+        '''
+        try:
+            frequency = frequency or self.config.frequency
+            first, last = self.fetch_log_bounds()
+            start = pd.Timestamp(start) if start is not None else first
+            end = pd.Timestamp(end) if end is not None else last
+            if start is None or end is None:
+                logging.info('The prediction log is empty, there is nothing to backfill.')
+                return []
+            
+            windows = self.create_windows(start, end, frequency)
+            engine = self.fit_reference(reference_df)
+            logging.info(f"Backfilling the drift of {len(windows)} {frequency} windows from {start} to {end}.")
+            
+            with ProcessPoolExecutor(
+                max_workers=self.config.max_workers,
+                initializer=_init_worker,
+                initargs=(engine, os.path.abspath(self.db_config.db_path))
+            ) as executor:
+                results = list(executor.map(_compute_window, windows))
+            
+            for result in results:
+                if result['rows']:
+                    report_path = self.save_result(result, frequency)
+                    # The run parameters only name the latest model, not the one live in the window
+                    self.metrics_store.record_run(
+                        result, window_start=result['window_start'], window_end=result['window_end'],
+                        report_path=report_path, resolve_model=False
+                    )
+            
+            logging.info(f"Backfilled {sum(1 for r in results if r['rows'])} windows with logged requests.")
+            return results
+        
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -0,0 +1,291 @@
+# Importing packages
+import sys
+import os
+import uuid
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone
+import pandas as pd
+from src.components.config_entity import DriftMetricsConfig
+from src.components.config_entity import DatabaseConfig
+from src.components.database import apply_sqlite_pragmas
+from src.utils import load_run_params, read_json_file, format_db_timestamp
+from src.exception import CustomException
+from src.logger import logging
+
+# The drift methods whose score is the p-value of a statistical test
+P_VALUE_METHODS = ('ks', 'chisquare', 'z')
+
+# The statements which create the tables of the drift metrics store
+DRIFT_METRICS_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS drift_runs ("
+    "run_id TEXT PRIMARY KEY, created_at TEXT NOT NULL, engine TEXT NOT NULL, "
+    "window_start TEXT, window_end TEXT, reference_rows INTEGER, current_rows INTEGER, "
+    "model_name TEXT, model_version TEXT, drifted_columns INTEGER, drift_share REAL, "
+    "dataset_drift INTEGER, report_path TEXT, reference_total_rows INTEGER, current_total_rows INTEGER)",
+    "CREATE TABLE IF NOT EXISTS drift_metrics ("
+    "run_id TEXT NOT NULL REFERENCES drift_runs (run_id), column_name TEXT NOT NULL, "
+    "method TEXT, statistic REAL, p_value REAL, threshold REAL, drift INTEGER, psi REAL, "
+    "PRIMARY KEY (run_id, column_name))",
+    "CREATE INDEX IF NOT EXISTS ix_drift_runs_window_end ON drift_runs (window_end)",
+    "CREATE INDEX IF NOT EXISTS ix_drift_metrics_column_name ON drift_metrics (column_name)"
+)
+
+# The columns added to drift_runs after its first version, with their types
+DRIFT_RUNS_ADDED_COLUMNS = {
+    'reference_total_rows': 'INTEGER',
+    'current_total_rows': 'INTEGER'
+}
+
+# Creating a function to fetch the name and version of the latest model
+def fetch_model_version(run_config_dir:str='run_config')->tuple:
+    '''
+    This function returns the name and registry version of the latest trained model from
+    the run parameters, or None for both when no run parameters are available.
+    '''
+    try:
+        runs_data = read_json_file(load_run_params(run_config_dir))
+        return runs_data.get('model_name'), runs_data.get('latest_version')
+    
+    except Exception:
+        return None, None
+
+
+# Creating a class to store the drift metrics of every run
+class DriftMetricsStore():
+    '''
+    This class stores a compact, machine-readable history of the drift runs in a small
+    SQLite database next to the prediction log. Every run adds one row to drift_runs, with
+    the window bounds, row counts, model version and dataset decision, and one row per
+    column to drift_metrics, with the method, statistic, p-value, threshold and drift
+    decision. The query methods return the history as dataframes.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, config:DriftMetricsConfig=None):
+        '''
+        This is the constructor for the DriftMetricsStore class.
+        '''
+        self.config = config or DriftMetricsConfig()
+        self._initialized = False
+    
+    # Creating a method to open a connection to the store
+    def connect(self):
+        '''
+        This method opens a connection to the store, creating the database and its tables
+        on first use.
+        '''
+        db_dir = os.path.dirname(self.config.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        conn = sqlite3.connect(self.config.db_path, timeout=DatabaseConfig().busy_timeout_ms / 1000.0)
+        apply_sqlite_pragmas(conn)
+        if not self._initialized:
+            for statement in DRIFT_METRICS_SCHEMA:
+                conn.execute(statement)
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(drift_runs)")}
+            for column, column_type in DRIFT_RUNS_ADDED_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE drift_runs ADD COLUMN {column} {column_type}")
+            conn.commit()
+            self._initialized = True
+        return conn
+    
+    # Creating a method to convert the columns of a drift result into metric rows
+    @staticmethod
+    def create_metric_rows(run_id:str, columns:dict)->list:
+        '''
+        This method converts the per-column results of a drift run into rows of the
+        drift_metrics table. The score of a statistical test is stored as its p-value and
+        the score of a distance as its statistic; the Kolmogorov-Smirnov test also keeps
+        its statistic.
+        '''
+        rows = []
+        for column, values in columns.items():
+            method = values.get('method')
+            score = values.get('score')
+            if method in P_VALUE_METHODS:
+                statistic, p_value = values.get('ks_statistic'), score
+            else:
+                statistic, p_value = score, None
+            rows.append((
+                run_id, column, method,
+                None if statistic is None else float(statistic),
+                None if p_value is None else float(p_value),
+                None if values.get('threshold') is None else float(values['threshold']),
+                int(bool(values.get('drift'))),
+                None if values.get('psi') is None else float(values['psi'])
+            ))
+        return rows
+    
+    # Creating a method to append a drift run to the store
+    def record_run(self, result:dict, window_start=None, window_end=None, report_path:str=None,
+                   model_name:str=None, model_version:str=None, resolve_model:bool=True)->str:
+        '''
+        This method appends a drift run and the metrics of its columns to the store. Unless
+        resolve_model is False, the model defaults to the latest trained model from the run
+        parameters.
+        ========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        result : dict - The drift result, with the engine, reference_rows, rows,
+        drifted_columns, drift_share, dataset_drift and the method, score, threshold and
+        drift decision of every column. When the data was sampled, its sampling entry holds
+        the total number of reference and current rows.
+        window_start : datetime or str - The start of the compared period.
+        window_end : datetime or str - The end of the compared period. Defaults to now.
+        report_path : str - The path of the report written by the run, if any.
+        model_name : str - The name of the model which made the predictions.
+        model_version : str - The registry version of the model.
+        resolve_model : bool - Whether a missing model is taken from the run parameters.
+        Runs over past windows, whose model is not known, should set it to False.
+        
+        ---------------------
+        Returns:
+        ---------------------
+        run_id : str - The identifier of the run in the store.
+        ========================================================================================
+        '''
+        try:
+            if resolve_model and model_name is None and model_version is None:
+                model_name, model_version = fetch_model_version(self.config.run_config_dir)
+            now = datetime.now(timezone.utc)
+            run_id = uuid.uuid4().hex
+            dataset_drift = result.get('dataset_drift')
+            sampling = result.get('sampling') or {}
+            run_row = {
+                'run_id': run_id,
+                'created_at': format_db_timestamp(now),
+                'engine': result.get('engine'),
+                'window_start': None if window_start is None else format_db_timestamp(window_start),
+                'window_end': format_db_timestamp(now if window_end is None else window_end),
+                'reference_rows': result.get('reference_rows'),
+                'current_rows': result.get('rows'),
+                'model_name': model_name,
+                'model_version': None if model_version is None else str(model_version),
+                'drifted_columns': result.get('drifted_columns'),
+                'drift_share': result.get('drift_share'),
+                'dataset_drift': None if dataset_drift is None else int(dataset_drift),
+                'report_path': report_path,
+                'reference_total_rows': sampling.get('reference_total_rows', result.get('reference_rows')),
+                'current_total_rows': sampling.get('current_total_rows', result.get('rows'))
+            }
+            metric_rows = self.create_metric_rows(run_id, result.get('columns', {}))
+            
+            with closing(self.connect()) as conn:
+                with conn:
+                    conn.execute(
+                        f"INSERT INTO drift_runs ({', '.join(run_row)}) VALUES ({', '.join('?' * len(run_row))})",
+                        tuple(run_row.values())
+                    )
+                    conn.executemany("INSERT INTO drift_metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?)", metric_rows)
+            
+            logging.info(f"Recorded drift run {run_id} with {len(metric_rows)} column metrics.")
+            return run_id
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to build the filter on the runs
+    @staticmethod
+    def _build_run_filter(start=None, end=None, engine:str=None)->tuple:
+        '''
+        This method returns the WHERE clause and parameters which select the runs whose
+        window ends at or after start and before end, computed by the given engine.
+        '''
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("r.window_end >= ?")
+            params.append(format_db_timestamp(start))
+        if end is not None:
+            clauses.append("r.window_end < ?")
+            params.append(format_db_timestamp(end))
+        if engine is not None:
+            clauses.append("r.engine = ?")
+            params.append(engine)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        return where, params
+    
+    # Creating a method to query the drift runs
+    def query_runs(self, start=None, end=None, engine:str=None)->pd.DataFrame:
+        '''
+        This method returns the drift runs whose window ends between start and end,
+        ordered by the end of their window.
+        '''
+        try:
+            where, params = self._build_run_filter(start, end, engine)
+            with closing(self.connect()) as conn:
+                df = pd.read_sql_query(
+                    f"SELECT r.* FROM drift_runs r{where} ORDER BY r.window_end, r.created_at",
+                    conn, params=params, parse_dates=['created_at', 'window_start', 'window_end']
+                )
+            df['dataset_drift'] = df['dataset_drift'].astype('boolean')
+            return df
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to query the per-column drift metrics
+    def query_metrics(self, column:str=None, start=None, end=None, engine:str=None)->pd.DataFrame:
+        '''
+        This method returns the per-column metrics of the drift runs whose window ends
+        between start and end, together with the window bounds, row counts and model of
+        their run, as a time series ordered by the end of the window.
+        ========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        column : str - Only the metrics of this column are returned.
+        start : datetime or str - Only runs whose window ends at or after start are returned.
+        end : datetime or str - Only runs whose window ends before end are returned.
+        engine : str - Only runs of this engine are returned.
+        
+        ---------------------
+        Returns:
+        ---------------------
+        metrics : Pandas dataframe - One row per run and column.
+        ========================================================================================
+        '''
+        try:
+            where, params = self._build_run_filter(start, end, engine)
+            if column is not None:
+                where += (' AND' if where else ' WHERE') + " m.column_name = ?"
+                params.append(column)
+            query = (
+                "SELECT r.run_id, r.engine, r.window_start, r.window_end, r.reference_rows, r.current_rows, "
+                "r.reference_total_rows, r.current_total_rows, r.model_name, r.model_version, m.column_name, "
+                f"m.method, m.statistic, m.p_value, m.threshold, m.drift, m.psi FROM drift_metrics m JOIN drift_runs r ON r.run_id = m.run_id{where} "
+                "ORDER BY r.window_end, r.created_at, m.column_name"
+            )
+            with closing(self.connect()) as conn:
+                df = pd.read_sql_query(query, conn, params=params, parse_dates=['window_start', 'window_end'])
+            df['drift'] = df['drift'].astype(bool)
+            return df
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to fetch the latest drift run
+    def latest_run(self, engine:str=None)->dict:
+        '''
+        This method returns the most recent drift run with the metrics of its columns,
+        or None if the store is empty.
+        '''
+        try:
+            where, params = self._build_run_filter(engine=engine)
+            with closing(self.connect()) as conn:
+                conn.row_factory = sqlite3.Row
+                run = conn.execute(
+                    f"SELECT r.* FROM drift_runs r{where} ORDER BY r.created_at DESC LIMIT 1", params
+                ).fetchone()
+                if run is None:
+                    return None
+                metrics = conn.execute(
+                    "SELECT * FROM drift_metrics WHERE run_id = ? ORDER BY column_name", (run['run_id'],)
+                ).fetchall()
+            result = dict(run)
+            result['columns'] = {row['column_name']: dict(row) for row in metrics}
+            return result
+        
+        except Exception as e:
+            raise CustomException(e, sys)
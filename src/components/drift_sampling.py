@@ -0,0 +1,127 @@
+# Importing packages
+import sys
+import numpy as np
+import pandas as pd
+from src.components.config_entity import DriftSamplingConfig
+from src.exception import CustomException
+from src.logger import logging
+
+# Creating a function to compute how many rows fit in the sampling budget
+def compute_sample_size(bytes_per_row:float, config:DriftSamplingConfig=None)->int:
+    '''
+    This function returns the number of rows of one dataset which fit in its half of the
+    memory budget and, if a time budget is set, in its half of the time budget.
+    ========================================================================================
+    ---------------------
+    Parameters:
+    ---------------------
+    bytes_per_row : float - The size of one row in the dataframe.
+    config : DriftSamplingConfig - This is the sampling configuration.
+    
+    ---------------------
+    Returns:
+    ---------------------
+    sample_size : int - The maximum number of rows of the dataset.
+    ========================================================================================
+    '''
+    config = config or DriftSamplingConfig()
+    budget_bytes = config.memory_budget_mb * 1024 * 1024 / 2
+    sample_size = int(budget_bytes / max(bytes_per_row * config.memory_overhead, 1.0))
+    if config.time_budget_seconds is not None:
+        sample_size = min(sample_size, int(config.time_budget_seconds * config.rows_per_second / 2))
+    return max(sample_size, 1)
+
+# Creating a function to measure the size of the rows of a dataframe
+def measure_bytes_per_row(df:pd.DataFrame)->float:
+    '''
+    This function returns the average size of one row of the dataframe, including the
+    contents of the text columns.
+    '''
+    return float(df.memory_usage(index=False, deep=True).sum()) / max(len(df), 1)
+
+# Creating a function to sample a dataframe per stratum
+def stratified_sample(df:pd.DataFrame, sample_size:int, strata:tuple, seed:int)->pd.DataFrame:
+    '''
+    This function draws a sample of about sample_size rows in which every combination of
+    the strata columns keeps its share of the dataframe. Rows with missing strata form
+    their own stratum. The dataframe is returned unchanged if it is not larger than
+    sample_size.
+    ========================================================================================
+    ---------------------
+    Parameters:
+    ---------------------
+    df : Pandas dataframe - The data to sample.
+    sample_size : int - The number of rows to draw.
+    strata : tuple - The columns whose combinations are sampled separately.
+    seed : int - The random seed, so that the same rows are drawn on every run.
+    
+    ---------------------
+    Returns:
+    ---------------------
+    sample : Pandas dataframe - The sampled rows, in their original order.
+    ========================================================================================
+    '''
+    try:
+        if len(df) <= sample_size:
+            return df
+        fraction = sample_size / len(df)
+        sample = (
+            df.groupby(list(strata), dropna=False, observed=True, group_keys=False)
+            .sample(frac=fraction, random_state=seed)
+        )
+        return sample.sort_index()
+    
+    except Exception as e:
+        raise CustomException(e, sys)
+
+# Creating a function to sample a stream of chunks with a reservoir
+def reservoir_sample(chunks, config:DriftSamplingConfig=None, sample_size:int=None)->tuple:
+    '''
+    This function draws a uniform sample without replacement from a stream of dataframe
+    chunks whose total length is unknown, holding at most one chunk and the reservoir in
+    memory. Every row gets a random key and the reservoir keeps the rows with the
+    smallest keys, which is equivalent to classic reservoir sampling but can be applied
+    a whole chunk at a time. Without sample_size, the size of the reservoir is computed
+    from the memory budget using the rows of the first chunk.
+    ========================================================================================
+    ---------------------
+    Parameters:
+    ---------------------
+    chunks : iterator of Pandas dataframes - The stream to sample.
+    config : DriftSamplingConfig - This is the sampling configuration.
+    sample_size : int - The size of the reservoir.
+    
+    ---------------------
+    Returns:
+    ---------------------
+    sample : Pandas dataframe - The sampled rows, in stream order.
+    total_rows : int - The number of rows in the stream.
+    ========================================================================================
+    '''
+    try:
+        config = config or DriftSamplingConfig()
+        rng = np.random.default_rng(config.seed)
+        reservoir, empty = None, None
+        total_rows = 0
+        for chunk in chunks:
+            if chunk.empty:
+                empty = chunk
+                continue
+            if sample_size is None:
+                sample_size = compute_sample_size(measure_bytes_per_row(chunk), config)
+            chunk = chunk.reset_index(drop=True)
+            chunk.index = pd.RangeIndex(total_rows, total_rows + len(chunk))
+            chunk['_key'] = rng.random(len(chunk))
+            total_rows += len(chunk)
+            reservoir = chunk if reservoir is None else pd.concat([reservoir, chunk])
+            if len(reservoir) > sample_size:
+                reservoir = reservoir.nsmallest(sample_size, '_key')
+        
+        if reservoir is None:
+            return (pd.DataFrame() if empty is None else empty.reset_index(drop=True)), 0
+        sample = reservoir.drop(columns='_key').sort_index().reset_index(drop=True)
+        logging.info(f"Sampled {len(sample)} of {total_rows} streamed rows.")
+        return sample, total_rows
+    
+    except Exception as e:
+        raise CustomException(e, sys)
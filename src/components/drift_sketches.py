@@ -0,0 +1,290 @@
+# Importing packages
+import sys
+import os
+import json
+import time
+import atexit
+import socket
+import threading
+import pandas as pd
+from src.components.config_entity import DriftSketchConfig
+from src.components.config_entity import DriftAggregatesConfig
+from src.components.drift_aggregates import FeatureAggregates
+from src.exception import CustomException
+from src.logger import logging
+
+# Creating a class to maintain the drift sketches of the served requests
+class OnlineDriftSketches():
+    '''
+    This class maintains, in memory, sketches of the distributions of the served requests
+    and their predictions: fixed-bin histograms for the episode length and the predicted
+    listening time and count tables for the categorical features, on the same bins as the
+    reference profile. The sketches are kept per time bucket, so the sketch of any recent
+    period is the merge of its buckets. A background thread writes the sketches of the
+    process to its own checkpoint file, and the checkpoints of all worker processes can be
+    merged to answer drift queries without reading the prediction log.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, config:DriftSketchConfig=None, aggregates_config:DriftAggregatesConfig=None):
+        '''
+        This is the constructor for the OnlineDriftSketches class.
+        '''
+        self.config = config or DriftSketchConfig()
+        self.aggregates_config = aggregates_config or DriftAggregatesConfig()
+        self.buckets = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._exit_registered = False
+        self._dirty = False
+        self.rows = 0
+        self.checkpoints = 0
+        self.last_checkpoint_seconds = 0.0
+    
+    # Creating a property for the checkpoint file of this process
+    @property
+    def file_name(self)->str:
+        '''
+        This property returns the name of the checkpoint file of this process. It is
+        evaluated on use, so that forked worker processes write to their own files.
+        '''
+        return f"sketch-{socket.gethostname()}-{os.getpid()}.json"
+    
+    # Creating a method to fetch the bucket of a timestamp
+    def fetch_bucket(self, timestamp)->int:
+        '''
+        This method returns the start of the time bucket of the timestamp, in seconds
+        since the epoch. Naive timestamps are taken to be in UTC.
+        '''
+        if timestamp is None:
+            seconds = time.time()
+        elif isinstance(timestamp, (int, float)):
+            seconds = float(timestamp)
+        else:
+            timestamp = pd.Timestamp(timestamp)
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.tz_localize('UTC')
+            seconds = timestamp.timestamp()
+        return int(seconds // self.config.bucket_seconds) * self.config.bucket_seconds
+    
+    # Creating a method to add served requests to the sketches
+    def update(self, records:list, preds:list):
+        '''
+        This method adds served requests and their predictions to the sketches of the
+        time buckets of their created_at.
+        =========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        records : list - The request rows, as dictionaries with the columns of the data table.
+        preds : list - The prediction for every request row.
+        =========================================================================================
+        '''
+        groups = {}
+        for record, pred in zip(records, preds):
+            bucket = self.fetch_bucket(record.get('created_at'))
+            bucket_records, bucket_preds = groups.setdefault(bucket, ([], []))
+            bucket_records.append(record)
+            bucket_preds.append(float(pred))
+        with self._lock:
+            for bucket, (bucket_records, bucket_preds) in groups.items():
+                aggregates = self.buckets.get(bucket)
+                if aggregates is None:
+                    aggregates = FeatureAggregates(self.aggregates_config)
+                    self.buckets[bucket] = aggregates
+                aggregates.update_records(bucket_records, bucket_preds)
+            self.rows += len(records)
+            self._dirty = True
+    
+    # Creating a method to drop the expired buckets
+    def prune(self, now:float=None):
+        '''
+        This method drops the buckets older than the retention period.
+        '''
+        oldest = self.fetch_bucket((now or time.time()) - self.config.retention_seconds)
+        with self._lock:
+            for bucket in [bucket for bucket in self.buckets if bucket < oldest]:
+                del self.buckets[bucket]
+    
+    # Creating a method to merge other sketches into these
+    def merge(self, other:'OnlineDriftSketches'):
+        '''
+        This method merges the buckets of other sketches, built on the same bucket size,
+        into these.
+        '''
+        if other.config.bucket_seconds != self.config.bucket_seconds:
+            raise ValueError('Sketches with different bucket sizes cannot be merged.')
+        with self._lock:
+            for bucket, aggregates in other.buckets.items():
+                if bucket not in self.buckets:
+                    self.buckets[bucket] = FeatureAggregates(self.aggregates_config)
+                self.buckets[bucket].merge(aggregates)
+    
+    # Creating a method to merge the buckets of a period
+    def window(self, start=None, end=None)->FeatureAggregates:
+        '''
+        This method merges the buckets which overlap the period from start to end. The
+        period is rounded out to whole buckets; without a start or an end, it is unbounded
+        on that side.
+        '''
+        first = None if start is None else self.fetch_bucket(start)
+        last = None if end is None else self.fetch_bucket(end)
+        merged = FeatureAggregates(self.aggregates_config)
+        with self._lock:
+            for bucket, aggregates in self.buckets.items():
+                if first is not None and bucket < first:
+                    continue
+                if last is not None and bucket > last:
+                    continue
+                merged.merge(aggregates)
+        return merged
+    
+    # Creating methods to convert the sketches to and from a dictionary
+    def to_dict(self)->dict:
+        '''
+        This method returns the sketches as a JSON serializable dictionary.
+        '''
+        with self._lock:
+            return {
+                'bucket_seconds': self.config.bucket_seconds,
+                'buckets': {str(bucket): aggregates.to_dict() for bucket, aggregates in sorted(self.buckets.items())}
+            }
+    
+    @classmethod
+    def from_dict(cls, data:dict, config:DriftSketchConfig=None,
+                  aggregates_config:DriftAggregatesConfig=None)->'OnlineDriftSketches':
+        '''
+        This method rebuilds the sketches from the dictionary written by to_dict. The
+        bucket size must match the configuration.
+        '''
+        sketches = cls(config, aggregates_config)
+        if data['bucket_seconds'] != sketches.config.bucket_seconds:
+            raise ValueError('The checkpoint was written with a different bucket size.')
+        sketches.buckets = {
+            int(bucket): FeatureAggregates.from_dict(values, sketches.aggregates_config)
+            for bucket, values in data['buckets'].items()
+        }
+        return sketches
+    
+    # Creating a method to write the sketches of this process to disk
+    def checkpoint(self, force:bool=False)->bool:
+        '''
+        This method drops the expired buckets and writes the sketches of this process to
+        its checkpoint file with an atomic replace, if they changed since the last
+        checkpoint. Checkpoints of other processes which expired are removed. It returns
+        True if a checkpoint was written.
+        '''
+        try:
+            if not (self._dirty or force):
+                return False
+            start = time.perf_counter()
+            self.prune()
+            self._dirty = False
+            state = self.to_dict()
+            os.makedirs(self.config.sketch_dir, exist_ok=True)
+            file_path = os.path.join(self.config.sketch_dir, self.file_name)
+            with open(file_path + '.tmp', 'w') as file_obj:
+                json.dump(state, file_obj)
+            os.replace(file_path + '.tmp', file_path)
+            
+            # Removing the checkpoints of stopped processes once all their buckets expired
+            expiry = time.time() - self.config.retention_seconds - self.config.bucket_seconds
+            for file_name in os.listdir(self.config.sketch_dir):
+                other_path = os.path.join(self.config.sketch_dir, file_name)
+                if file_name.endswith('.json') and os.path.getmtime(other_path) < expiry:
+                    os.remove(other_path)
+            
+            self.checkpoints += 1
+            self.last_checkpoint_seconds = time.perf_counter() - start
+            return True
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to load and merge the checkpoints of all processes
+    @classmethod
+    def load(cls, config:DriftSketchConfig=None, aggregates_config:DriftAggregatesConfig=None,
+             exclude:str=None)->'OnlineDriftSketches':
+        '''
+        This method merges the checkpoints of every process in sketch_dir, except the
+        checkpoint file named exclude, into one set of sketches.
+        '''
+        try:
+            merged = cls(config, aggregates_config)
+            if not os.path.isdir(merged.config.sketch_dir):
+                return merged
+            for file_name in sorted(os.listdir(merged.config.sketch_dir)):
+                if not file_name.endswith('.json') or file_name == exclude:
+                    continue
+                with open(os.path.join(merged.config.sketch_dir, file_name), 'r') as file_obj:
+                    merged.merge(cls.from_dict(json.load(file_obj), merged.config, merged.aggregates_config))
+            merged.prune()
+            return merged
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to merge the checkpoints of the other processes with these sketches
+    def collect(self)->'OnlineDriftSketches':
+        '''
+        This method returns the sketches of all processes: the checkpoints of the other
+        processes merged with the live, in-memory sketches of this one.
+        '''
+        merged = self.load(self.config, self.aggregates_config, exclude=self.file_name)
+        merged.merge(self.from_dict(self.to_dict(), self.config, self.aggregates_config))
+        return merged
+    
+    # Creating the loop of the checkpoint thread
+    def _run(self):
+        '''
+        This method is the loop of the background checkpoint thread.
+        '''
+        while not self._stop_event.wait(self.config.checkpoint_interval):
+            try:
+                self.checkpoint()
+            except Exception as e:
+                logging.error(f"The drift sketches could not be checkpointed: {e}")
+    
+    # Creating a method to start the checkpoint thread
+    def start(self):
+        '''
+        This method starts the background checkpoint thread and registers a final
+        checkpoint on shutdown.
+        '''
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='drift-sketches', daemon=True)
+        self._thread.start()
+        if not self._exit_registered:
+            atexit.register(self.stop)
+            self._exit_registered = True
+    
+    # Creating a method to stop the checkpoint thread
+    def stop(self):
+        '''
+        This method stops the background checkpoint thread and writes a final checkpoint.
+        '''
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        try:
+            self.checkpoint()
+        except Exception as e:
+            logging.error(f"The drift sketches could not be checkpointed on shutdown: {e}")
+    
+    # Creating a method to report the sketch metrics
+    def stats(self)->dict:
+        '''
+        This method returns the number of buckets and sketched rows and the checkpoint
+        statistics.
+        '''
+        with self._lock:
+            return {
+                'buckets': len(self.buckets),
+                'rows': self.rows,
+                'checkpoints': self.checkpoints,
+                'last_checkpoint_seconds': self.last_checkpoint_seconds
+            }
@@ -1,11 +1,19 @@
 # Importing packages
 import sys
+import numpy as np
 import pandas as pd
 import sklearn
 sklearn.set_config(transform_output='pandas')
-from sklearn.experimental import enable_halving_search_cv
-from sklearn.model_selection import HalvingGridSearchCV
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid
+from sklearn.linear_model import BayesianRidge
 from src.components.config_entity import ModelTrainerConfig
+from src.components.config_entity import ModelSearchConfig
+from src.components.bayesian_ridge_solver import SufficientStatistics, BayesianRidgeSolver
+from src.components.bayesian_ridge_solver import BAYESIAN_RIDGE_LOOP_PARAMS
+from src.components.search_strategies import CrossValidationEvaluator, FactorizedEvaluator
+from src.components.search_strategies import PreprocessedEvaluator
+from src.components.search_strategies import SearchBudget, SearchRun, SEARCH_STRATEGIES
 from src.exception import CustomException
 from src.logger import logging 
 
@@ -17,12 +25,162 @@ class FindBestModel():
     class has one method (other than the constructor) - find_best_model. 
     '''
     # Creating the constructor for the class
-    def __init__(self):
+    def __init__(self, search_config:ModelSearchConfig=None):
         '''
         This is the constructor for the FindBestModel class. The constructor
-        initializes the path to which the model will be stored.
+        initializes the path to which the model will be stored and the configuration
+        of the search.
         '''
         self.model_trainer_config = ModelTrainerConfig()
+        self.search_config = search_config or ModelSearchConfig()
+        self.cv_results = None
+        self.search_summary = None
+        self.search_trace = None
+        self.preprocessor = None
+    
+    # Creating a method to check whether the factorized search applies
+    @staticmethod
+    def can_factorize(estimator, params)->bool:
+        '''
+        This method returns True if the estimator is a BayesianRidge with an intercept and
+        the grid only changes the parameters of its evidence maximization loop, which is
+        when every candidate can be fitted from the same decomposition of a fold.
+        '''
+        if type(estimator) is not BayesianRidge or not estimator.get_params()['fit_intercept']:
+            return False
+        grids = params if isinstance(params, list) else [params]
+        return all(set(grid) <= set(BAYESIAN_RIDGE_LOOP_PARAMS) for grid in grids)
+    
+    # Creating a method to create the search strategy
+    def create_strategy(self):
+        '''
+        This method returns the search strategy of the configuration. The strategy is
+        either the name of a built-in strategy or an object with a search method.
+        '''
+        strategy = self.search_config.strategy
+        if not isinstance(strategy, str):
+            return strategy
+        if strategy not in SEARCH_STRATEGIES:
+            raise ValueError(f"Unknown search strategy '{strategy}', expected one of {sorted(SEARCH_STRATEGIES)}.")
+        return SEARCH_STRATEGIES[strategy](self.search_config)
+    
+    # Creating a method to collect the results of a search
+    def collect_results(self, run:SearchRun):
+        '''
+        This method stores the evaluated candidates in cv_results and the score of every
+        evaluation against the time and fits spent in search_trace, and returns the index
+        of the best candidate. Only the candidates scored on the most rows compete, and
+        scores within round-off of the best are ties, which go to the first candidate as
+        in a grid search.
+        '''
+        results = run.results
+        self.cv_results = {
+            'params': [result['params'] for result in results],
+            'mean_test_score': np.array([result['mean_test_score'] for result in results]),
+            'std_test_score': np.array([result['std_test_score'] for result in results]),
+            'split_test_scores': np.column_stack([result['split_test_scores'] for result in results]),
+            'n_samples': np.array([result['n_samples'] for result in results])
+        }
+        if all('model_key' in result for result in results):
+            first_of = {}
+            for index, result in enumerate(results):
+                first_of.setdefault(result['model_key'], index)
+            self.cv_results['split_n_iter'] = np.array([result['split_n_iter'] for result in results])
+            self.cv_results['equivalent_to'] = np.array([first_of[result['model_key']] for result in results])
+        
+        # Tracing the best score so far among the candidates scored on as many rows
+        best_scores = {}
+        self.search_trace = []
+        for result in results:
+            best_score = max(best_scores.get(result['n_samples'], -np.inf), result['mean_test_score'])
+            best_scores[result['n_samples']] = best_score
+            self.search_trace.append({
+                'seconds': result['seconds'],
+                'fits': result['fits'],
+                'n_samples': result['n_samples'],
+                'score': result['mean_test_score'],
+                'best_score': best_score
+            })
+        
+        scores = np.where(
+            self.cv_results['n_samples'] == self.cv_results['n_samples'].max(),
+            self.cv_results['mean_test_score'], -np.inf
+        )
+        best_score = scores.max()
+        return int(np.argmax(scores >= best_score - 1e-9 * abs(best_score)))
+    
+    # Creating a method to run the search strategy over an evaluator
+    def run_search(self, evaluator, params:dict, method:str, budget:SearchBudget)->dict:
+        '''
+        This method runs the configured search strategy over the candidates of the grid,
+        scoring them with the evaluator within the budget, records the results and the
+        summary of the search, and returns the best parameters.
+        '''
+        candidates = list(ParameterGrid(params))
+        strategy = self.create_strategy()
+        run = SearchRun(evaluator, budget, self.search_config.verbose)
+        strategy.search(run, candidates)
+        
+        best_index = self.collect_results(run)
+        self.search_summary = {
+            'method': method,
+            'strategy': type(strategy).__name__,
+            'candidates': len(candidates),
+            'evaluated': len(run.results),
+            'distinct_models': len(run.results) - run.skipped_fits // evaluator.n_splits,
+            'folds': evaluator.n_splits,
+            'fits': run.fits + 1,
+            'skipped_fits': run.skipped_fits,
+            'best_score': float(self.cv_results['mean_test_score'][best_index]),
+            'budget_exhausted': run.exhausted,
+            'seconds': budget.elapsed()
+        }
+        return self.cv_results['params'][best_index]
+    
+    # Creating a method to find the best model from the sufficient statistics of the folds
+    def find_best_model_from_statistics(self, estimator, params:dict, fold_stats:list, feature_names:list=None):
+        '''
+        This method finds the best BayesianRidge model from the sufficient statistics of
+        the training and test rows of every fold, without the rows themselves, so that the
+        training set does not have to fit in memory. The best candidate is fitted from the
+        statistics of every row, which are the merged statistics of the test folds.
+        =================================================================================
+        ----------------
+        Parameters:
+        ----------------
+        estimator : BayesianRidge - The model whose parameters are searched.
+        params : dict - This is the dictionary containing the hyperparameters for the model.
+        fold_stats : list - The statistics of the training and test rows of every fold.
+        feature_names : list - The names of the features, in the order of the statistics.
+        
+        ----------------
+        Returns:
+        ----------------
+        best_model : scikit-learn model - This is the best model found.
+        best_params : dict - This is the dictionary containing the best parameters.
+        =================================================================================
+        '''
+        try:
+            if not self.can_factorize(estimator, params):
+                raise ValueError('Only BayesianRidge grids over the priors and convergence settings can be '
+                                 'searched from sufficient statistics.')
+            budget = SearchBudget(self.search_config.max_seconds, self.search_config.max_fits)
+            full_stats = SufficientStatistics.combine([test_stats for _, test_stats in fold_stats])
+            evaluator = FactorizedEvaluator(estimator, fold_stats, full_stats.n)
+            best_params = self.run_search(evaluator, params, 'factorized', budget)
+            best_model = BayesianRidgeSolver(full_stats).create_estimator(
+                dict(estimator.get_params(), **best_params), feature_names
+            )
+            self.search_summary['seconds'] = budget.elapsed()
+            logging.info(f"Best model found from sufficient statistics: {self.search_summary}")
+            
+            return (
+                best_model,
+                best_params
+                )
+        
+        except Exception as e:
+            raise CustomException(e, sys)
     
     # Creating a method to find the best model
     def find_best_model(
@@ -31,10 +189,22 @@ class FindBestModel():
         params:dict,
         train_set:pd.DataFrame,
         target_set:pd.DataFrame,
-        cv:int=5
+        cv:int=5,
+        factorized:bool=True,
+        preprocessor=None
         ):
         '''
-        This method is used to find the best model, given the hyperparameters.
+        This method is used to find the best model, given the hyperparameters. The
+        candidates of the grid are proposed by the configured search strategy and scored
+        by the mean squared error over the folds until the grid or the budget is spent,
+        and the best candidate is refitted on the whole training set. search_summary and
+        search_trace record what the search spent and found.
+        
+        With a preprocessor, the training dataset holds the raw features and the
+        preprocessor is fitted on the training rows of every fold, so the scores do not
+        leak; the transformed folds are cached and shared by every candidate. The best
+        model is then refitted on the features transformed by a copy of the preprocessor
+        fitted on the whole training set, which is kept in the preprocessor attribute.
         =================================================================================
         ----------------
         Parameters:
@@ -43,6 +213,11 @@ class FindBestModel():
         train_set : pandas dataframe - This is the training dataset.
         target_set : pandas dataframe - This is the target dataset.
         cv : int - This is the number of cross-validation folds.
+        factorized : bool - This determines whether a BayesianRidge grid which only changes
+        the priors and convergence settings is scored from one decomposition per fold.
+        Other estimators and grids are always fitted on every fold.
+        preprocessor : scikit-learn transformer - The unfitted preprocessor of the raw
+        features, if the training dataset is not transformed yet.
         
         ----------------
         Returns:
@@ -54,26 +229,39 @@ class FindBestModel():
         '''
         try:
             logging.info('Starting the search for the best model.')
+            config = self.search_config
+            budget = SearchBudget(config.max_seconds, config.max_fits)
             
-            # Instantiating a Grid Search CV object
-            grid_search = HalvingGridSearchCV(
-                estimator=estimator,
-                param_grid=params,
-                cv=cv,
-                scoring='neg_mean_squared_error',
-                refit=True,
-                verbose=3,
-                n_jobs=-1
-            )
-            
-            # Fitting the grid search object to the training data
-            grid_search.fit(train_set, target_set)
+            # Choosing how the candidates are scored
+            factorized = factorized and self.can_factorize(estimator, params)
+            if preprocessor is not None:
+                method = 'factorized' if factorized else 'cross_validation'
+                evaluator = PreprocessedEvaluator(
+                    estimator, preprocessor, train_set, target_set, cv, config.n_jobs, config.verbose,
+                    config.random_state, config.preprocessing_cache_dir, factorized
+                )
+            elif factorized:
+                method = 'factorized'
+                evaluator = FactorizedEvaluator.from_data(estimator, train_set, target_set, cv)
+            else:
+                method = 'cross_validation'
+                evaluator = CrossValidationEvaluator(
+                    estimator, train_set, target_set, cv, config.n_jobs, config.verbose, config.random_state
+                )
             
-            # Extracting the best model and best parameters
-            best_model = grid_search.best_estimator_
-            best_params = grid_search.best_params_
+            # Running the search strategy within the budget and refitting the best candidate
+            best_params = self.run_search(evaluator, params, method, budget)
+            if preprocessor is not None:
+                self.preprocessor = clone(preprocessor)
+                train_set = self.preprocessor.fit_transform(train_set, target_set)
+            best_model = clone(estimator).set_params(**best_params).fit(train_set, target_set)
+            self.search_summary.update({
+                'preprocessor_fits': getattr(evaluator, 'preprocessor_fits', 0) + (preprocessor is not None),
+                'preprocessing_cache_hits': getattr(evaluator, 'cache_hits', 0),
+                'seconds': budget.elapsed()
+            })
             
-            logging.info('Best model found.')
+            logging.info(f"Best model found: {self.search_summary}")
             
             return (
                 best_model, 
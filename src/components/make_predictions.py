@@ -1,16 +1,384 @@
 # Importing packages
 import sys
+import os
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+import numpy as np
 import pandas as pd
-import mlflow
-import dagshub
 import joblib
 from src.components.config_entity import ModelURIConfig
 from src.components.config_entity import DataTransformationConfig
+from src.components.config_entity import ModelStoreConfig
+from src.components.config_entity import PredictionCacheConfig
+from src.components.model_cache import ModelCache
+from src.components.compile_model import CompileLinearModel
 from src.components.transform_data import TransformData
 from src.utils import load_run_params
 from src.utils import read_json_file
 from src.exception import CustomException
 from src.logger import logging
+from src.metrics import stage_timer
+
+# Creating a class to hold one loaded version of the preprocessor and the model
+@dataclass(frozen=True)
+class LoadedModel():
+    '''
+    This class holds a single loaded version of the serving objects. Instances are
+    immutable so that a reader always sees a consistent preprocessor and model pair.
+    '''
+    model_uri : str
+    run_params : dict
+    signature : tuple
+    preprocessor : object
+    model : object
+    compiled : object = None
+
+
+# Creating a class to share the preprocessor and model across requests
+class ModelStore():
+    '''
+    This class is a thread-safe, process-wide holder for the preprocessor object and
+    the latest model. The objects are loaded once per process and keyed by the model_uri
+    in the latest run_config/run_params_*.json file. A new version is only loaded when
+    that file changes, and is swapped in atomically once it has fully loaded.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, config:ModelStoreConfig=None):
+        '''
+        This is the constructor for the ModelStore class.
+        '''
+        self.config = config or ModelStoreConfig()
+        self.preprocessor_obj_path = DataTransformationConfig().preprocessor_obj_path
+        self.model_cache = ModelCache()
+        self._lock = threading.Lock()
+        self._loaded = None
+        self._last_checked = 0.0
+    
+    # Creating a method to fetch the signature of the latest run parameters file
+    def fetch_run_params_signature(self):
+        '''
+        This method returns a signature for the latest run parameters file, which
+        changes whenever a new file is written or the existing file is modified.
+        ===================================================================================
+        ----------------
+        Returns:
+        ----------------
+        signature : tuple - The path, modification time and size of the latest run
+        parameters file.
+        ===================================================================================
+        '''
+        try:
+            latest_file = load_run_params(self.config.run_config_dir)
+            file_stat = os.stat(latest_file)
+            return (str(latest_file), file_stat.st_mtime_ns, file_stat.st_size)
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to load the model from the local model cache
+    def load_model(self, model_uri:str):
+        '''
+        This method loads the model for the given model uri from the local model cache,
+        which downloads it from the model registry only if it is not cached yet.
+        ===================================================================================
+        ----------------
+        Parameters:
+        ----------------
+        model_uri : str - This is the uri of the model to load.
+        
+        ----------------
+        Returns:
+        ----------------
+        model : mlflow pyfunc model - This is the loaded model.
+        ===================================================================================
+        '''
+        try:
+            return self.model_cache.load_model(model_uri)
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to load the scikit-learn model from the local model cache
+    def load_sklearn_model(self, model_uri:str):
+        '''
+        This method loads the model for the given model uri as a native scikit-learn
+        estimator, which is needed to compile it.
+        '''
+        return self.model_cache.load_sklearn_model(model_uri)
+    
+    # Creating a method to compile the preprocessor and model
+    def compile_model(self, preprocessor_obj, model_uri:str):
+        '''
+        This method compiles the preprocessor object and the model into lookup tables and
+        verifies them against the full pipeline. None is returned if the model cannot be
+        compiled, in which case the full pipeline is used for predictions.
+        ===================================================================================
+        ----------------
+        Parameters:
+        ----------------
+        preprocessor_obj : scikit-learn ColumnTransformer - The fitted preprocessor object.
+        model_uri : str - This is the uri of the model to compile.
+        
+        ----------------
+        Returns:
+        ----------------
+        compiled_model : CompiledLinearModel - The compiled model, or None.
+        ===================================================================================
+        '''
+        try:
+            sk_model = self.load_sklearn_model(model_uri)
+            compiler = CompileLinearModel(tolerance=self.config.compiled_model_tolerance)
+            compiled_model = compiler.compile_model(preprocessor_obj, sk_model)
+            max_difference = compiler.verify_compiled_model(compiled_model, preprocessor_obj, sk_model)
+            logging.info(f"Compiled model for {model_uri} verified (max difference {max_difference:.2e}).")
+            return compiled_model
+        
+        except Exception as e:
+            logging.warning(f"Model {model_uri} could not be compiled, using the full pipeline: {e}")
+            return None
+    
+    # Creating a method to (re)load the serving objects
+    def _refresh(self, signature:tuple)->LoadedModel:
+        '''
+        This method reloads the serving objects for the given run parameters signature.
+        It must be called while holding the lock.
+        '''
+        runs_data = read_json_file(signature[0])
+        model_uri = runs_data['model_uri']
+        current = self._loaded
+        
+        # The file changed, but it still points to the same model
+        if current is not None and current.model_uri == model_uri:
+            loaded = LoadedModel(
+                model_uri=model_uri,
+                run_params=runs_data,
+                signature=signature,
+                preprocessor=current.preprocessor,
+                model=current.model,
+                compiled=current.compiled
+            )
+        else:
+            logging.info(f"Loading the preprocessor and model for {model_uri}.")
+            preprocessor_obj = joblib.load(self.preprocessor_obj_path)
+            model = self.load_model(model_uri)
+            compiled_model = None
+            if self.config.use_compiled_model:
+                compiled_model = self.compile_model(preprocessor_obj, model_uri)
+            loaded = LoadedModel(
+                model_uri=model_uri,
+                run_params=runs_data,
+                signature=signature,
+                preprocessor=preprocessor_obj,
+                model=model,
+                compiled=compiled_model
+            )
+            logging.info(f"Model {model_uri} loaded into the model store.")
+        
+        # Swapping the reference is atomic, so readers never see a partial version
+        self._loaded = loaded
+        return loaded
+    
+    # Creating a method to fetch the current serving objects
+    def get(self)->LoadedModel:
+        '''
+        This method returns the currently loaded preprocessor and model, loading them
+        on first use and reloading them when the latest run parameters file changes.
+        The run parameters file is checked at most once per reload_check_interval.
+        ===================================================================================
+        ----------------
+        Returns:
+        ----------------
+        loaded : LoadedModel - The preprocessor, model and model uri currently in use.
+        ===================================================================================
+        '''
+        try:
+            loaded = self._loaded
+            now = time.monotonic()
+            if loaded is not None and now - self._last_checked < self.config.reload_check_interval:
+                return loaded
+            
+            signature = self.fetch_run_params_signature()
+            if loaded is not None and loaded.signature == signature:
+                self._last_checked = now
+                return loaded
+            
+            with self._lock:
+                # Another thread may have reloaded while this one was waiting
+                loaded = self._loaded
+                if loaded is None or loaded.signature != signature:
+                    loaded = self._refresh(signature)
+                self._last_checked = now
+                return loaded
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to drop the loaded objects
+    def clear(self):
+        '''
+        This method drops the loaded objects so that the next call to get reloads them.
+        '''
+        with self._lock:
+            self._loaded = None
+            self._last_checked = 0.0
+
+
+# Creating the process-wide model store
+model_store = ModelStore()
+
+
+# Creating a class to memoize predictions
+class PredictionCache():
+    '''
+    This class is a bounded, thread-safe LRU cache of predictions. Entries are keyed by
+    the normalized feature tuple of an episode and are only valid for the model version
+    they were computed with, so the whole cache is dropped when the model changes. An
+    optional ttl expires entries after a fixed number of seconds.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, config:PredictionCacheConfig=None):
+        '''
+        This is the constructor for the PredictionCache class.
+        '''
+        self.config = config or PredictionCacheConfig()
+        self.feature_columns = [
+            'Podcast_Name',
+            'Episode_Length_minutes',
+            'Genre',
+            'Publication_Day',
+            'Publication_Time'
+        ]
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._model_uri = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    # Creating a method to build the normalized keys of a feature dataframe
+    def create_keys(self, features:pd.DataFrame)->list:
+        '''
+        This method returns one normalized key per row of the feature dataframe. String
+        features are converted to str, the episode length is converted to a float and a
+        missing episode length is represented by None.
+        ===================================================================================
+        ----------------
+        Parameters:
+        ----------------
+        features : pandas dataframe - This is the feature data, with one row per episode.
+        
+        ----------------
+        Returns:
+        ----------------
+        keys : list - The normalized feature tuple of every row.
+        ===================================================================================
+        '''
+        keys = []
+        columns = [features[col].tolist() for col in self.feature_columns]
+        for name, length, genre, day, pub_time in zip(*columns):
+            length = None if length is None or length != length else float(length)
+            keys.append((str(name), length, str(genre), str(day), str(pub_time)))
+        return keys
+    
+    # Creating a method to drop every entry if the model has changed
+    def _check_model(self, model_uri:str):
+        '''
+        This method drops every entry when the model version differs from the one the
+        entries were computed with. It must be called while holding the lock.
+        '''
+        if model_uri != self._model_uri:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._model_uri = model_uri
+    
+    # Creating a method to look up predictions
+    def get_many(self, model_uri:str, keys:list)->list:
+        '''
+        This method returns the cached prediction for every key, or None for a miss.
+        ===================================================================================
+        ----------------
+        Parameters:
+        ----------------
+        model_uri : str - This is the uri of the model that is currently serving.
+        keys : list - The normalized feature tuples to look up.
+        
+        ----------------
+        Returns:
+        ----------------
+        preds : list - The cached predictions, with None for every miss.
+        ===================================================================================
+        '''
+        now = time.monotonic()
+        ttl = self.config.ttl_seconds
+        preds = []
+        with self._lock:
+            self._check_model(model_uri)
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and (ttl <= 0 or now - entry[1] < ttl):
+                    self._entries.move_to_end(key)
+                    preds.append(entry[0])
+                    self.hits += 1
+                else:
+                    if entry is not None:
+                        del self._entries[key]
+                    preds.append(None)
+                    self.misses += 1
+        return preds
+    
+    # Creating a method to store predictions
+    def put_many(self, model_uri:str, keys:list, preds:list):
+        '''
+        This method stores the predictions for the given keys, evicting the least recently
+        used entries once the cache is full. Predictions made with a model that is no
+        longer serving are not stored.
+        '''
+        if self.config.max_size <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if model_uri != self._model_uri:
+                return
+            for key, pred in zip(keys, preds):
+                self._entries[key] = (pred, now)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.config.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    # Creating a method to drop every entry
+    def clear(self):
+        '''
+        This method drops every entry from the cache.
+        '''
+        with self._lock:
+            self._entries.clear()
+    
+    # Creating a method to report the cache statistics
+    def stats(self)->dict:
+        '''
+        This method returns the hit and miss counters and the current size of the cache.
+        '''
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'model_uri': self._model_uri
+            }
+
+
+# Creating the process-wide prediction cache
+prediction_cache = PredictionCache()
+
 
 # Creating a class to make predictions
 class MakePredictions():
@@ -19,12 +387,14 @@ class MakePredictions():
     the website.
     '''
     # Creating the constructor for the class
-    def __init__(self):
+    def __init__(self, store:ModelStore=None, cache:PredictionCache=None):
         '''
         This is the constructor for the MakePredictions class.
         '''
         self.preprocessor_obj = DataTransformationConfig().preprocessor_obj_path
         self.model_uri = ModelURIConfig().model_uri
+        self.model_store = store or model_store
+        self.prediction_cache = cache or prediction_cache
     
     # Creating a method to fetch the model params from the run_config folder
     def fetch_model_params(self):
@@ -58,7 +428,8 @@ class MakePredictions():
     # Creating a method to fetch the latest model from the model registry
     def fetch_latest_model(self):
         '''
-        This method retrieves the trained model from the model registry.
+        This method retrieves the trained model from the local model cache. The model is
+        only downloaded from the model registry if it is not cached yet.
         ===================================================================================
         ----------------
         Returns:
@@ -67,17 +438,11 @@ class MakePredictions():
         ===================================================================================
         '''
         try:
-            # Initiating the dagshub client
-            dagshub.init(repo_owner='abbeymaj', repo_name='podcast', mlflow=True)
-            
-            # Setting the model tracking URI
-            mlflow.set_tracking_uri(self.model_uri)
-            
             # Fetching the latest model uri
             _, latest_model_uri = self.fetch_model_params()
             
-            # Fetch the model from the model registry
-            model = mlflow.pyfunc.load_model(latest_model_uri)
+            # Fetch the model from the local model cache
+            model = ModelCache().load_model(latest_model_uri)
             
             return model
         
@@ -89,7 +454,8 @@ class MakePredictions():
         '''
         This method makes predictions using the feature inputs from the web page and 
         the trained model. This method also transforms the input data using the 
-        preprocessor object before making the predictions.
+        preprocessor object before making the predictions. The preprocessor object and
+        the model are taken from the process-wide model store.
         ============================================================================================
         -------------------
         Parameters:
@@ -105,25 +471,129 @@ class MakePredictions():
         try:
             logging.info("Making prediction on the input data from user.")
             
-            # Fetching the preprocessor object
-            preprocessor_obj = joblib.load(self.preprocessor_obj)
+            # Making the prediction as a batch of one row
+            preds = self.make_batch_predictions(features)
+            preds = float(preds[0])
             
-            # Fetch the trained model from the model registry
-            model = self.fetch_latest_model()
+            logging.info("Prediction were made successfully!")
             
-            # Transforming the input features
-            transform = TransformData()
-            added_features = transform.generate_features(features)
-            transformed_data = preprocessor_obj.transform(added_features)
+            return preds
+        
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to make predictions for a batch of episodes
+    def make_batch_predictions(self, features:pd.DataFrame)->np.ndarray:
+        '''
+        This method makes predictions for every row of the feature dataframe at once. Rows
+        that are in the prediction cache skip the transformation and the model entirely.
+        The remaining rows are scored together: with the compiled model's lookup tables
+        when the model store holds one, or otherwise by generating, transforming and
+        scoring the features in a single vectorized pass.
+        ============================================================================================
+        -------------------
+        Parameters:
+        -------------------
+        features : pandas dataframe - This is the feature data, with one row per episode.
+        
+        -------------------
+        Returns:
+        -------------------
+        preds : numpy array - The predictions, rounded to two decimals, in the row order of
+        the feature dataframe.
+        =============================================================================================
+        '''
+        try:
+            # Fetching the preprocessor object and the trained model
+            loaded = self.model_store.get()
             
-            # Using the transformed feature set to make predictions
-            preds = model.predict(transformed_data)
-            preds = round(float(preds[0]), 2)
+            # Looking up the rows in the prediction cache
+            with stage_timer('model', 'cache_lookup'):
+                keys = self.prediction_cache.create_keys(features)
+                cached = self.prediction_cache.get_many(loaded.model_uri, keys)
+            misses = [i for i, pred in enumerate(cached) if pred is None]
+            if not misses:
+                return np.array(cached, dtype=float)
             
-            logging.info("Prediction were made successfully!")
+            # Scoring the rows that were not cached
+            if len(misses) < len(cached):
+                miss_preds = self._score(loaded, features.iloc[misses].reset_index(drop=True))
+            else:
+                miss_preds = self._score(loaded, features)
+            self.prediction_cache.put_many(loaded.model_uri, [keys[i] for i in misses], miss_preds.tolist())
             
+            preds = np.array(cached, dtype=float)
+            preds[misses] = miss_preds
             return preds
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to warm up the prediction pipeline
+    def warm_up(self, features:pd.DataFrame, batch_rows:int=64)->str:
+        '''
+        This method loads the latest model into the model store and scores the feature
+        dataframe once on its own and once repeated to batch_rows rows, so that both the
+        single-row and the vectorized scoring paths have run before the first request.
+        The prediction cache is bypassed, so the synthetic rows are never cached.
+        ============================================================================================
+        -------------------
+        Parameters:
+        -------------------
+        features : pandas dataframe - This is a single row of feature data.
+        batch_rows : int - This is the number of rows in the warmup batch.
+        
+        -------------------
+        Returns:
+        -------------------
+        model_uri : str - The uri of the model that was loaded.
+        =============================================================================================
+        '''
+        try:
+            loaded = self.model_store.get()
+            self._score(loaded, features)
+            if batch_rows > 1:
+                batch = pd.concat([features] * batch_rows, ignore_index=True)
+                self._score(loaded, batch)
+            return loaded.model_uri
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to score a dataframe with the loaded model
+    def _score(self, loaded:LoadedModel, features:pd.DataFrame)->np.ndarray:
+        '''
+        This method scores the feature dataframe with the loaded model and returns the
+        predictions rounded to two decimals.
+        '''
+        try:
+            # Using the compiled model when it is available. Small batches skip pandas
+            # entirely, since its per-call overhead dominates for a handful of rows.
+            if loaded.compiled is not None:
+                with stage_timer('model', 'score_compiled'):
+                    if len(features) <= self.model_store.config.compiled_record_max_rows:
+                        columns = list(features.columns)
+                        preds = [
+                            loaded.compiled.predict_record(dict(zip(columns, row)))
+                            for row in features.to_numpy(dtype=object).tolist()
+                        ]
+                        return np.round(np.array(preds, dtype=float), 2)
+                    return np.round(loaded.compiled.predict(features), 2)
+            
+            # Transforming a copy of the input features, since generate_features changes
+            # its input in place and the caller may score the same dataframe again
+            with stage_timer('model', 'generate_features'):
+                transform = TransformData()
+                added_features = transform.generate_features(features.copy())
+            with stage_timer('model', 'transform'):
+                transformed_data = loaded.preprocessor.transform(added_features)
+            
+            # Using the transformed feature set to make predictions
+            with stage_timer('model', 'predict'):
+                preds = np.asarray(loaded.model.predict(transformed_data), dtype=float).reshape(-1)
             
+            return np.round(preds, 2)
         
         except Exception as e:
             raise CustomException(e, sys)
\ No newline at end of file
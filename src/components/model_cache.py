@@ -0,0 +1,288 @@
+# Importing packages
+import sys
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+import mlflow
+import dagshub
+from src.components.config_entity import ModelCacheConfig
+from src.exception import CustomException
+from src.logger import logging
+
+# Creating a class to manage the local on-disk model cache
+class ModelCache():
+    '''
+    This class manages a local, on-disk cache of the registered models. Each model is
+    stored once under artifacts/models/<run_id>, together with a manifest containing the
+    sha256 digest of every file, so that serving can load the model from local disk and
+    never has to download it while handling a request. The digests of a cached model are
+    checked on its first use in every process, and a model which no longer matches them
+    is downloaded again.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, config:ModelCacheConfig=None):
+        '''
+        This is the constructor for the ModelCache class.
+        '''
+        self.config = config or ModelCacheConfig()
+        self.manifest_name = 'cache_manifest.json'
+        self._lock = threading.Lock()
+        self._verified = set()
+        self._tracking_initialized = False
+    
+    # Creating a method to fetch the cache key of a model uri
+    def fetch_cache_key(self, model_uri:str)->str:
+        '''
+        This method returns the key under which the model is cached. Models logged to a run
+        are keyed by their run id, any other model uri is keyed by its sha256 digest.
+        ===================================================================================
+        ----------------
+        Parameters:
+        ----------------
+        model_uri : str - This is the uri of the model, for example runs:/<run_id>/models/name.
+        
+        ----------------
+        Returns:
+        ----------------
+        cache_key : str - This is the name of the folder in the cache.
+        ===================================================================================
+        '''
+        if model_uri.startswith('runs:/'):
+            return model_uri[len('runs:/'):].split('/')[0]
+        return hashlib.sha256(model_uri.encode('utf-8')).hexdigest()[:32]
+    
+    # Creating a method to fetch the local path of a cached model
+    def fetch_cache_path(self, model_uri:str)->str:
+        '''
+        This method returns the folder in which the model for the given uri is cached.
+        '''
+        return os.path.join(self.config.cache_dir, self.fetch_cache_key(model_uri))
+    
+    # Creating a method to check whether a model is already cached
+    def is_cached(self, model_uri:str)->bool:
+        '''
+        This method returns True if the model for the given uri is present in the cache.
+        '''
+        cache_path = self.fetch_cache_path(model_uri)
+        return os.path.exists(os.path.join(cache_path, self.manifest_name))
+    
+    # Creating a method to compute the digests of the cached files
+    def compute_digests(self, model_dir:str)->dict:
+        '''
+        This method computes the sha256 digest of every file in the model folder.
+        ===================================================================================
+        ----------------
+        Parameters:
+        ----------------
+        model_dir : str - This is the path to the model folder.
+        
+        ----------------
+        Returns:
+        ----------------
+        digests : dict - The sha256 digest of every file, keyed by its relative path.
+        ===================================================================================
+        '''
+        digests = {}
+        for root, _, files in os.walk(model_dir):
+            for file_name in sorted(files):
+                if file_name == self.manifest_name:
+                    continue
+                file_path = os.path.join(root, file_name)
+                sha = hashlib.sha256()
+                with open(file_path, 'rb') as file_obj:
+                    for block in iter(lambda: file_obj.read(1 << 20), b''):
+                        sha.update(block)
+                digests[os.path.relpath(file_path, model_dir)] = sha.hexdigest()
+        return digests
+    
+    # Creating a method to verify a cached model against its manifest
+    def verify(self, model_uri:str)->bool:
+        '''
+        This method returns True if the files of the cached model still match the digests
+        recorded in its manifest.
+        '''
+        try:
+            cache_path = self.fetch_cache_path(model_uri)
+            with open(os.path.join(cache_path, self.manifest_name), 'r') as file_obj:
+                manifest = json.load(file_obj)
+            return manifest['files'] == self.compute_digests(cache_path)
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to move a complete model folder into the cache
+    def _commit_to_cache(self, model_dir:str, model_uri:str)->str:
+        '''
+        This method writes the manifest for a fully written model folder and then moves
+        the folder into the cache with a single rename, so that a half-written model is
+        never visible in the cache.
+        '''
+        manifest = {
+            'model_uri': model_uri,
+            'files': self.compute_digests(model_dir)
+        }
+        with open(os.path.join(model_dir, self.manifest_name), 'w') as file_obj:
+            json.dump(manifest, file_obj)
+        
+        cache_path = self.fetch_cache_path(model_uri)
+        if os.path.exists(cache_path):
+            shutil.rmtree(cache_path)
+        os.replace(model_dir, cache_path)
+        self._verified.add(self.fetch_cache_key(model_uri))
+        logging.info(f"Model {model_uri} stored in the local model cache at {cache_path}.")
+        return cache_path
+    
+    # Creating a method to initialize the tracking server connection
+    def initialize_tracking(self):
+        '''
+        This method points mlflow at the configured tracking uri. The dagshub client is
+        only initialized when the tracking uri is the remote DagsHub server and the cache
+        is not in offline mode.
+        '''
+        if self._tracking_initialized:
+            return
+        is_remote = self.config.tracking_uri.startswith(('http://', 'https://'))
+        if is_remote and self.config.offline:
+            raise RuntimeError(
+                "The model cache is in offline mode and cannot use the remote tracking server "
+                f"{self.config.tracking_uri}."
+            )
+        if is_remote:
+            dagshub.init(repo_owner='abbeymaj', repo_name='podcast', mlflow=True)
+        mlflow.set_tracking_uri(self.config.tracking_uri)
+        self._tracking_initialized = True
+    
+    # Creating a method to download a model into the cache
+    def download_model(self, model_uri:str)->str:
+        '''
+        This method downloads the model from the tracking server into the cache. In offline
+        mode only a file-based MLflow store can be used to fill the cache.
+        ===================================================================================
+        ----------------
+        Parameters:
+        ----------------
+        model_uri : str - This is the uri of the model to download.
+        
+        ----------------
+        Returns:
+        ----------------
+        cache_path : str - This is the path to the cached model.
+        ===================================================================================
+        '''
+        try:
+            logging.info(f"Downloading model {model_uri} into the local model cache.")
+            
+            self.initialize_tracking()
+            os.makedirs(self.config.cache_dir, exist_ok=True)
+            
+            # Downloading into a temporary folder next to the cache so the final move is atomic
+            with tempfile.TemporaryDirectory(dir=self.config.cache_dir, prefix='.download-') as tmp_dir:
+                local_path = mlflow.artifacts.download_artifacts(
+                    artifact_uri=model_uri,
+                    dst_path=tmp_dir
+                )
+                return self._commit_to_cache(local_path, model_uri)
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to store a freshly trained model in the cache
+    def save_model(self, sk_model, model_uri:str)->str:
+        '''
+        This method stores a trained scikit-learn model in the cache under the key of its
+        model uri. It is used by the training pipeline so that the first prediction after a
+        retrain does not need to download the model that was just logged.
+        ===================================================================================
+        ----------------
+        Parameters:
+        ----------------
+        sk_model : scikit-learn model - This is the trained model.
+        model_uri : str - This is the uri under which the model was logged.
+        
+        ----------------
+        Returns:
+        ----------------
+        cache_path : str - This is the path to the cached model.
+        ===================================================================================
+        '''
+        try:
+            os.makedirs(self.config.cache_dir, exist_ok=True)
+            with tempfile.TemporaryDirectory(dir=self.config.cache_dir, prefix='.save-') as tmp_dir:
+                model_dir = os.path.join(tmp_dir, 'model')
+                mlflow.sklearn.save_model(sk_model=sk_model, path=model_dir)
+                return self._commit_to_cache(model_dir, model_uri)
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to resolve a model uri to its local path
+    def resolve(self, model_uri:str)->str:
+        '''
+        This method returns the local path of the model, filling the cache on first use.
+        The first time a cached model is resolved in the process, its files are checked
+        against the digests of its manifest, and it is downloaded again if they differ.
+        ===================================================================================
+        ----------------
+        Parameters:
+        ----------------
+        model_uri : str - This is the uri of the model.
+        
+        ----------------
+        Returns:
+        ----------------
+        cache_path : str - This is the path to the cached model.
+        ===================================================================================
+        '''
+        try:
+            cache_key = self.fetch_cache_key(model_uri)
+            if cache_key in self._verified and self.is_cached(model_uri):
+                return self.fetch_cache_path(model_uri)
+            
+            # Only one thread verifies or fills the cache for a given process
+            with self._lock:
+                if self.is_cached(model_uri):
+                    if cache_key in self._verified or self.verify(model_uri):
+                        self._verified.add(cache_key)
+                        return self.fetch_cache_path(model_uri)
+                    logging.warning(f"The cached model {model_uri} does not match its manifest, downloading it again.")
+                return self.download_model(model_uri)
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to load a model from the cache
+    def load_model(self, model_uri:str):
+        '''
+        This method loads the model for the given uri from the local cache.
+        ===================================================================================
+        ----------------
+        Parameters:
+        ----------------
+        model_uri : str - This is the uri of the model.
+        
+        ----------------
+        Returns:
+        ----------------
+        model : mlflow pyfunc model - This is the model loaded from local disk.
+        ===================================================================================
+        '''
+        try:
+            return mlflow.pyfunc.load_model(self.resolve(model_uri))
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to load the scikit-learn model from the cache
+    def load_sklearn_model(self, model_uri:str):
+        '''
+        This method loads the model for the given uri from the local cache as a native
+        scikit-learn estimator instead of an mlflow pyfunc model.
+        '''
+        try:
+            return mlflow.sklearn.load_model(self.resolve(model_uri))
+        
+        except Exception as e:
+            raise CustomException(e, sys)
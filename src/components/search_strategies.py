@@ -0,0 +1,557 @@
+# Importing packages
+import math
+import time
+import warnings
+import numpy as np
+from joblib import Memory, Parallel, delayed, effective_n_jobs
+from scipy.stats import norm
+from sklearn.base import clone
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.gaussian_process import GaussianProcessRegressor
+from sklearn.gaussian_process.kernels import ConstantKernel, Matern, WhiteKernel
+from sklearn.metrics import mean_squared_error
+from sklearn.model_selection import check_cv
+from src.components.config_entity import ModelSearchConfig
+from src.components.bayesian_ridge_solver import SufficientStatistics, BayesianRidgeSolver
+from src.components.bayesian_ridge_solver import BAYESIAN_RIDGE_LOOP_PARAMS, BAYESIAN_RIDGE_PRIOR_PARAMS
+from src.logger import logging
+
+# Creating a function to select rows of a dataframe or an array
+def take_rows(data, index):
+    '''
+    This function returns the rows of a pandas object or an array at the given positions.
+    '''
+    return data.iloc[index] if hasattr(data, 'iloc') else np.asarray(data)[index]
+
+# Creating a function to fit a candidate on the training rows of a fold and score it
+def fit_and_score_fold(estimator, params:dict, X_train, y_train, X_test, y_test)->float:
+    '''
+    This function fits a copy of the estimator with the candidate parameters on the
+    training rows of a fold and returns its negative mean squared error on the test rows.
+    '''
+    model = clone(estimator).set_params(**params).fit(X_train, y_train)
+    return -mean_squared_error(y_test, model.predict(X_test))
+
+# Creating a function to fit a candidate on one fold and score it
+def fit_and_score(estimator, params:dict, X, y, train, test)->float:
+    '''
+    This function fits and scores a candidate on the fold with the given training and
+    test positions.
+    '''
+    return fit_and_score_fold(
+        estimator, params, take_rows(X, train), take_rows(y, train), take_rows(X, test), take_rows(y, test)
+    )
+
+# Creating a function to fit the preprocessor on one fold
+def fit_transform_fold(preprocessor, X, y, train, test)->tuple:
+    '''
+    This function fits a copy of the preprocessor on the training rows of a fold and
+    returns the transformed training and test features with their targets.
+    '''
+    fitted = clone(preprocessor)
+    X_train = fitted.fit_transform(take_rows(X, train), take_rows(y, train))
+    return X_train, take_rows(y, train), fitted.transform(take_rows(X, test)), take_rows(y, test)
+
+
+# Creating a class to evaluate candidates by fitting them on every fold
+class CrossValidationEvaluator():
+    '''
+    This class scores candidates by fitting the estimator on every fold, in parallel
+    over the candidates and folds. A candidate can be scored on a random subset of the
+    rows, which is how the halving strategy spends little on the candidates it drops.
+    '''
+    supports_resources = True
+    
+    # Creating the constructor for the class
+    def __init__(self, estimator, train_set, target_set, cv=5, n_jobs:int=-1, verbose:int=0,
+                 random_state:int=42):
+        '''
+        This is the constructor for the CrossValidationEvaluator class.
+        '''
+        self.estimator = estimator
+        self.X = train_set
+        self.y = target_set
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.verbose = verbose
+        self.n_samples = len(target_set)
+        self.n_splits = check_cv(cv).get_n_splits(train_set, target_set)
+        self.batch_size = max(1, effective_n_jobs(n_jobs))
+        self._order = np.random.default_rng(random_state).permutation(self.n_samples)
+    
+    # Creating a method to score a batch of candidates
+    def evaluate(self, candidates:list, n_samples:int=None)->dict:
+        '''
+        This method scores the candidates on the first n_samples rows of a fixed random
+        order, or on every row, and returns the score of every candidate on every fold.
+        '''
+        X, y = self.X, self.y
+        if n_samples is not None and n_samples < self.n_samples:
+            index = np.sort(self._order[:n_samples])
+            X, y = take_rows(X, index), take_rows(y, index)
+        splits = list(check_cv(self.cv).split(X, y))
+        scores = Parallel(n_jobs=self.n_jobs, verbose=self.verbose)(
+            delayed(fit_and_score)(self.estimator, params, X, y, train, test)
+            for params in candidates for train, test in splits
+        )
+        return {
+            'split_scores': np.array(scores).reshape(len(candidates), len(splits)).T,
+            'fits': len(candidates) * len(splits),
+            'skipped_fits': 0
+        }
+
+
+# Creating a class to evaluate BayesianRidge candidates from one decomposition per fold
+class FactorizedEvaluator():
+    '''
+    This class scores BayesianRidge candidates which only differ in the priors and
+    convergence settings. The sufficient statistics of every fold are computed in one pass
+    over the data and the Gram matrix of every training split is decomposed once; every
+    candidate is then fitted and scored from these, without touching the rows again.
+    Candidates which only differ in max_iter or tol and stop at the same iteration on
+    every fold are the same model, which is counted as a skipped fit. Scoring on every row
+    costs less than a single fit of the estimator, so subsets of the rows are not used.
+    '''
+    supports_resources = False
+    
+    # Creating the constructor for the class
+    def __init__(self, estimator, fold_stats:list, n_samples:int):
+        '''
+        This is the constructor for the FactorizedEvaluator class. fold_stats holds the
+        statistics of the training and test rows of every fold.
+        '''
+        self.n_samples = n_samples
+        self.n_splits = len(fold_stats)
+        self.batch_size = None
+        self.base_params = {
+            name: value for name, value in estimator.get_params().items()
+            if name in BAYESIAN_RIDGE_LOOP_PARAMS
+        }
+        self.fold_stats = [test_stats for _, test_stats in fold_stats]
+        self.solvers = [BayesianRidgeSolver(train_stats) for train_stats, _ in fold_stats]
+        self.models = set()
+    
+    # Creating a method to build the evaluator from the training data
+    @classmethod
+    def from_data(cls, estimator, train_set, target_set, cv=5)->'FactorizedEvaluator':
+        '''
+        This method computes the statistics of every test fold in one pass over the data
+        and merges them into the statistics of the training rows of every fold.
+        '''
+        X = np.asarray(train_set, dtype=np.float64)
+        y = np.asarray(target_set, dtype=np.float64).ravel()
+        test_stats = [SufficientStatistics.from_arrays(X[test], y[test]) for _, test in check_cv(cv).split(X, y)]
+        fold_stats = [
+            (SufficientStatistics.combine(test_stats[:fold] + test_stats[fold + 1:]), stats)
+            for fold, stats in enumerate(test_stats)
+        ]
+        return cls(estimator, fold_stats, len(y))
+    
+    # Creating a method to build the evaluator from transformed folds
+    @classmethod
+    def from_folds(cls, estimator, folds:list, n_samples:int)->'FactorizedEvaluator':
+        '''
+        This method computes the statistics of the training and test rows of folds which
+        were transformed separately.
+        '''
+        fold_stats = [
+            (SufficientStatistics.from_arrays(X_train, y_train), SufficientStatistics.from_arrays(X_test, y_test))
+            for X_train, y_train, X_test, y_test in folds
+        ]
+        return cls(estimator, fold_stats, n_samples)
+    
+    # Creating a method to score a batch of candidates
+    def evaluate(self, candidates:list, n_samples:int=None)->dict:
+        '''
+        This method scores the candidates on every fold, fitting and scoring only their
+        distinct models, and returns the score and number of iterations of every candidate
+        on every fold with the key of its model.
+        '''
+        candidates = [dict(self.base_params, **candidate) for candidate in candidates]
+        scores = np.empty((self.n_splits, len(candidates)))
+        n_iter = np.empty((len(candidates), self.n_splits), dtype=np.int64)
+        for fold, (solver, test_stats) in enumerate(zip(self.solvers, self.fold_stats)):
+            fitted = solver.fit(candidates)
+            _, first = np.unique(fitted['model_index'], return_index=True)
+            sse = test_stats.sum_squared_errors(fitted['coef'][first], fitted['intercept'][first])
+            scores[fold] = -sse[fitted['model_index']] / test_stats.n
+            n_iter[:, fold] = fitted['n_iter']
+        
+        # Candidates which stop at the same iterations on every fold are the same model
+        model_keys = [
+            (tuple(candidate[name] for name in BAYESIAN_RIDGE_PRIOR_PARAMS), tuple(iters.tolist()))
+            for candidate, iters in zip(candidates, n_iter)
+        ]
+        new_models = set(model_keys) - self.models
+        self.models |= new_models
+        return {
+            'split_scores': scores,
+            'split_n_iter': n_iter,
+            'model_keys': model_keys,
+            'fits': len(new_models) * self.n_splits,
+            'skipped_fits': (len(candidates) - len(new_models)) * self.n_splits
+        }
+
+
+# Creating a class to evaluate candidates with a preprocessor fitted inside every fold
+class PreprocessedEvaluator():
+    '''
+    This class scores candidates with the preprocessor fitted on the training rows of
+    every fold only, so the encoders never see the rows they are scored on. Each fold's
+    preprocessor is fitted once and the transformed training and test features are cached,
+    in memory and, when a joblib Memory is given, on disk across searches, and shared by
+    every candidate. The candidates are scored on the cached features by a factorized
+    evaluator, or by fitting the estimator on every fold. Subsets of the rows, which need
+    preprocessors of their own, are only used when the estimator is fitted on every fold.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, estimator, preprocessor, train_set, target_set, cv=5, n_jobs:int=-1,
+                 verbose:int=0, random_state:int=42, memory=None, factorized:bool=False):
+        '''
+        This is the constructor for the PreprocessedEvaluator class. memory is a joblib
+        Memory or the path of its cache directory.
+        '''
+        self.estimator = estimator
+        self.preprocessor = preprocessor
+        self.X = train_set
+        self.y = target_set
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.verbose = verbose
+        self.factorized = factorized
+        self.supports_resources = not factorized
+        self.memory = Memory(memory, verbose=0) if isinstance(memory, str) else memory
+        self.n_samples = len(target_set)
+        self.n_splits = check_cv(cv).get_n_splits(train_set, target_set)
+        self.batch_size = None if factorized else max(1, effective_n_jobs(n_jobs))
+        self._order = np.random.default_rng(random_state).permutation(self.n_samples)
+        self._folds = {}
+        self._evaluators = {}
+        self.preprocessor_fits = 0
+        self.cache_hits = 0
+    
+    # Creating a method to fetch the transformed folds
+    def fetch_folds(self, n_samples:int=None)->list:
+        '''
+        This method returns the transformed training and test features and targets of
+        every fold of the first n_samples rows of a fixed random order, or of every row,
+        fitting the preprocessors in parallel the first time.
+        '''
+        n_samples = self.n_samples if n_samples is None else min(n_samples, self.n_samples)
+        if n_samples not in self._folds:
+            X, y = self.X, self.y
+            if n_samples < self.n_samples:
+                index = np.sort(self._order[:n_samples])
+                X, y = take_rows(X, index), take_rows(y, index)
+            splits = list(check_cv(self.cv).split(X, y))
+            transform = fit_transform_fold
+            if self.memory is not None:
+                transform = self.memory.cache(fit_transform_fold)
+                self.cache_hits += sum(
+                    transform.check_call_in_cache(self.preprocessor, X, y, train, test) for train, test in splits
+                )
+            self._folds[n_samples] = Parallel(n_jobs=min(self.n_splits, effective_n_jobs(self.n_jobs)),
+                                              verbose=self.verbose)(
+                delayed(transform)(self.preprocessor, X, y, train, test) for train, test in splits
+            )
+            self.preprocessor_fits = len(self._folds) * self.n_splits - self.cache_hits
+        return self._folds[n_samples]
+    
+    # Creating a method to score a batch of candidates
+    def evaluate(self, candidates:list, n_samples:int=None)->dict:
+        '''
+        This method scores the candidates on the cached features of every fold, and
+        returns the score of every candidate on every fold.
+        '''
+        folds = self.fetch_folds(n_samples)
+        if self.factorized:
+            key = n_samples or self.n_samples
+            if key not in self._evaluators:
+                self._evaluators[key] = FactorizedEvaluator.from_folds(self.estimator, folds, key)
+            return self._evaluators[key].evaluate(candidates)
+        
+        scores = Parallel(n_jobs=self.n_jobs, verbose=self.verbose)(
+            delayed(fit_and_score_fold)(self.estimator, params, *fold)
+            for params in candidates for fold in folds
+        )
+        return {
+            'split_scores': np.array(scores).reshape(len(candidates), len(folds)).T,
+            'fits': len(candidates) * len(folds),
+            'skipped_fits': 0
+        }
+
+
+# Creating a class to track the budget of a search
+class SearchBudget():
+    '''
+    This class tracks the wall-clock time and the number of candidate fits on a fold
+    spent by a search, against the optional limits on both.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, max_seconds:float=None, max_fits:int=None):
+        '''
+        This is the constructor for the SearchBudget class. The clock starts here.
+        '''
+        self.max_seconds = max_seconds
+        self.max_fits = max_fits
+        self.start = time.perf_counter()
+        self.fits = 0
+    
+    # Creating a method to return the time spent
+    def elapsed(self)->float:
+        '''
+        This method returns the number of seconds since the search started.
+        '''
+        return time.perf_counter() - self.start
+    
+    # Creating a method to return the number of candidates which can still be evaluated
+    def remaining_candidates(self, n_splits:int)->float:
+        '''
+        This method returns how many more candidates can be evaluated on every fold, which
+        is zero once the time budget is spent.
+        '''
+        if self.max_seconds is not None and self.elapsed() >= self.max_seconds:
+            return 0
+        if self.max_fits is None:
+            return math.inf
+        return max(0, (self.max_fits - self.fits) // n_splits)
+
+
+# Creating a class to run the evaluations of a search within its budget
+class SearchRun():
+    '''
+    This class evaluates the candidates proposed by a search strategy in batches,
+    stopping when the budget is spent, and records every evaluated candidate with the
+    time and number of fits spent so far. The first batch is always evaluated, so that a
+    search returns a model even when its budget is too small for a single batch.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, evaluator, budget:SearchBudget, verbose:int=0):
+        '''
+        This is the constructor for the SearchRun class.
+        '''
+        self.evaluator = evaluator
+        self.budget = budget
+        self.verbose = verbose
+        self.results = []
+        self.fits = 0
+        self.skipped_fits = 0
+        self.exhausted = False
+    
+    # Creating a method to evaluate candidates within the budget
+    def evaluate(self, candidates:list, n_samples:int=None)->np.ndarray:
+        '''
+        This method evaluates the candidates in batches until they are all evaluated or
+        the budget is spent, and returns the mean score of the candidates it evaluated, in
+        order.
+        =========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        candidates : list - The candidates, as dictionaries of estimator parameters.
+        n_samples : int - The number of rows the candidates are scored on. Defaults to all.
+        
+        ---------------------
+        Returns:
+        ---------------------
+        scores : numpy array - The mean score of every evaluated candidate. It is shorter than
+        candidates if the budget ran out.
+        =========================================================================================
+        '''
+        scores = []
+        batch_size = self.evaluator.batch_size or len(candidates)
+        position = 0
+        while position < len(candidates):
+            allowed = self.budget.remaining_candidates(self.evaluator.n_splits)
+            if not self.results:
+                allowed = max(allowed, 1)
+            if allowed < 1:
+                self.exhausted = True
+                break
+            batch = candidates[position:position + int(min(batch_size, allowed))]
+            evaluation = self.evaluator.evaluate(batch, n_samples)
+            self.budget.fits += len(batch) * self.evaluator.n_splits
+            self.fits += evaluation['fits']
+            self.skipped_fits += evaluation['skipped_fits']
+            seconds = self.budget.elapsed()
+            
+            # Recording every candidate of the batch
+            split_scores = evaluation['split_scores']
+            for index, params in enumerate(batch):
+                result = {
+                    'params': params,
+                    'mean_test_score': float(split_scores[:, index].mean()),
+                    'std_test_score': float(split_scores[:, index].std()),
+                    'split_test_scores': split_scores[:, index],
+                    'n_samples': n_samples or self.evaluator.n_samples,
+                    'seconds': seconds,
+                    'fits': self.fits
+                }
+                if 'split_n_iter' in evaluation:
+                    result['split_n_iter'] = evaluation['split_n_iter'][index]
+                    result['model_key'] = evaluation['model_keys'][index]
+                self.results.append(result)
+                scores.append(result['mean_test_score'])
+            if self.verbose:
+                logging.info(f"Evaluated {len(self.results)} candidates in {seconds:.1f}s, "
+                             f"best score {max(r['mean_test_score'] for r in self.results):.4f}.")
+            position += len(batch)
+        return np.array(scores)
+
+
+# Creating a class for the successive halving strategy
+class HalvingSearch():
+    '''
+    This class searches the whole grid with successive halving: every candidate is scored
+    on a small random subset of the rows, the best 1/halving_factor of them on a subset
+    halving_factor times larger, and so on until the survivors are scored on every row.
+    An evaluator which scores on every row as cheaply as on a subset scores the whole grid
+    on every row at once.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, config:ModelSearchConfig=None):
+        '''
+        This is the constructor for the HalvingSearch class.
+        '''
+        self.config = config or ModelSearchConfig()
+    
+    # Creating a method to run the search
+    def search(self, run:SearchRun, candidates:list):
+        '''
+        This method runs the rounds of successive halving until the survivors are scored
+        on every row or the budget is spent.
+        '''
+        evaluator = run.evaluator
+        factor = self.config.halving_factor
+        n_rounds = 1 if len(candidates) < 2 else 1 + math.ceil(math.log(len(candidates)) / math.log(factor))
+        min_samples = max(20, 2 * evaluator.n_splits)
+        if not evaluator.supports_resources:
+            n_rounds = 1
+        while n_rounds > 1 and evaluator.n_samples // factor ** (n_rounds - 1) < min_samples:
+            n_rounds -= 1
+        
+        survivors = candidates
+        for round_ in range(n_rounds):
+            last = round_ == n_rounds - 1
+            n_samples = None if last else evaluator.n_samples // factor ** (n_rounds - 1 - round_)
+            scores = run.evaluate(survivors, n_samples)
+            if last or len(scores) < len(survivors):
+                break
+            keep = max(1, math.ceil(len(survivors) / factor))
+            best = np.sort(np.argsort(-scores, kind='stable')[:keep])
+            survivors = [survivors[index] for index in best]
+
+
+# Creating a class for the randomized search strategy
+class RandomSearch():
+    '''
+    This class scores n_candidates candidates drawn at random from the grid.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, config:ModelSearchConfig=None):
+        '''
+        This is the constructor for the RandomSearch class.
+        '''
+        self.config = config or ModelSearchConfig()
+    
+    # Creating a method to run the search
+    def search(self, run:SearchRun, candidates:list):
+        '''
+        This method scores the sampled candidates until they are all scored or the
+        budget is spent.
+        '''
+        rng = np.random.default_rng(self.config.random_state)
+        order = rng.permutation(len(candidates))[:self.config.n_candidates]
+        run.evaluate([candidates[index] for index in order])
+
+
+# Creating a function to encode the candidates of a grid as points in the unit cube
+def encode_candidates(candidates:list)->np.ndarray:
+    '''
+    This function encodes every candidate as a point in the unit cube, with one
+    dimension per parameter. Positive numerical parameters are placed on a log scale and
+    other parameters by the rank of their value in the grid.
+    '''
+    names = sorted({name for candidate in candidates for name in candidate})
+    columns = []
+    for name in names:
+        values = [candidate.get(name) for candidate in candidates]
+        numeric = all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values)
+        if numeric and all(value > 0 for value in values):
+            column = np.log10(np.array(values, dtype=np.float64))
+        elif numeric:
+            column = np.array(values, dtype=np.float64)
+        else:
+            levels = {key: index for index, key in enumerate(dict.fromkeys(map(repr, values)))}
+            column = np.array([levels[repr(value)] for value in values], dtype=np.float64)
+        spread = column.max() - column.min()
+        columns.append((column - column.min()) / spread if spread > 0 else np.zeros_like(column))
+    return np.column_stack(columns) if columns else np.zeros((len(candidates), 1))
+
+
+# Creating a class for the sequential model-based optimization strategy
+class BayesianSearch():
+    '''
+    This class searches the grid with sequential model-based optimization. After
+    n_initial random candidates, a Gaussian process is fitted to the scores so far and the
+    candidate with the largest expected improvement is scored next, up to n_candidates
+    candidates.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, config:ModelSearchConfig=None):
+        '''
+        This is the constructor for the BayesianSearch class.
+        '''
+        self.config = config or ModelSearchConfig()
+    
+    # Creating a method to compute the expected improvement of the candidates
+    @staticmethod
+    def expected_improvement(mean:np.ndarray, std:np.ndarray, best:float, xi:float=0.01)->np.ndarray:
+        '''
+        This method returns the expected improvement over the best score of candidates
+        whose score has the given predicted mean and standard deviation.
+        '''
+        std = np.maximum(std, 1e-12)
+        improvement = mean - best - xi * abs(best)
+        z = improvement / std
+        return improvement * norm.cdf(z) + std * norm.pdf(z)
+    
+    # Creating a method to run the search
+    def search(self, run:SearchRun, candidates:list):
+        '''
+        This method scores the initial random candidates and then, one at a time, the
+        candidate the Gaussian process expects to improve the most, until n_candidates are
+        scored or the budget is spent.
+        '''
+        rng = np.random.default_rng(self.config.random_state)
+        points = encode_candidates(candidates)
+        n_total = min(self.config.n_candidates, len(candidates))
+        evaluated = [int(index) for index in rng.permutation(len(candidates))[:min(self.config.n_initial, n_total)]]
+        scores = list(run.evaluate([candidates[index] for index in evaluated]))
+        evaluated = evaluated[:len(scores)]
+        
+        while len(evaluated) < n_total and not run.exhausted:
+            remaining = np.setdiff1d(np.arange(len(candidates)), evaluated)
+            process = GaussianProcessRegressor(
+                kernel=ConstantKernel() * Matern(length_scale=np.ones(points.shape[1]), nu=2.5) + WhiteKernel(1e-3),
+                normalize_y=True,
+                random_state=self.config.random_state
+            )
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', ConvergenceWarning)
+                process.fit(points[evaluated], np.array(scores))
+            mean, std = process.predict(points[remaining], return_std=True)
+            choice = int(remaining[np.argmax(self.expected_improvement(mean, std, max(scores)))])
+            score = run.evaluate([candidates[choice]])
+            if not len(score):
+                break
+            evaluated.append(choice)
+            scores.append(float(score[0]))
+
+
+# The search strategies, by name
+SEARCH_STRATEGIES = {
+    'halving': HalvingSearch,
+    'random': RandomSearch,
+    'bayesian': BayesianSearch
+}
@@ -3,15 +3,22 @@ import sys
 import numpy as np
 import pandas as pd
 import joblib
+import pyarrow.parquet as pq
 import sklearn
 sklearn.set_config(transform_output='pandas')
 from sklearn.linear_model import BayesianRidge
 from sklearn.metrics import mean_squared_error
 from src.components.config_entity import ModelTrainerConfig
 from src.components.config_entity import CreateFeatureStoreConfig
+from src.components.config_entity import DataIngestionConfig
+from src.components.config_entity import OutOfCoreTrainingConfig
+from src.components.config_entity import ModelSearchConfig
 from src.components.find_best_model import FindBestModel
+from src.components.bayesian_ridge_solver import SufficientStatistics
+from src.components.transform_data import TransformData
 from src.exception import CustomException
 from src.logger import logging
+from src.metrics import stage_timer
 
 # Creating a class to train the model
 class TrainModel():
@@ -28,7 +35,10 @@ class TrainModel():
         path to which the trained model will be stored (if needed).
         '''
         self.feature_store_config = CreateFeatureStoreConfig()
+        self.data_ingestion_config = DataIngestionConfig()
         self.trained_model_config = ModelTrainerConfig()
+        self.search_config = ModelSearchConfig()
+        self.out_of_core_config = OutOfCoreTrainingConfig()
     
     # Creating a method to split the datasets into feature and target datasets
     def create_feature_target_sets(self):
@@ -71,6 +81,35 @@ class TrainModel():
         except Exception as e:
             raise CustomException(e, sys)
     
+    # Creating a method to define the parameters to search
+    def create_search_params(self)->dict:
+        '''
+        This method returns the grid of BayesianRidge parameters to search.
+        '''
+        return {
+            'max_iter': [300, 400, 500],
+            'tol': [0.01, 0.001, 0.0001],
+            'alpha_1': [1e-04, 1e-05, 1e-06],
+            'alpha_2': [1e-04, 1e-05, 1e-06],
+            'lambda_1': [1e-04, 1e-05, 1e-06],
+            'lambda_2': [1e-04, 1e-05, 1e-06]
+        }
+    
+    # Creating a method to fetch the raw training features for the fold preprocessing
+    def create_raw_feature_target_set(self):
+        '''
+        This method reads the train dataset before transformation and returns its
+        features, with the generated features, and its target.
+        '''
+        try:
+            train_data = pd.read_parquet(self.data_ingestion_config.train_data_path)
+            X_raw = TransformData().generate_features(train_data.drop(labels=['Listening_Time_minutes'], axis=1))
+            y_raw = train_data['Listening_Time_minutes']
+            return X_raw, y_raw
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
     # Creating a method to initiate the model training process.
     def initiate_model_training(self, save_model=False, make_prediction=False):
         '''
@@ -97,44 +136,55 @@ class TrainModel():
         ====================================================================================
         '''
         try:
+            # Training from the streamed batches when the feature store does not fit in memory
+            if self.out_of_core_config.enabled:
+                return self.initiate_out_of_core_training(save_model, make_prediction)
+            
             logging.info('Initiating the model training process.')
             
             # Fetching the feature and target datasets
-            X_train, X_test, y_train, y_test = self.create_feature_target_sets()
+            with stage_timer('train', 'load_features', log=True):
+                X_train, X_test, y_train, y_test = self.create_feature_target_sets()
             
             # Instantiating the linear regression model
             lr_model = BayesianRidge()
             
             # Defining the parameters to search for the best model
-            params = {
-                'max_iter': [300, 400, 500],
-                'tol': [0.01, 0.001, 0.0001],
-                'alpha_1': [1e-04, 1e-05, 1e-06],
-                'alpha_2': [1e-04, 1e-05, 1e-06],
-                'lambda_1': [1e-04, 1e-05, 1e-06],
-                'lambda_2': [1e-04, 1e-05, 1e-06]
-            }
+            params = self.create_search_params()
+            
+            # Fetching the raw features when the preprocessor is fitted inside every fold,
+            # so the cross-validation scores do not leak
+            preprocessor = None
+            search_set, search_target = X_train, y_train
+            if self.search_config.fold_preprocessing:
+                with stage_timer('train', 'load_raw_features', log=True):
+                    search_set, search_target = self.create_raw_feature_target_set()
+                    preprocessor = TransformData().create_preprocessor_obj(search_set)
             
             # Finding the best model
-            bst_model = FindBestModel()
-            best_model, best_params = bst_model.find_best_model(
-                estimator=lr_model,
-                params=params,
-                train_set=X_train,
-                target_set=y_train,
-                cv=3
-            )
+            bst_model = FindBestModel(self.search_config)
+            with stage_timer('train', 'search', log=True):
+                best_model, best_params = bst_model.find_best_model(
+                    estimator=lr_model,
+                    params=params,
+                    train_set=search_set,
+                    target_set=search_target,
+                    cv=3,
+                    preprocessor=preprocessor
+                )
             
             logging.info('Model training process completed.')
             
             # Saving the model if save_model flag is set to True
             if save_model:
-                joblib.dump(best_model, self.trained_model_config.model_path)
+                with stage_timer('train', 'save_model', log=True):
+                    joblib.dump(best_model, self.trained_model_config.model_path)
             
             # Making a prediction when the make_prediction flag is set to True
             if make_prediction:
-                y_pred = best_model.predict(X_test)
-                metric = np.sqrt(mean_squared_error(y_test, y_pred))
+                with stage_timer('train', 'evaluate', log=True):
+                    y_pred = best_model.predict(X_test)
+                    metric = np.sqrt(mean_squared_error(y_test, y_pred))
                 
                 return (
                     best_model,
@@ -151,4 +201,146 @@ class TrainModel():
         
         except Exception as e:
             raise CustomException(e, sys)
-        
\ No newline at end of file
+    
+    # Creating a method to stream a feature store dataset in batches
+    def stream_feature_target_batches(self, path:str):
+        '''
+        This method reads a feature store dataset with pyarrow one batch of at most
+        batch_size rows at a time, row group by row group, and yields the features and the
+        target of every batch.
+        '''
+        target_column = self.out_of_core_config.target_column
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=self.out_of_core_config.batch_size):
+            batch_df = batch.to_pandas()
+            yield batch_df.drop(labels=[target_column], axis=1), batch_df[target_column]
+    
+    # Creating a method to compute the sufficient statistics of the folds in one pass
+    def create_fold_statistics(self, path:str, n_splits:int=3)->tuple:
+        '''
+        This method computes, in one streaming pass, the sufficient statistics of the
+        training and test rows of every fold. The folds are the consecutive blocks of rows
+        that KFold without shuffling would create.
+        ============================================================================
+        -------------------
+        Parameters:
+        -------------------
+        path : str - The path of the feature store dataset.
+        n_splits : int - The number of cross-validation folds.
+        
+        -------------------
+        Returns:
+        -------------------
+        fold_stats : list - The statistics of the training and test rows of every fold.
+        feature_names : list - The names of the features.
+        =============================================================================
+        '''
+        try:
+            parquet_file = pq.ParquetFile(path)
+            feature_names = [name for name in parquet_file.schema_arrow.names
+                             if name != self.out_of_core_config.target_column]
+            n_rows = parquet_file.metadata.num_rows
+            fold_sizes = np.full(n_splits, n_rows // n_splits)
+            fold_sizes[:n_rows % n_splits] += 1
+            bounds = np.concatenate([[0], np.cumsum(fold_sizes)])
+            
+            # Adding every batch to the statistics of the folds it overlaps
+            test_stats = [SufficientStatistics(len(feature_names)) for _ in range(n_splits)]
+            offset = 0
+            for X_batch, y_batch in self.stream_feature_target_batches(path):
+                X_batch = X_batch[feature_names].to_numpy(dtype=np.float64)
+                y_batch = y_batch.to_numpy(dtype=np.float64)
+                for fold in range(n_splits):
+                    start = max(bounds[fold], offset) - offset
+                    end = min(bounds[fold + 1], offset + len(y_batch)) - offset
+                    if start < end:
+                        test_stats[fold].update(X_batch[start:end], y_batch[start:end])
+                offset += len(y_batch)
+            
+            fold_stats = [
+                (SufficientStatistics.combine(test_stats[:fold] + test_stats[fold + 1:]), stats)
+                for fold, stats in enumerate(test_stats)
+            ]
+            return fold_stats, feature_names
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to compute the RMSE of a model on a dataset in batches
+    def compute_streaming_rmse(self, model, path:str)->float:
+        '''
+        This method returns the RMSE of the model on a feature store dataset, accumulating
+        the squared errors one batch at a time.
+        '''
+        try:
+            sse, n_rows = 0.0, 0
+            for X_batch, y_batch in self.stream_feature_target_batches(path):
+                sse += float(np.sum((y_batch.to_numpy() - model.predict(X_batch)) ** 2))
+                n_rows += len(y_batch)
+            return float(np.sqrt(sse / n_rows))
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    # Creating a method to train the model without loading the feature store
+    def initiate_out_of_core_training(self, save_model=False, make_prediction=False):
+        '''
+        This method trains the model from the feature store without loading it into
+        memory. The sufficient statistics of the cross-validation folds are accumulated
+        over the batches of the training dataset, the search and the final fit run on the
+        statistics alone, and the RMSE on the test dataset is computed batch by batch. The
+        preprocessor cannot be fitted inside the folds here, since the feature store is
+        already transformed.
+        ===================================================================================
+        ------------------------
+        Parameters:
+        ------------------------
+        save_model : bool - This determines if the model should be saved in the artifacts
+        folder. The default value is False.
+        make_prediction : bool - This determines if the RMSE on the test dataset should be
+        computed and returned. The default value is False.
+        
+        ------------------------
+        Returns:
+        ------------------------
+        best_model : BayesianRidge - The trained model.
+        best_params : dict - This is the best hyperparameters for the best model.
+        metric : float - The RMSE on the test dataset, if make_prediction is True.
+        ====================================================================================
+        '''
+        try:
+            logging.info('Initiating the out-of-core model training process.')
+            
+            # Accumulating the statistics of the folds over the batches of the train dataset
+            with stage_timer('train', 'fold_statistics', log=True):
+                fold_stats, feature_names = self.create_fold_statistics(self.feature_store_config.xform_train_data, 3)
+            
+            # Searching and fitting the model from the statistics
+            bst_model = FindBestModel(self.search_config)
+            with stage_timer('train', 'search', log=True):
+                best_model, best_params = bst_model.find_best_model_from_statistics(
+                    BayesianRidge(), self.create_search_params(), fold_stats, feature_names
+                )
+            
+            logging.info('Out-of-core model training process completed.')
+            
+            if save_model:
+                with stage_timer('train', 'save_model', log=True):
+                    joblib.dump(best_model, self.trained_model_config.model_path)
+            
+            if make_prediction:
+                with stage_timer('train', 'evaluate', log=True):
+                    metric = self.compute_streaming_rmse(best_model, self.feature_store_config.xform_test_data)
+                return (
+                    best_model,
+                    best_params,
+                    metric
+                )
+            
+            return (
+                best_model,
+                best_params
+            )
+        
+        except Exception as e:
+            raise CustomException(e, sys)
\ No newline at end of file
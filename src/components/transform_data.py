@@ -13,6 +13,7 @@ from src.components.config_entity import DataIngestionConfig
 from src.components.config_entity import DataTransformationConfig
 from src.exception import CustomException
 from src.logger import logging
+from src.metrics import stage_timer
 
 # Creating a class to create features and transform the datasets
 class TransformData():
@@ -147,8 +148,9 @@ class TransformData():
             logging.info('Initiating the data transformation process.')
             
             # Reading the train and test datasets
-            train_data = pd.read_parquet(self.data_ingestion_config.train_data_path)
-            test_data = pd.read_parquet(self.data_ingestion_config.test_data_path)
+            with stage_timer('transform', 'read_data', log=True):
+                train_data = pd.read_parquet(self.data_ingestion_config.train_data_path)
+                test_data = pd.read_parquet(self.data_ingestion_config.test_data_path)
             
             # Separating the train data into feature and target sets
             train_features = train_data.copy().drop(labels=['Listening_Time_minutes'], axis=1)
@@ -159,15 +161,18 @@ class TransformData():
             test_target = test_data['Listening_Time_minutes'].copy()
             
             # Generating features for the train and test datasets
-            train_df = self.generate_features(train_features)
-            test_df = self.generate_features(test_features)
+            with stage_timer('transform', 'generate_features', log=True):
+                train_df = self.generate_features(train_features)
+                test_df = self.generate_features(test_features)
             
             # Creating the preprocessor object
             preprocessor_obj = self.create_preprocessor_obj(train_df)
             
             # Transforming the train and test features
-            train_arr = preprocessor_obj.fit_transform(train_df, train_target)
-            test_arr = preprocessor_obj.transform(test_df)
+            with stage_timer('transform', 'fit_transform', log=True):
+                train_arr = preprocessor_obj.fit_transform(train_df, train_target)
+            with stage_timer('transform', 'transform', log=True):
+                test_arr = preprocessor_obj.transform(test_df)
             
             # Concatenating the train and test features and targets to store in the feature store
             train_data_combined = pd.concat([train_arr, train_target], axis=1)
@@ -175,7 +180,8 @@ class TransformData():
             
             # Saving the preprocessor object if the save_object flag is set to True
             if save_object:
-                joblib.dump(preprocessor_obj, self.preprocessor_obj_config.preprocessor_obj_path)
+                with stage_timer('transform', 'save_object', log=True):
+                    joblib.dump(preprocessor_obj, self.preprocessor_obj_config.preprocessor_obj_path)
             
             logging.info('Data transformation process completed sucessfully.')
             
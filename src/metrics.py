@@ -0,0 +1,218 @@
+# Importing packages
+import re
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from src.components.config_entity import MetricsConfig
+from src.logger import logging
+
+# Creating a class to record the latencies of one stage
+class StageHistogram():
+    '''
+    This class records the latencies of one stage. It keeps the total count and sum of
+    every observation, and the most recent observations in a bounded window from which
+    the quantiles are computed.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, window_size:int):
+        '''
+        This is the constructor for the StageHistogram class.
+        '''
+        self.samples = deque(maxlen=window_size)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    # Creating a method to record one observation
+    def observe(self, seconds:float):
+        '''
+        This method records the duration of one run of the stage.
+        '''
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+    
+    # Creating a method to compute the quantiles
+    def quantiles(self, quantiles:tuple)->dict:
+        '''
+        This method returns the requested quantiles of the recent observations, using the
+        nearest-rank method.
+        '''
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: float('nan') for q in quantiles}
+        return {
+            q: ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+            for q in quantiles
+        }
+
+
+# Creating a class to collect the stage latencies of the application and the pipelines
+class StageMetrics():
+    '''
+    This class collects the latency of every timed stage, keyed by the pipeline and the
+    stage name, and renders them together with the component gauges in the Prometheus
+    text format. It is shared by the web application and the training, transformation and
+    drift detection pipelines.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, config:MetricsConfig=None):
+        '''
+        This is the constructor for the StageMetrics class.
+        '''
+        self.config = config or MetricsConfig()
+        self._lock = threading.Lock()
+        self._histograms = {}
+    
+    # Creating a method to record one observation
+    def observe(self, pipeline:str, stage:str, seconds:float):
+        '''
+        This method records the duration of one run of a stage.
+        ========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        pipeline : str - This is the pipeline the stage belongs to, for example predict.
+        stage : str - This is the name of the stage, for example transform.
+        seconds : float - This is the duration of the stage in seconds.
+        ========================================================================================
+        '''
+        with self._lock:
+            histogram = self._histograms.get((pipeline, stage))
+            if histogram is None:
+                histogram = StageHistogram(self.config.window_size)
+                self._histograms[(pipeline, stage)] = histogram
+            histogram.observe(seconds)
+    
+    # Creating a method to time a block of code
+    @contextmanager
+    def timer(self, pipeline:str, stage:str, log:bool=False):
+        '''
+        This method times the enclosed block and records it as one run of the stage. The
+        duration is recorded even if the block raises. Pipelines set log to True so that
+        their stage timings also appear in the log file.
+        ========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        pipeline : str - This is the pipeline the stage belongs to.
+        stage : str - This is the name of the stage.
+        log : bool - This determines whether the duration is also logged.
+        ========================================================================================
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.observe(pipeline, stage, seconds)
+            if log:
+                logging.info(f"Stage {pipeline}.{stage} took {seconds:.3f}s.")
+    
+    # Creating a method to return the current statistics
+    def snapshot(self)->dict:
+        '''
+        This method returns the count, sum, maximum and quantiles of every stage, keyed by
+        pipeline and stage.
+        '''
+        with self._lock:
+            return {
+                key: {
+                    'count': histogram.count,
+                    'sum': histogram.total,
+                    'max': histogram.max,
+                    'quantiles': histogram.quantiles(self.config.quantiles)
+                }
+                for key, histogram in self._histograms.items()
+            }
+    
+    # Creating a method to forget every observation
+    def reset(self):
+        '''
+        This method removes every recorded observation.
+        '''
+        with self._lock:
+            self._histograms = {}
+    
+    # Creating a method to render the metrics in the Prometheus text format
+    def render_prometheus(self, gauges:dict=None)->str:
+        '''
+        This method renders the stage latencies as a Prometheus summary, and any component
+        gauges, in the Prometheus text exposition format.
+        ========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        gauges : dict - The statistics of the components, keyed by component name, for
+        example {'prediction_cache': prediction_cache.stats()}. Values that are not numbers
+        are skipped.
+        
+        ---------------------
+        Returns:
+        ---------------------
+        text : str - The metrics in the Prometheus text format.
+        ========================================================================================
+        '''
+        namespace = self.config.namespace
+        name = f"{namespace}_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Duration of the timed stages of the application and the pipelines.",
+            f"# TYPE {name} summary"
+        ]
+        for (pipeline, stage), stats in sorted(self.snapshot().items()):
+            labels = f'pipeline="{_escape(pipeline)}",stage="{_escape(stage)}"'
+            for q, value in stats['quantiles'].items():
+                lines.append(f'{name}{{{labels},quantile="{q}"}} {_format(value)}')
+            lines.append(f"{name}_sum{{{labels}}} {_format(stats['sum'])}")
+            lines.append(f"{name}_count{{{labels}}} {stats['count']}")
+        
+        for component, stats in sorted((gauges or {}).items()):
+            for key, value in stats.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                gauge_name = _sanitize(f"{namespace}_{component}_{key}")
+                lines.append(f"# TYPE {gauge_name} gauge")
+                lines.append(f"{gauge_name} {_format(value)}")
+        
+        return '\n'.join(lines) + '\n'
+
+
+# Creating helpers to format the Prometheus text
+def _escape(value:str)->str:
+    '''
+    This function escapes a label value for the Prometheus text format.
+    '''
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _sanitize(name:str)->str:
+    '''
+    This function replaces the characters which are not allowed in a Prometheus metric
+    name with underscores.
+    '''
+    return re.sub(r'[^a-zA-Z0-9_:]', '_', name)
+
+def _format(value:float)->str:
+    '''
+    This function formats a sample value for the Prometheus text format.
+    '''
+    if isinstance(value, float) and math.isnan(value):
+        return 'NaN'
+    return repr(float(value))
+
+
+# Creating the process-wide stage metrics
+stage_metrics = StageMetrics()
+
+# Creating a function to time a stage with the process-wide stage metrics
+def stage_timer(pipeline:str, stage:str, log:bool=False):
+    '''
+    This function times the enclosed block as one run of the stage, for example
+    with stage_timer('train', 'search', log=True): ...
+    '''
+    return stage_metrics.timer(pipeline, stage, log=log)
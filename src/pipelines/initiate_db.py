@@ -1,10 +1,15 @@
 # Importing packages
-from src.components.create_app import create_app, db
-from src.components.models import Data, Predictions
+from src.components.config_entity import WarmupConfig
+from src.components.config_entity import DriftSketchConfig
+from src.web_components.create_app import create_app, db
+from src.web_components.models import Data, Predictions
 
 # Initiating the database
 if __name__ == '__main__':
-    app = create_app()
+    app = create_app({
+        'WARMUP_CONFIG': WarmupConfig(enabled=False),
+        'DRIFT_SKETCH_CONFIG': DriftSketchConfig(enabled=False)
+    })
     with app.app_context():
         db.create_all()
         print("Database and tables created successfully!")
\ No newline at end of file
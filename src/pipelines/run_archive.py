@@ -0,0 +1,15 @@
+# Importing packages
+import argparse
+from src.components.config_entity import ArchiveConfig
+from src.components.archive_prediction_log import PredictionLogArchiver
+
+# Archiving the old part of the prediction log
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Move the old part of the prediction log into the Parquet archive.')
+    parser.add_argument('--retention-days', type=int, default=ArchiveConfig.retention_days,
+                        help='The requests older than this number of days are archived.')
+    parser.add_argument('--no-vacuum', action='store_true', help='Do not compact the database file afterwards.')
+    args = parser.parse_args()
+    
+    archiver = PredictionLogArchiver(ArchiveConfig(retention_days=args.retention_days, vacuum=not args.no_vacuum))
+    print(archiver.archive())
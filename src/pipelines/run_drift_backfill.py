@@ -0,0 +1,18 @@
+# Importing packages
+import argparse
+from src.components.config_entity import DriftBackfillConfig
+from src.components.drift_backfill import DriftBackfill
+
+# Running the drift backfill over the prediction log
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backfill the drift history of the prediction log.')
+    parser.add_argument('--frequency', choices=['daily', 'weekly', 'monthly'], default='monthly')
+    parser.add_argument('--start', default=None, help='The start of the backfill, for example 2025-01-01.')
+    parser.add_argument('--end', default=None, help='The end of the backfill, for example 2025-12-31.')
+    parser.add_argument('--workers', type=int, default=None, help='The number of worker processes.')
+    args = parser.parse_args()
+    
+    drift_backfill = DriftBackfill(DriftBackfillConfig(frequency=args.frequency, max_workers=args.workers))
+    results = drift_backfill.run(start=args.start, end=args.end)
+    for result in results:
+        print(f"{result['window_start']} - {result['window_end']}: rows={result['rows']}, drift={result['dataset_drift']}")
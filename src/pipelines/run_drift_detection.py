@@ -1,7 +1,11 @@
 # Importing packages
+import os
 from src.components.detect_drift import DetectDataDrift
 
 # Running the drift detection process
 if __name__ == '__main__':
     drift_detector = DetectDataDrift()
-    drift_detector.run_drift_detection()
\ No newline at end of file
+    drift_detector.run_drift_detection(
+        incremental=os.environ.get('PODCAST_DRIFT_INCREMENTAL', '0').lower() in ('1', 'true', 'yes'),
+        engine=os.environ.get('PODCAST_DRIFT_ENGINE', 'evidently')
+    )
\ No newline at end of file
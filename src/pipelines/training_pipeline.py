@@ -1,19 +1,17 @@
 # Importing packages
-import dagshub
 import mlflow
 from mlflow import MlflowClient
+from src.components.model_cache import ModelCache
 from src.components.train_model import TrainModel
 from src.utils import save_run_params
 
 # Initiating the training process and storing the trained model
 if __name__ == '__main__':
     
-    # Instantiating the dagshub client
-    dagshub.init(repo_owner='abbeymaj', repo_name='podcast', mlflow=True)
-    
-    # Setting the URI for the dagshub mlflow repo
-    model_uri = 'https://dagshub.com/abbeymaj/podcast.mlflow'
-    mlflow.set_tracking_uri(model_uri)
+    # Instantiating the dagshub client and setting the URI for the mlflow repo. The
+    # PODCAST_MLFLOW_TRACKING_URI variable can point this at a file-based store instead.
+    model_cache = ModelCache()
+    model_cache.initialize_tracking()
     
     # Establishing the mlflow client
     client = MlflowClient()
@@ -49,6 +47,9 @@ if __name__ == '__main__':
         run_params['model_name'] = model_name
         run_params['latest_version'] = latest_version
         run_params['run_id'] = run_id
+        
+        # Storing the model in the local model cache, so serving never downloads it
+        model_cache.save_model(best_model, model_uri)
     
     # Saving the run parameters
     save_run_params(run_params)
\ No newline at end of file
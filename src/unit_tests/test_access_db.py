@@ -1,10 +1,26 @@
 # Importing packages
 import os
+import time
+from datetime import datetime, timezone
 import pytest
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import sqlite3
 from src.components.config_entity import DatabaseConfig
-from src.utils import read_sql_data
+from src.components.config_entity import WriteBehindConfig
+from src.components.config_entity import WarmupConfig
+from src.components.config_entity import ArchiveConfig
+from src.components.config_entity import DriftAggregatesConfig
+from src.components.config_entity import DriftSketchConfig
+from src.utils import read_sql_data, read_prediction_log, build_prediction_log_query
+from src.utils import stream_sql_data, stream_prediction_log, stream_sql_query
+from src.components.database import apply_sqlite_pragmas, ReadOnlyConnectionPool, create_indexes, get_read_pool
+from src.components.archive_prediction_log import PredictionLogArchiver
+from src.components.drift_aggregates import DriftAggregateStore
+from src.web_components.create_app import create_app, db
+from src.web_components.models import Data, Predictions
 
 # Verifying that the database can be accessed
 def test_db_path_exists():
@@ -48,4 +64,259 @@ def test_join_tables():
     assert merged_df is not None
     assert isinstance(merged_df, pd.DataFrame)
     assert merged_df.shape[0] > 0
-    assert merged_df.shape[1] > 0
\ No newline at end of file
+    assert merged_df.shape[1] > 0
+
+# Verifying that the read_sql_data function rejects unknown tables
+def test_read_sql_data_rejects_unknown_table():
+    with pytest.raises(Exception):
+        read_sql_data(table='data; DROP TABLE data')
+
+# Verifying that the pragmas switch a database to WAL journaling
+def test_apply_sqlite_pragmas(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'tuned.db')
+    apply_sqlite_pragmas(conn, DatabaseConfig())
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == DatabaseConfig().busy_timeout_ms
+    conn.close()
+
+# Verifying that the read-only pool reuses its connections and sees new writes
+def test_read_only_pool(tmp_path):
+    db_path = str(tmp_path / 'pool.db')
+    writer = sqlite3.connect(db_path)
+    apply_sqlite_pragmas(writer, DatabaseConfig())
+    writer.execute("CREATE TABLE data (id INTEGER PRIMARY KEY)")
+    writer.commit()
+    
+    pool = ReadOnlyConnectionPool(db_path)
+    with pool.connection() as conn:
+        first_conn = conn
+        assert conn.execute("SELECT COUNT(*) FROM data").fetchone()[0] == 0
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO data (id) VALUES (1)")
+    
+    writer.execute("INSERT INTO data (id) VALUES (1)")
+    writer.commit()
+    with pool.connection() as conn:
+        assert conn is first_conn
+        assert conn.execute("SELECT COUNT(*) FROM data").fetchone()[0] == 1
+    
+    pool.close()
+    writer.close()
+
+# Verifying that a reader waits a bounded time for a pooled connection and that closing
+# a stream early returns its connection
+def test_read_only_pool_timeout_and_stream_close(tmp_path):
+    db_path = str(tmp_path / 'pool.db')
+    writer = sqlite3.connect(db_path)
+    writer.execute("CREATE TABLE data (id INTEGER PRIMARY KEY)")
+    writer.executemany("INSERT INTO data (id) VALUES (?)", [(i,) for i in range(1, 6)])
+    writer.commit()
+    writer.close()
+    
+    pool = ReadOnlyConnectionPool(db_path, DatabaseConfig(db_path=db_path, read_pool_size=1, read_pool_timeout=0.05))
+    with pool.connection():
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+    
+    stream = stream_sql_query("SELECT id FROM data", chunk_size=2, db_path=db_path)
+    assert next(stream)['id'].tolist() == [1, 2]
+    assert get_read_pool(db_path)._idle.qsize() == 0
+    stream.close()
+    assert get_read_pool(db_path)._idle.qsize() == 1
+    pool.close()
+
+# Creating a module to build an app backed by a temporary database
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'podcast.db'}",
+        'WRITE_BEHIND_CONFIG': WriteBehindConfig(enabled=False),
+        'WARMUP_CONFIG': WarmupConfig(enabled=False),
+        'DRIFT_SKETCH_CONFIG': DriftSketchConfig(enabled=False)
+    })
+    with app.app_context():
+        db.create_all()
+    app.config['TEST_DB_PATH'] = str(tmp_path / 'podcast.db')
+    return app
+
+# Creating a helper to log a request and its prediction
+def log_request(length, pred, created_at=None):
+    data = Data(
+        Podcast_Name='Tech Talks',
+        Episode_Length_minutes=length,
+        Genre='Technology',
+        Publication_Day='Monday',
+        Publication_Time='Morning',
+        created_at=created_at
+    )
+    db.session.add(data)
+    db.session.flush()
+    db.session.add(Predictions(data_id=data.id, prediction=pred, created_at=created_at))
+    db.session.commit()
+
+# Verifying that every row gets its own creation time
+def test_created_at_is_set_per_row(app):
+    with app.app_context():
+        log_request(10.0, 5.0)
+        time.sleep(0.01)
+        log_request(20.0, 15.0)
+        first, second = [row.created_at for row in db.session.query(Data).order_by(Data.id)]
+        assert second > first
+
+# Verifying that the join, projection and time range are run in SQLite
+def test_read_prediction_log_time_range(app):
+    with app.app_context():
+        log_request(10.0, 5.0, datetime(2025, 1, 1, 12, 0))
+        log_request(20.0, 15.0, datetime(2025, 1, 15, 12, 0))
+        log_request(30.0, 25.0, datetime(2025, 2, 1, 12, 0))
+    db_path = app.config['TEST_DB_PATH']
+    df = read_prediction_log(start='2025-01-01', end=datetime(2025, 2, 1, tzinfo=timezone.utc), db_path=db_path)
+    assert list(df.columns) == [
+        'Podcast_Name', 'Episode_Length_minutes', 'Genre',
+        'Publication_Day', 'Publication_Time', 'Listening_Time_minutes'
+    ]
+    assert df['Listening_Time_minutes'].tolist() == [5.0, 15.0]
+    assert len(read_prediction_log(db_path=db_path)) == 3
+
+# Verifying that the prediction log reads use the indexes
+def test_prediction_log_indexes(app):
+    conn = sqlite3.connect(app.config['TEST_DB_PATH'])
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'ix_predictions_data_id', 'ix_data_created_at'} <= indexes
+    query, params = build_prediction_log_query(start='2025-01-01', end='2025-02-01')
+    plan = ' '.join(str(row[-1]) for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params))
+    assert 'ix_data_created_at' in plan and 'ix_predictions_data_id' in plan
+    conn.close()
+
+# Verifying that the indexes are added to a database created without them
+def test_create_indexes_on_existing_database(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'old.db')
+    conn.execute("CREATE TABLE data (id INTEGER PRIMARY KEY, created_at DATETIME)")
+    conn.execute("CREATE TABLE predictions (pred_id INTEGER PRIMARY KEY, data_id INTEGER)")
+    create_indexes(conn)
+    create_indexes(conn)
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'ix_predictions_data_id', 'ix_data_created_at'} <= indexes
+    conn.close()
+
+# Verifying that the streaming reader yields typed chunks of bounded size
+def test_stream_prediction_log_chunks(app):
+    with app.app_context():
+        for i in range(7):
+            log_request(float(i), float(i) / 2, datetime(2025, 1, 1 + i, 12, 0))
+    db_path = app.config['TEST_DB_PATH']
+    chunks = list(stream_prediction_log(chunk_size=3, db_path=db_path))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert isinstance(chunks[0]['Genre'].dtype, pd.CategoricalDtype)
+    assert chunks[0]['Episode_Length_minutes'].dtype == np.float32
+    assert chunks[0]['Listening_Time_minutes'].dtype == np.float32
+    
+    streamed = pd.concat(stream_prediction_log(start='2025-01-03', chunk_size=2, db_path=db_path), ignore_index=True)
+    expected = read_prediction_log(start='2025-01-03', db_path=db_path)
+    assert streamed['Listening_Time_minutes'].tolist() == expected['Listening_Time_minutes'].tolist()
+
+# Verifying that the streaming reader can yield Arrow record batches
+def test_stream_sql_data_arrow(app):
+    with app.app_context():
+        for i in range(5):
+            log_request(float(i), float(i))
+    batches = list(stream_sql_data('data', chunk_size=2, as_arrow=True, db_path=app.config['TEST_DB_PATH']))
+    assert [batch.num_rows for batch in batches] == [2, 2, 1]
+    assert all(batch.schema.equals(batches[0].schema) for batch in batches)
+    assert pa.types.is_dictionary(batches[0].schema.field('Genre').type)
+    assert batches[0].schema.field('Episode_Length_minutes').type == pa.float32()
+    assert pa.Table.from_batches(batches).num_rows == 5
+    with pytest.raises(Exception):
+        list(stream_sql_data('sqlite_master', db_path=app.config['TEST_DB_PATH']))
+
+# Creating a helper to store the drift watermark up to which rows may be archived
+def save_drift_watermark(tmp_path, watermark):
+    aggregates_config = DriftAggregatesConfig(state_path=str(tmp_path / 'drift_state.json'))
+    store = DriftAggregateStore(aggregates_config)
+    store.watermark = watermark
+    store.save()
+    return aggregates_config
+
+# Verifying that old requests are moved into the Parquet archive and still read back
+def test_archive_moves_old_rows_and_readers_union(app, tmp_path):
+    with app.app_context():
+        for i in range(6):
+            log_request(float(i), float(i) / 2, datetime(2025, 1, 1 + i, 12, 0))
+    db_path = app.config['TEST_DB_PATH']
+    archive_dir = str(tmp_path / 'archive')
+    expected = read_prediction_log(db_path=db_path)
+    
+    archiver = PredictionLogArchiver(ArchiveConfig(archive_dir=archive_dir, delete_batch_size=2), DatabaseConfig(db_path=db_path),
+                                     save_drift_watermark(tmp_path, 6))
+    summary = archiver.archive(before='2025-01-05')
+    assert summary['archived_rows'] == 4 and summary['deleted_rows'] == 4
+    assert sorted(d for d in os.listdir(archive_dir) if d.startswith('date=')) == [
+        'date=2025-01-01', 'date=2025-01-02', 'date=2025-01-03', 'date=2025-01-04'
+    ]
+    part = os.path.join(archive_dir, 'date=2025-01-01', os.listdir(os.path.join(archive_dir, 'date=2025-01-01'))[0])
+    assert pq.ParquetFile(part).metadata.row_group(0).column(0).compression == 'ZSTD'
+    
+    assert len(read_prediction_log(db_path=db_path, include_archive=False)) == 2
+    pd.testing.assert_frame_equal(read_prediction_log(db_path=db_path, archive_dir=archive_dir), expected)
+    window = read_prediction_log(start='2025-01-03', end='2025-01-06', db_path=db_path, archive_dir=archive_dir)
+    assert window['Listening_Time_minutes'].tolist() == [1.0, 1.5, 2.0]
+    streamed = pd.concat(stream_prediction_log(chunk_size=3, db_path=db_path, archive_dir=archive_dir), ignore_index=True)
+    assert streamed['Listening_Time_minutes'].tolist() == expected['Listening_Time_minutes'].tolist()
+    assert isinstance(streamed['Genre'].dtype, pd.CategoricalDtype)
+    
+    assert archiver.archive(before='2025-01-05')['archived_rows'] == 0
+    assert archiver.load_manifest()['pending_delete'] is None
+
+# Verifying that a deletion interrupted after the archive was written is completed
+def test_archive_completes_interrupted_delete(app, tmp_path):
+    with app.app_context():
+        for i in range(3):
+            log_request(float(i), float(i), datetime(2025, 1, 1 + i, 12, 0))
+    db_path = app.config['TEST_DB_PATH']
+    archiver = PredictionLogArchiver(ArchiveConfig(archive_dir=str(tmp_path / 'archive')), DatabaseConfig(db_path=db_path),
+                                     save_drift_watermark(tmp_path, 3))
+    archiver.write_archive('2025-01-03', 'interrupted', 3)
+    archiver.save_manifest({'runs': [], 'pending_delete': {'cutoff': '2025-01-03', 'max_id': 2}})
+    
+    summary = archiver.archive(before='2025-01-03')
+    assert summary['archived_rows'] == 0 and summary['deleted_rows'] == 2
+    assert len(read_prediction_log(db_path=db_path, archive_dir=str(tmp_path / 'archive'))) == 3
+
+# Verifying that the files of a write interrupted before the manifest recorded it are removed
+def test_archive_removes_unrecorded_write(app, tmp_path):
+    with app.app_context():
+        for i in range(4):
+            log_request(float(i), float(i), datetime(2025, 1, 1 + i, 12, 0))
+    db_path = app.config['TEST_DB_PATH']
+    archive_dir = str(tmp_path / 'archive')
+    archiver = PredictionLogArchiver(ArchiveConfig(archive_dir=archive_dir), DatabaseConfig(db_path=db_path),
+                                     save_drift_watermark(tmp_path, 4))
+    archiver.save_manifest({'runs': [], 'pending_write': {'run_id': 'crashed', 'cutoff': '2025-01-03'}, 'pending_delete': None})
+    archiver.write_archive('2025-01-03', 'crashed', 4)
+    
+    summary = archiver.archive(before='2025-01-03')
+    assert summary['archived_rows'] == 2 and summary['deleted_rows'] == 2
+    assert not [name for name in os.listdir(os.path.join(archive_dir, 'date=2025-01-01')) if 'crashed' in name]
+    assert read_prediction_log(db_path=db_path, archive_dir=archive_dir)['Listening_Time_minutes'].tolist() == [0.0, 1.0, 2.0, 3.0]
+    assert archiver.load_manifest()['pending_write'] is None
+
+# Verifying that rows above the drift watermark and the last request are never archived
+def test_archive_keeps_unaggregated_rows_and_ids_monotonic(app, tmp_path):
+    with app.app_context():
+        for i in range(4):
+            log_request(float(i), float(i), datetime(2025, 1, 1 + i, 12, 0))
+    db_path = app.config['TEST_DB_PATH']
+    archive_dir = str(tmp_path / 'archive')
+    archiver = PredictionLogArchiver(ArchiveConfig(archive_dir=archive_dir), DatabaseConfig(db_path=db_path),
+                                     save_drift_watermark(tmp_path, 2))
+    summary = archiver.archive(before='2025-02-01')
+    assert summary['archived_rows'] == 2 and summary['drift_watermark'] == 2
+    
+    save_drift_watermark(tmp_path, 4)
+    assert archiver.archive(before='2025-02-01')['archived_rows'] == 1
+    assert len(read_prediction_log(db_path=db_path, include_archive=False)) == 1
+    with app.app_context():
+        log_request(5.0, 5.0)
+        assert [row.id for row in db.session.query(Data).order_by(Data.id)] == [4, 5]
@@ -0,0 +1,55 @@
+# Importing packages
+import threading
+import pytest
+import pandas as pd
+from src.components.config_entity import CoalescerConfig
+from src.components.coalesce_predictions import PredictionCoalescer
+
+
+# Creating a predictor which doubles the episode length and records its batch sizes
+class DoublingPredictor():
+    def __init__(self):
+        self.batch_sizes = []
+
+    def make_batch_predictions(self, features):
+        self.batch_sizes.append(len(features))
+        if (features['Genre'] == 'Unknown').any():
+            raise ValueError('Unseen category.')
+        return features['Episode_Length_minutes'].to_numpy(dtype=float) * 2
+
+# Creating a helper to build a single-row request
+def make_request(length, genre='Comedy'):
+    return pd.DataFrame({
+        'Podcast_Name': ['Tech Talks'],
+        'Episode_Length_minutes': [float(length)],
+        'Genre': [genre],
+        'Publication_Day': ['Monday'],
+        'Publication_Time': ['Morning']
+    })
+
+# Verifying that concurrent requests are batched and every caller gets its own result
+def test_coalescer_returns_each_callers_prediction():
+    predictor = DoublingPredictor()
+    coalescer = PredictionCoalescer(CoalescerConfig(window_ms=20.0), predictor)
+    coalescer.start()
+    results = {}
+    def work(i):
+        results[i] = coalescer.predict(make_request(i))
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(32)]
+    [thread.start() for thread in threads]
+    [thread.join() for thread in threads]
+    coalescer.stop()
+    assert results == {i: 2.0 * i for i in range(32)}
+    assert max(predictor.batch_sizes) > 1
+    assert coalescer.stats()['rows'] == 32
+
+# Verifying that a failing request does not fail the rest of its batch
+def test_coalescer_isolates_failing_requests():
+    coalescer = PredictionCoalescer(CoalescerConfig(window_ms=50.0), DoublingPredictor())
+    coalescer.start()
+    good = coalescer.submit(make_request(5))
+    bad = coalescer.submit(make_request(6, genre='Unknown'))
+    assert good.result()[0] == 10.0
+    with pytest.raises(ValueError):
+        bad.result()
+    coalescer.stop()
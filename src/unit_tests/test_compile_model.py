@@ -0,0 +1,59 @@
+# Importing packages
+import pytest
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import BayesianRidge
+from src.components.config_entity import DataIngestionConfig
+from src.components.config_entity import DataTransformationConfig
+from src.components.config_entity import CreateFeatureStoreConfig
+from src.components.compile_model import CompileLinearModel
+from src.components.compile_model import CompiledLinearModel
+from src.components.transform_data import TransformData
+from src.exception import CustomException
+
+
+# Creating a module to fetch the preprocessor object and a model fitted on the feature store
+@pytest.fixture(scope='module')
+def pipeline_objects():
+    preprocessor_obj = joblib.load(DataTransformationConfig().preprocessor_obj_path)
+    train_data = pd.read_parquet(CreateFeatureStoreConfig().xform_train_data)
+    X = train_data.drop(labels=['Listening_Time_minutes'], axis=1)
+    y = train_data['Listening_Time_minutes']
+    model = BayesianRidge().fit(X, y)
+    return preprocessor_obj, model
+
+# Creating a module to fetch a sample of the raw test dataset
+@pytest.fixture(scope='module')
+def raw_features():
+    test_data = pd.read_parquet(DataIngestionConfig().test_data_path).head(2000)
+    return test_data.drop(labels=['Listening_Time_minutes'], axis=1)
+
+# Verifying that the compiled model matches the full pipeline on real data
+def test_compiled_model_matches_pipeline(pipeline_objects, raw_features):
+    preprocessor_obj, model = pipeline_objects
+    compiler = CompileLinearModel()
+    compiled_model = compiler.compile_model(preprocessor_obj, model)
+    expected = model.predict(preprocessor_obj.transform(TransformData().generate_features(raw_features.copy())))
+    assert np.allclose(compiled_model.predict(raw_features), expected, rtol=0, atol=1e-9)
+    assert compiler.verify_compiled_model(compiled_model, preprocessor_obj, model) <= 1e-6
+
+# Verifying that a single record gives the same prediction as the vectorized path
+def test_compiled_model_predict_record(pipeline_objects, raw_features):
+    compiled_model = CompileLinearModel().compile_model(*pipeline_objects)
+    record = raw_features.iloc[0].to_dict()
+    assert compiled_model.predict_record(record) == pytest.approx(compiled_model.predict(raw_features.head(1))[0])
+
+# Verifying that unseen categories are rejected like the full pipeline does
+def test_compiled_model_rejects_unseen_category(pipeline_objects, raw_features):
+    compiled_model = CompileLinearModel().compile_model(*pipeline_objects)
+    features = raw_features.head(1).assign(Podcast_Name='Not A Podcast')
+    with pytest.raises(CustomException):
+        compiled_model.predict(features)
+
+# Verifying that the compiled model can be saved and loaded
+def test_compiled_model_save_and_load(tmp_path, pipeline_objects, raw_features):
+    compiled_model = CompileLinearModel().compile_model(*pipeline_objects)
+    compiled_model.save(str(tmp_path / 'compiled_model.json'))
+    loaded = CompiledLinearModel.load(str(tmp_path / 'compiled_model.json'))
+    assert np.allclose(loaded.predict(raw_features), compiled_model.predict(raw_features))
@@ -4,6 +4,8 @@ import pytest
 import pandas as pd
 from src.components.config_entity import DataIngestionConfig
 from src.components.data_ingestion import DataIngestion
+from src.components.drift_aggregates import ReferenceProfile
+from src.utils import compute_file_digest
 
 
 # Creating a module for the train dataset
@@ -75,4 +77,13 @@ def test_test_dataset_does_not_contain_dropped_features(test_dataset):
 # Verify that the target feature is present in the train dataset
 def test_target_feature_present_in_train(train_dataset):
     df = pd.read_parquet(train_dataset)
-    assert 'Listening_Time_minutes' in list(df.columns)
\ No newline at end of file
+    assert 'Listening_Time_minutes' in list(df.columns)
+
+# Verifying that the reference profile matches the train dataset
+def test_reference_profile_matches_train_dataset(train_dataset):
+    ingestion_config = DataIngestionConfig()
+    profile = ReferenceProfile.load(ingestion_config.reference_profile_path)
+    assert profile.matches(compute_file_digest(train_dataset))
+    df = pd.read_parquet(train_dataset, columns=['Genre', 'Episode_Length_minutes'])
+    assert profile.aggregates.features['Genre'].counts == df['Genre'].value_counts().to_dict()
+    assert profile.aggregates.features['Episode_Length_minutes'].missing == df['Episode_Length_minutes'].isna().sum()
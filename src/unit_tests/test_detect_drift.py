@@ -1,7 +1,27 @@
 # Importing packages
+import os
+import re
+import sqlite3
+import numpy as np
 import pandas as pd
 import pytest
-from src.components.detect_drift import DetectDataDrift
+from src.components.config_entity import DatabaseConfig
+from src.components.config_entity import DataIngestionConfig
+from src.components.config_entity import DriftAggregatesConfig
+from src.components.config_entity import DriftBackfillConfig
+from src.components.config_entity import DriftMetricsConfig
+from src.components.config_entity import DriftSamplingConfig
+from src.components.config_entity import DriftSketchConfig
+from src.components.detect_drift import DetectDataDrift, NativeDriftEngine
+from evidently import Dataset, DataDefinition, Report, Regression
+from evidently.presets import DataDriftPreset
+from src.components.drift_aggregates import DriftAggregateStore, FeatureAggregates
+from src.components.drift_aggregates import ReferenceProfile
+from src.components.drift_backfill import DriftBackfill
+from src.components.drift_metrics import DriftMetricsStore
+from src.components.drift_sketches import OnlineDriftSketches
+from src.components.drift_sampling import stratified_sample, reservoir_sample, compute_sample_size
+from src.utils import compute_file_digest
 
 # Verifying that the read_data_from_db method works as expected
 def test_read_data_from_db_method():
@@ -36,4 +56,357 @@ def test_target_feature_renamed():
 # Verifying that the detect_data_drift method works as expected
 def test_detect_data_drift_method():
     temp_drift = DetectDataDrift()
-    temp_drift.detect_data_drift(save_report=False)
\ No newline at end of file
+    temp_drift.detect_data_drift(save_report=False)
+# Creating a helper to build a database with logged requests and predictions
+def create_log_db(db_path, rows):
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS data (id INTEGER PRIMARY KEY, Podcast_Name TEXT, Episode_Length_minutes REAL, "
+        "Genre TEXT, Publication_Day TEXT, Publication_Time TEXT, created_at DATETIME)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS predictions (pred_id INTEGER PRIMARY KEY, data_id INTEGER, prediction REAL, created_at DATETIME)"
+    )
+    for name, length, genre, day, time, pred, created_at in rows:
+        cursor = conn.execute(
+            "INSERT INTO data (Podcast_Name, Episode_Length_minutes, Genre, Publication_Day, Publication_Time, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (name, length, genre, day, time, created_at)
+        )
+        conn.execute(
+            "INSERT INTO predictions (data_id, prediction, created_at) VALUES (?, ?, ?)",
+            (cursor.lastrowid, pred, created_at)
+        )
+    conn.commit()
+    conn.close()
+
+# Verifying that the aggregates are merged and serialized without loss
+def test_feature_aggregates_merge_and_round_trip():
+    df = pd.DataFrame({
+        'Episode_Length_minutes': [10.0, 50.0, None, 130.0],
+        'Listening_Time_minutes': [5.0, 40.0, 60.0, 90.0],
+        'Podcast_Name': ['Tech Talks', 'Tech Talks', 'Daily Digest', 'Daily Digest'],
+        'Genre': ['Technology', 'Technology', 'News', 'News'],
+        'Publication_Day': ['Monday'] * 4,
+        'Publication_Time': ['Morning'] * 4
+    })
+    first = FeatureAggregates()
+    first.update(df.iloc[:2])
+    second = FeatureAggregates()
+    second.update(df.iloc[2:])
+    first.merge(second)
+    whole = FeatureAggregates()
+    whole.update(df)
+    assert first.to_dict() == whole.to_dict()
+    
+    length = FeatureAggregates.from_dict(whole.to_dict()).features['Episode_Length_minutes']
+    assert length.count == 3 and length.missing == 1 and length.counts[-1] == 1
+    assert length.mean == pytest.approx(np.mean([10.0, 50.0, 130.0]))
+    assert length.std == pytest.approx(np.std([10.0, 50.0, 130.0], ddof=1))
+
+# Verifying that the incremental mode only reads rows above the watermark
+def test_incremental_drift_uses_watermark(tmp_path):
+    db_path = str(tmp_path / 'podcast.db')
+    config = DriftAggregatesConfig(state_path=str(tmp_path / 'drift_state.json'), chunk_size=2)
+    metrics_config = DriftMetricsConfig(db_path=str(tmp_path / 'drift_metrics.db'))
+    drift = DetectDataDrift(aggregates_config=config, db_config=DatabaseConfig(db_path=db_path),
+                            metrics_config=metrics_config)
+    
+    create_log_db(db_path, [
+        ('Tech Talks', 30.0, 'Technology', 'Monday', 'Morning', 20.0, '2025-01-01 10:00:00'),
+        ('Daily Digest', 60.0, 'News', 'Friday', 'Evening', 45.0, '2025-01-01 11:00:00'),
+        ('Tech Talks', 90.0, 'Technology', 'Monday', 'Night', 70.0, '2025-01-02 09:00:00')
+    ])
+    store = drift.update_drift_aggregates()
+    assert store.watermark == 3
+    assert sorted(store.days) == ['2025-01-01', '2025-01-02']
+    
+    create_log_db(db_path, [
+        ('Tech Talks', 45.0, 'Technology', 'Tuesday', 'Morning', 30.0, '2025-01-02 12:00:00')
+    ])
+    assert [len(chunk) for chunk in drift.read_new_rows(store.watermark)] == [1]
+    store = drift.update_drift_aggregates()
+    assert store.watermark == 4
+    assert store.window('2025-01-02', '2025-01-02').rows == 2
+    assert DriftAggregateStore(config).window().features['Genre'].counts == {'Technology': 3, 'News': 1}
+    
+    result = drift.detect_incremental_drift(start_day='2025-01-01')
+    assert result['rows'] == 4
+    assert set(result['features']) == {
+        'Episode_Length_minutes', 'Listening_Time_minutes', 'Podcast_Name',
+        'Genre', 'Publication_Day', 'Publication_Time'
+    }
+    assert result['dataset_drift'] is True
+    latest = DriftMetricsStore(metrics_config).latest_run()
+    assert latest['engine'] == 'incremental' and latest['current_rows'] == 4
+    assert latest['columns']['Genre']['psi'] == pytest.approx(result['features']['Genre']['psi'])
+
+# Verifying that an out of date reference profile is rebuilt from the train dataset
+def test_reference_profile_rebuilt_when_stale(tmp_path):
+    train_path = str(tmp_path / 'train_data.parquet')
+    profile_path = str(tmp_path / 'reference_profile.json')
+    pd.DataFrame({
+        'Podcast_Name': ['Tech Talks', 'Daily Digest'],
+        'Episode_Length_minutes': [30.0, 60.0],
+        'Genre': ['Technology', 'News'],
+        'Publication_Day': ['Monday', 'Friday'],
+        'Publication_Time': ['Morning', 'Evening'],
+        'Listening_Time_minutes': [20.0, 45.0]
+    }).to_parquet(train_path, index=False)
+    ReferenceProfile('stale-digest', FeatureAggregates()).save(profile_path)
+    
+    drift = DetectDataDrift()
+    drift.ingestion_config = DataIngestionConfig(train_data_path=train_path, reference_profile_path=profile_path)
+    reference = drift.create_reference_aggregates()
+    assert reference.features['Genre'].counts == {'Technology': 1, 'News': 1}
+    
+    profile = ReferenceProfile.load(profile_path)
+    assert profile.matches(compute_file_digest(train_path))
+    assert profile.aggregates.to_dict() == reference.to_dict()
+
+# Creating a helper to read the per-column scores and drifted count from an Evidently report
+def run_evidently(reference_df, current_df):
+    schema = DataDefinition(
+        numerical_columns=['Episode_Length_minutes'],
+        categorical_columns=['Podcast_Name', 'Genre', 'Publication_Day', 'Publication_Time'],
+        regression=[Regression(target='Listening_Time_minutes')]
+    )
+    report = Report(metrics=[DataDriftPreset()]).run(
+        reference_data=Dataset.from_pandas(reference_df, data_definition=schema),
+        current_data=Dataset.from_pandas(current_df, data_definition=schema)
+    )
+    scores, drifted = {}, None
+    for metric in report.dict()['metrics']:
+        match = re.match(r'ValueDrift\(column=(\w+),', metric['metric_name'])
+        if match:
+            scores[match.group(1)] = metric['value']
+        elif metric['metric_name'].startswith('DriftedColumnsCount'):
+            drifted = metric['value']['count']
+    return scores, drifted
+
+# Verifying that the native engine agrees with Evidently for small and large references
+@pytest.mark.parametrize('reference_rows', [800, 5000])
+def test_native_engine_matches_evidently(reference_rows):
+    reference_df = pd.read_parquet(DataIngestionConfig().train_data_path).sample(reference_rows, random_state=2)
+    current_df = pd.read_parquet(DataIngestionConfig().test_data_path).sample(500, random_state=3)
+    current_df['Episode_Length_minutes'] += 8
+    current_df.loc[current_df.index[:150], 'Genre'] = 'Comedy'
+    
+    scores, drifted = run_evidently(reference_df, current_df)
+    result = NativeDriftEngine().fit(reference_df).compare(current_df)
+    assert result['drifted_columns'] == drifted
+    for column, score in scores.items():
+        assert result['columns'][column]['score'] == pytest.approx(score, rel=1e-6, abs=1e-9)
+    assert result['columns']['Genre']['drift'] is True
+    assert result['columns']['Publication_Time']['drift'] is False
+    assert {'psi', 'jensenshannon', 'ks_statistic'} <= set(result['columns']['Episode_Length_minutes'])
+    assert 'chisquare_p_value' in result['columns']['Genre']
+
+# Verifying that the native engine can be selected in detect_data_drift
+def test_detect_data_drift_native_engine():
+    drift = DetectDataDrift()
+    result = drift.detect_data_drift(save_report=False, engine='native')
+    assert result['engine'] == 'native'
+    assert set(result['columns']) == {
+        'Episode_Length_minutes', 'Listening_Time_minutes', 'Podcast_Name',
+        'Genre', 'Publication_Day', 'Publication_Time'
+    }
+    with pytest.raises(Exception):
+        drift.detect_data_drift(save_report=False, engine='unknown')
+
+# Verifying that the backfill windows are aligned and cover the whole period
+def test_backfill_windows_cover_period():
+    windows = DriftBackfill.create_windows('2025-01-15 10:00', '2025-03-02 08:00', 'monthly')
+    assert [start.strftime('%Y-%m-%d') for start, _ in windows] == ['2025-01-01', '2025-02-01', '2025-03-01']
+    assert all(end == next_start for (_, end), (next_start, _) in zip(windows, windows[1:]))
+    weekly = DriftBackfill.create_windows('2025-01-15', '2025-01-20', 'weekly')
+    assert [start.weekday() for start, _ in weekly] == [0, 0]
+    assert len(DriftBackfill.create_windows('2025-01-15', '2025-01-17 23:00', 'daily')) == 3
+    with pytest.raises(ValueError):
+        DriftBackfill.create_windows('2025-01-15', '2025-01-17', 'hourly')
+
+# Verifying that the backfill writes one result per window with logged requests
+def test_drift_backfill_writes_one_result_per_window(tmp_path):
+    db_path = str(tmp_path / 'podcast.db')
+    rows = []
+    for month, length in [(1, 60.0), (3, 110.0)]:
+        for i in range(40):
+            rows.append((
+                'Tech Talks', length + i % 5, 'Technology', 'Monday', 'Morning', 40.0,
+                f"2025-0{month}-{1 + i % 20:02d} 10:00:00.000000"
+            ))
+    create_log_db(db_path, rows)
+    reference_df = pd.read_parquet(DataIngestionConfig().train_data_path).sample(2000, random_state=1)
+    
+    metrics_config = DriftMetricsConfig(db_path=str(tmp_path / 'drift_metrics.db'))
+    backfill = DriftBackfill(
+        DriftBackfillConfig(output_dir=str(tmp_path / 'backfill'), max_workers=2),
+        DatabaseConfig(db_path=db_path),
+        metrics_config=metrics_config
+    )
+    results = backfill.run(frequency='monthly', reference_df=reference_df)
+    
+    assert [result['window_start'][:10] for result in results] == ['2025-01-01', '2025-02-01', '2025-03-01']
+    assert [result['rows'] for result in results] == [40, 0, 40]
+    assert results[2]['columns']['Episode_Length_minutes']['drift'] is True
+    assert sorted(os.listdir(tmp_path / 'backfill' / 'monthly')) == ['2025_01_01_drift.json', '2025_03_01_drift.json']
+    runs = DriftMetricsStore(metrics_config).query_runs(engine='native')
+    assert runs['window_start'].dt.strftime('%Y-%m-%d').tolist() == ['2025-01-01', '2025-03-01']
+    assert runs['current_rows'].tolist() == [40, 40]
+    assert runs['model_name'].isna().all() and runs['model_version'].isna().all()
+
+# Verifying that a window without logged requests gives an empty result on both engines
+@pytest.mark.parametrize('engine', ['evidently', 'native'])
+def test_drift_detection_on_empty_window(tmp_path, engine):
+    db_path = str(tmp_path / 'podcast.db')
+    create_log_db(db_path, [('Tech Talks', 60.0, 'Technology', 'Monday', 'Morning', 40.0, '2025-01-01 10:00:00.000000')])
+    metrics_config = DriftMetricsConfig(db_path=str(tmp_path / 'drift_metrics.db'))
+    drift = DetectDataDrift(db_config=DatabaseConfig(db_path=db_path), metrics_config=metrics_config)
+    result = drift.detect_data_drift(save_report=False, engine=engine, start='2025-02-01', record_metrics=True)
+    assert result['rows'] == 0 and result['columns'] == {}
+    assert result['dataset_drift'] is False
+    runs = DriftMetricsStore(metrics_config).query_runs()
+    assert runs['engine'].tolist() == [engine] and runs['current_rows'].tolist() == [0]
+
+# Verifying that both engines append comparable metrics to the drift metrics store
+def test_drift_metrics_recorded_for_both_engines(tmp_path):
+    metrics_config = DriftMetricsConfig(db_path=str(tmp_path / 'drift_metrics.db'))
+    drift = DetectDataDrift(metrics_config=metrics_config)
+    drift.detect_data_drift(save_report=False, engine='evidently', record_metrics=True)
+    drift.detect_data_drift(save_report=False, engine='native', record_metrics=True)
+    drift.detect_data_drift(save_report=False, engine='native')
+    
+    store = DriftMetricsStore(metrics_config)
+    runs = store.query_runs()
+    assert sorted(runs['engine']) == ['evidently', 'native']
+    assert runs['current_rows'].nunique() == 1
+    assert store.query_runs(end='2000-01-01').empty
+    
+    metrics = store.query_metrics(column='Genre')
+    assert sorted(metrics['engine']) == ['evidently', 'native']
+    evidently_row, native_row = (metrics[metrics['engine'] == engine].iloc[0] for engine in ('evidently', 'native'))
+    assert evidently_row['method'] == native_row['method'] == 'jensenshannon'
+    assert evidently_row['drift'] == native_row['drift']
+    assert evidently_row['statistic'] == pytest.approx(native_row['statistic'], rel=1e-6)
+    assert pd.isna(evidently_row['p_value']) and pd.isna(native_row['p_value'])
+    assert set(store.latest_run(engine='evidently')['columns']) == {
+        'Podcast_Name', 'Episode_Length_minutes', 'Genre', 'Publication_Day', 'Publication_Time'
+    }
+
+# Verifying that the stratified sample keeps the share of every stratum
+def test_stratified_sample_keeps_strata():
+    train_df = pd.read_parquet(DataIngestionConfig().train_data_path, columns=['Genre', 'Publication_Day'])
+    sample = stratified_sample(train_df, 10000, ('Genre', 'Publication_Day'), seed=42)
+    assert abs(len(sample) - 10000) <= 70
+    assert sample.index.equals(stratified_sample(train_df, 10000, ('Genre', 'Publication_Day'), seed=42).index)
+    expected = train_df.value_counts(normalize=True)
+    observed = sample.value_counts(normalize=True).reindex(expected.index)
+    assert (observed - expected).abs().max() < 0.001
+    assert stratified_sample(train_df.head(50), 100, ('Genre',), seed=42).equals(train_df.head(50))
+
+# Verifying that the reservoir keeps a bounded, uniform sample of the stream in stream order
+def test_reservoir_sample_is_bounded_and_uniform():
+    chunks = (pd.DataFrame({'value': np.arange(start, start + 1000)}) for start in range(0, 20000, 1000))
+    sample, total_rows = reservoir_sample(chunks, DriftSamplingConfig(seed=7), sample_size=2000)
+    assert total_rows == 20000
+    assert len(sample) == 2000 and sample['value'].is_unique
+    assert sample['value'].is_monotonic_increasing
+    assert np.histogram(sample['value'], bins=4, range=(0, 20000))[0].min() > 400
+    
+    chunks = (pd.DataFrame({'value': np.arange(start, start + 10)}) for start in range(0, 30, 10))
+    sample, total_rows = reservoir_sample(chunks, sample_size=100)
+    assert sample['value'].tolist() == list(range(30)) and total_rows == 30
+    assert compute_sample_size(100.0, DriftSamplingConfig(memory_budget_mb=1, memory_overhead=1)) == 5242
+    assert compute_sample_size(100.0, DriftSamplingConfig(time_budget_seconds=1, rows_per_second=1000)) == 500
+
+# Verifying that a drift run stays within the sampling budget and records the sample sizes
+def test_detect_data_drift_samples_within_budget(tmp_path):
+    db_path = str(tmp_path / 'podcast.db')
+    create_log_db(db_path, [
+        ('Tech Talks', 30.0 + i % 60, 'Technology', 'Monday', 'Morning', 20.0, '2025-01-01 10:00:00')
+        for i in range(3000)
+    ])
+    metrics_config = DriftMetricsConfig(db_path=str(tmp_path / 'drift_metrics.db'))
+    sampling_config = DriftSamplingConfig(time_budget_seconds=1.0, rows_per_second=4000.0, chunk_size=500)
+    drift = DetectDataDrift(db_config=DatabaseConfig(db_path=db_path), metrics_config=metrics_config,
+                            sampling_config=sampling_config)
+    result = drift.detect_data_drift(save_report=False, engine='native', record_metrics=True)
+    
+    assert result['rows'] == 2000
+    assert result['sampling']['current_total_rows'] == 3000
+    assert result['sampling']['reference_total_rows'] == 525000
+    assert abs(result['sampling']['reference_sample_rows'] - 2000) <= 70
+    runs = DriftMetricsStore(metrics_config).query_runs()
+    assert runs.loc[0, ['current_rows', 'current_total_rows', 'reference_total_rows']].tolist() == [2000, 3000, 525000]
+
+# Creating a helper to build served requests for the drift sketches
+def make_served_records(n, genre, created_at):
+    return [{
+        'Podcast_Name': 'Tech Talks',
+        'Episode_Length_minutes': 20.0 + i,
+        'Genre': genre,
+        'Publication_Day': 'Monday',
+        'Publication_Time': 'Morning',
+        'created_at': created_at
+    } for i in range(n)]
+
+# Verifying that the sketches of several processes merge like one sketch of all requests
+def test_drift_sketches_merge_across_processes(tmp_path):
+    config = DriftSketchConfig(sketch_dir=str(tmp_path / 'sketches'))
+    now = pd.Timestamp.now(tz='UTC')
+    first = OnlineDriftSketches(config)
+    first.update(make_served_records(3, 'Technology', now), [10.0, 20.0, 30.0])
+    first.update(make_served_records(2, 'News', now - pd.Timedelta(hours=2)), [40.0, 50.0])
+    assert first.window(now - pd.Timedelta(minutes=30), now).rows == 3
+    assert first.window().rows == 5
+    assert first.checkpoint() is True
+    os.replace(os.path.join(config.sketch_dir, first.file_name), os.path.join(config.sketch_dir, 'sketch-other-1.json'))
+    
+    second = OnlineDriftSketches(config)
+    second.update(make_served_records(4, 'News', now), [5.0] * 4)
+    merged = second.collect().window()
+    assert merged.rows == 9
+    assert merged.features['Genre'].counts == {'Technology': 3, 'News': 6}
+    
+    whole = FeatureAggregates()
+    whole.update_records(
+        make_served_records(3, 'Technology', now) + make_served_records(2, 'News', now) + make_served_records(4, 'News', now),
+        [10.0, 20.0, 30.0, 40.0, 50.0] + [5.0] * 4
+    )
+    assert merged.to_dict() == whole.to_dict()
+    
+    second.checkpoint()
+    assert OnlineDriftSketches.load(config).window().to_dict() == merged.to_dict()
+    second.prune(now=(now + pd.Timedelta(seconds=config.retention_seconds + config.bucket_seconds)).timestamp())
+    assert second.buckets == {}
+
+# Verifying that recent drift is detected from the sketches with the aggregate comparison
+def test_detect_recent_drift_from_sketches(tmp_path):
+    train_path = str(tmp_path / 'train_data.parquet')
+    pd.DataFrame({
+        'Podcast_Name': ['Tech Talks', 'Daily Digest'] * 50,
+        'Episode_Length_minutes': np.linspace(10.0, 110.0, 100),
+        'Genre': ['Technology', 'News'] * 50,
+        'Publication_Day': ['Monday', 'Friday'] * 50,
+        'Publication_Time': ['Morning', 'Evening'] * 50,
+        'Listening_Time_minutes': np.linspace(5.0, 90.0, 100)
+    }).to_parquet(train_path, index=False)
+    metrics_config = DriftMetricsConfig(db_path=str(tmp_path / 'drift_metrics.db'))
+    drift = DetectDataDrift(metrics_config=metrics_config)
+    drift.ingestion_config = DataIngestionConfig(
+        train_data_path=train_path, reference_profile_path=str(tmp_path / 'reference_profile.json')
+    )
+    
+    now = pd.Timestamp.now(tz='UTC')
+    sketches = OnlineDriftSketches(DriftSketchConfig(sketch_dir=str(tmp_path / 'sketches')))
+    sketches.update(make_served_records(50, 'Technology', now), [15.0] * 50)
+    sketches.update(make_served_records(50, 'News', now - pd.Timedelta(hours=3)), [80.0] * 50)
+    result = drift.detect_recent_drift(minutes=60, sketches=sketches, record_metrics=True)
+    
+    current = FeatureAggregates()
+    current.update_records(make_served_records(50, 'Technology', now), [15.0] * 50)
+    expected = drift.compare_aggregates(current, drift.create_reference_aggregates())
+    assert result['rows'] == 50
+    assert result['features'] == expected['features']
+    assert result['dataset_drift'] is True
+    assert DriftMetricsStore(metrics_config).latest_run()['engine'] == 'sketch'
@@ -2,9 +2,28 @@
 import pytest
 import pandas as pd
 import datetime
+import json
+import joblib
+import numpy as np
+from sklearn.linear_model import BayesianRidge
 from src.utils import get_current_time
+from src.components.config_entity import ModelStoreConfig
+from src.components.config_entity import PredictionCacheConfig
+from src.components.config_entity import DataTransformationConfig
+from src.components.config_entity import CreateFeatureStoreConfig
+from src.components.config_entity import BatchPredictionConfig
+from src.components.config_entity import WriteBehindConfig
+from src.components.config_entity import WarmupConfig
+from src.components.config_entity import DriftSketchConfig
 from src.components.create_custom_data import CreateCustomData
+from src.components.create_custom_data import CreateCustomBatchData
 from src.components.make_predictions import MakePredictions
+from src.components.make_predictions import ModelStore
+from src.components.make_predictions import LoadedModel
+from src.components.make_predictions import PredictionCache
+from src.web_components.create_app import create_app, db
+from src.web_components.models import Data, Predictions
+from src.web_components import routes
 
 # Verifying that the current time is returned in the correct format
 def test_get_current_time():
@@ -56,4 +75,173 @@ def test_prediction_features():
     preds = pred.make_predictions(df)
     #print('Prediction Score: ', preds)
     assert preds is not None
-    assert isinstance(preds, float)
\ No newline at end of file
+    assert isinstance(preds, float)
+
+# Creating a model store which does not contact the model registry
+class LocalModelStore(ModelStore):
+    def load_model(self, model_uri):
+        return {'model_uri': model_uri}
+
+# Verifying that the model store loads once and reloads when the run params change
+def test_model_store_reloads_on_new_run_params(tmp_path):
+    run_params_file = tmp_path / 'run_params_20250101_10-00-00.json'
+    run_params_file.write_text(json.dumps({'model_uri': 'runs:/first/model'}))
+    store = LocalModelStore(ModelStoreConfig(run_config_dir=str(tmp_path), reload_check_interval=0.0, use_compiled_model=False))
+    first = store.get()
+    assert first.model_uri == 'runs:/first/model'
+    assert store.get() is first
+    new_params_file = tmp_path / 'run_params_20250101_11-00-00.json'
+    new_params_file.write_text(json.dumps({'model_uri': 'runs:/second/model'}))
+    second = store.get()
+    assert second.model_uri == 'runs:/second/model'
+    assert second.model == {'model_uri': 'runs:/second/model'}
+
+# Creating a model store which serves a fixed model without the compiled lookup tables
+class FixedModelStore(ModelStore):
+    def __init__(self, loaded):
+        super().__init__()
+        self.loaded = loaded
+
+    def get(self):
+        return self.loaded
+
+# Verifying that the warmup scores both paths when the model is not compiled
+def test_warm_up_without_compiled_model():
+    train_data = pd.read_parquet(CreateFeatureStoreConfig().xform_train_data).head(5000)
+    model = BayesianRidge().fit(train_data.drop(labels=['Listening_Time_minutes'], axis=1), train_data['Listening_Time_minutes'])
+    loaded = LoadedModel(
+        model_uri='runs:/local/model',
+        run_params={},
+        signature=(),
+        preprocessor=joblib.load(DataTransformationConfig().preprocessor_obj_path),
+        model=model,
+        compiled=None
+    )
+    features = pd.DataFrame({
+        'Podcast_Name': ['Study Sessions'],
+        'Episode_Length_minutes': [60.0],
+        'Genre': ['Comedy'],
+        'Publication_Day': ['Monday'],
+        'Publication_Time': ['Morning']
+    })
+    pred = MakePredictions(store=FixedModelStore(loaded), cache=PredictionCache())
+    assert pred.warm_up(features, batch_rows=8) == 'runs:/local/model'
+    assert list(features.columns) == ['Podcast_Name', 'Episode_Length_minutes', 'Genre', 'Publication_Day', 'Publication_Time']
+
+# Verifying that a batch of episodes is converted into a single dataframe
+def test_create_custom_batch_data():
+    episode = {
+        'Podcast_Name': 'Study Sessions',
+        'Episode_Length_minutes': 60,
+        'Genre': 'Comedy',
+        'Publication_Day': 'Monday',
+        'Publication_Time': 'Morning'
+    }
+    batch_data = CreateCustomBatchData([episode, dict(episode, Genre='News')])
+    df = batch_data.create_dataframe()
+    assert df.shape[0] == 2
+    assert list(df['Genre']) == ['Comedy', 'News']
+    assert df['Episode_Length_minutes'].dtype == float
+
+# Verifying that an invalid batch of episodes is rejected
+def test_create_custom_batch_data_rejects_invalid_episodes():
+    with pytest.raises(ValueError):
+        CreateCustomBatchData([])
+    with pytest.raises(ValueError):
+        CreateCustomBatchData([{'Podcast_Name': 'Study Sessions'}])
+    episode = {
+        'Podcast_Name': 'Study Sessions',
+        'Genre': 'Comedy',
+        'Publication_Day': 'Monday',
+        'Publication_Time': 'Morning'
+    }
+    for length in ['nan', 'inf', float('-inf'), 1e400]:
+        with pytest.raises(ValueError):
+            CreateCustomBatchData([dict(episode, Episode_Length_minutes=length)])
+
+# Creating a predictor which doubles the episode length, so the batch api can run without a model
+class DoublingPredictor():
+    def make_batch_predictions(self, features):
+        return features['Episode_Length_minutes'].to_numpy(dtype=float) * 2
+
+# Creating a module to build a test client for the batch prediction api
+@pytest.fixture
+def batch_client(tmp_path, monkeypatch):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'podcast.db'}",
+        'WRITE_BEHIND_CONFIG': WriteBehindConfig(enabled=False),
+        'WARMUP_CONFIG': WarmupConfig(enabled=False),
+        'DRIFT_SKETCH_CONFIG': DriftSketchConfig(enabled=False)
+    })
+    app.register_blueprint(routes.main_bp)
+    with app.app_context():
+        db.create_all()
+    monkeypatch.setattr(routes, 'MakePredictions', DoublingPredictor)
+    return app, app.test_client()
+
+# Creating a helper to build a batch of episodes
+def make_episodes(lengths):
+    return [
+        {
+            'Podcast_Name': 'Study Sessions',
+            'Episode_Length_minutes': length,
+            'Genre': 'Comedy',
+            'Publication_Day': 'Monday',
+            'Publication_Time': 'Morning'
+        }
+        for length in lengths
+    ]
+
+# Verifying that the batch api returns one prediction per episode, in order, and stores them
+def test_predict_batch_api(batch_client):
+    app, client = batch_client
+    response = client.post('/api/predict/batch', json=make_episodes([30, 10.5, 20]))
+    assert response.status_code == 200
+    assert response.get_json() == {'count': 3, 'predictions': [60.0, 21.0, 40.0]}
+    with app.app_context():
+        assert [row.Episode_Length_minutes for row in db.session.query(Data).order_by(Data.id)] == [30.0, 10.5, 20.0]
+        assert [row.prediction for row in db.session.query(Predictions).order_by(Predictions.pred_id)] == [60.0, 21.0, 40.0]
+
+# Verifying that the batch api rejects invalid batches with a 400
+@pytest.mark.parametrize('episodes', [
+    [],
+    make_episodes(np.zeros(BatchPredictionConfig().max_batch_size + 1).tolist()),
+    [{'Podcast_Name': 'Study Sessions', 'Episode_Length_minutes': 30}],
+    make_episodes(['thirty']),
+    make_episodes(['nan'])
+], ids=['empty', 'too_large', 'missing_field', 'non_numeric', 'non_finite'])
+def test_predict_batch_api_rejects_invalid_batches(batch_client, episodes):
+    app, client = batch_client
+    response = client.post('/api/predict/batch', json=episodes)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    with app.app_context():
+        assert db.session.query(Data).count() == 0
+
+# Verifying that the prediction cache counts hits and misses and evicts the oldest entry
+def test_prediction_cache_hits_misses_and_eviction():
+    cache = PredictionCache(PredictionCacheConfig(max_size=2))
+    df = pd.DataFrame({
+        'Podcast_Name': ['A', 'B', 'C'],
+        'Episode_Length_minutes': [10, 20.0, float('nan')],
+        'Genre': ['Comedy'] * 3,
+        'Publication_Day': ['Monday'] * 3,
+        'Publication_Time': ['Morning'] * 3
+    })
+    keys = cache.create_keys(df)
+    assert keys[0][1] == 10.0 and keys[2][1] is None
+    assert cache.get_many('model_1', keys) == [None, None, None]
+    cache.put_many('model_1', keys, [1.0, 2.0, 3.0])
+    assert cache.get_many('model_1', keys) == [None, 2.0, 3.0]
+    stats = cache.stats()
+    assert stats['hits'] == 2 and stats['misses'] == 4 and stats['size'] == 2
+
+# Verifying that the prediction cache is invalidated when the model changes
+def test_prediction_cache_invalidated_on_model_change():
+    cache = PredictionCache()
+    key = ('A', 10.0, 'Comedy', 'Monday', 'Morning')
+    cache.get_many('model_1', [key])
+    cache.put_many('model_1', [key], [1.0])
+    assert cache.get_many('model_1', [key]) == [1.0]
+    assert cache.get_many('model_2', [key]) == [None]
+    assert cache.stats()['invalidations'] == 1
@@ -0,0 +1,70 @@
+# Importing packages
+import pytest
+from src.components.config_entity import MetricsConfig
+from src.components.config_entity import WriteBehindConfig
+from src.components.config_entity import WarmupConfig
+from src.components.config_entity import DriftSketchConfig
+from src.metrics import StageMetrics, stage_metrics
+from src.web_components.create_app import create_app
+from src.web_components.routes import main_bp
+
+
+# Verifying that the quantiles, count and sum are computed per stage
+def test_stage_metrics_quantiles():
+    metrics = StageMetrics(MetricsConfig(window_size=100))
+    for i in range(1, 101):
+        metrics.observe('predict', 'transform', i / 1000)
+    stats = metrics.snapshot()[('predict', 'transform')]
+    assert stats['count'] == 100
+    assert stats['sum'] == pytest.approx(5.05)
+    assert stats['quantiles'][0.5] == pytest.approx(0.05)
+    assert stats['quantiles'][0.95] == pytest.approx(0.095)
+    assert stats['quantiles'][0.99] == pytest.approx(0.099)
+
+# Verifying that the quantiles only cover the most recent window
+def test_stage_metrics_window():
+    metrics = StageMetrics(MetricsConfig(window_size=10))
+    for _ in range(10):
+        metrics.observe('train', 'search', 100.0)
+    for _ in range(10):
+        metrics.observe('train', 'search', 1.0)
+    stats = metrics.snapshot()[('train', 'search')]
+    assert stats['count'] == 20 and stats['max'] == 100.0
+    assert stats['quantiles'][0.99] == 1.0
+
+# Verifying that a stage which raises is still timed
+def test_timer_records_failed_stage():
+    metrics = StageMetrics()
+    with pytest.raises(ValueError):
+        with metrics.timer('drift', 'run_report'):
+            raise ValueError('failed')
+    assert metrics.snapshot()[('drift', 'run_report')]['count'] == 1
+
+# Verifying the Prometheus text format
+def test_render_prometheus():
+    metrics = StageMetrics()
+    metrics.observe('predict', 'total', 0.25)
+    text = metrics.render_prometheus({'prediction_cache': {'hits': 3, 'hit_rate': 0.5, 'model_uri': 'runs:/x'}})
+    assert '# TYPE podcast_stage_duration_seconds summary' in text
+    assert 'podcast_stage_duration_seconds{pipeline="predict",stage="total",quantile="0.99"} 0.25' in text
+    assert 'podcast_stage_duration_seconds_count{pipeline="predict",stage="total"} 1' in text
+    assert 'podcast_prediction_cache_hits 3.0' in text
+    assert 'model_uri' not in text
+
+# Verifying that the metrics endpoint serves the process-wide metrics
+def test_metrics_endpoint(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'podcast.db'}",
+        'WRITE_BEHIND_CONFIG': WriteBehindConfig(enabled=False),
+        'WARMUP_CONFIG': WarmupConfig(enabled=False),
+        'DRIFT_SKETCH_CONFIG': DriftSketchConfig(enabled=True, sketch_dir=str(tmp_path / 'sketches'))
+    })
+    app.register_blueprint(main_bp)
+    stage_metrics.observe('predict', 'parse_form', 0.001)
+    response = app.test_client().get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert 'stage="parse_form"' in body
+    assert 'podcast_prediction_cache_size' in body
+    assert 'podcast_drift_sketches_rows' in body
@@ -0,0 +1,92 @@
+# Importing packages
+import os
+import pytest
+import numpy as np
+import pandas as pd
+import mlflow
+from sklearn.linear_model import BayesianRidge
+from src.exception import CustomException
+from src.components.config_entity import CreateFeatureStoreConfig
+from src.components.config_entity import ModelCacheConfig
+from src.components.model_cache import ModelCache
+
+
+# Creating a module to train a small model on the transformed train dataset
+@pytest.fixture(scope='module')
+def trained_model():
+    feature_store = CreateFeatureStoreConfig()
+    train_data = pd.read_parquet(feature_store.xform_train_data).head(5000)
+    X = train_data.drop(labels=['Listening_Time_minutes'], axis=1)
+    y = train_data['Listening_Time_minutes']
+    return BayesianRidge().fit(X, y), X.head(10)
+
+# Verifying that models logged to a run are cached under their run id
+def test_cache_key_is_run_id():
+    cache = ModelCache(ModelCacheConfig(cache_dir='unused'))
+    assert cache.fetch_cache_key('runs:/abc123/models/training_model_3') == 'abc123'
+
+# Verifying that a saved model is loaded from the cache in offline mode
+def test_save_and_load_offline(tmp_path, trained_model):
+    model, X = trained_model
+    config = ModelCacheConfig(cache_dir=str(tmp_path), offline=True)
+    cache = ModelCache(config)
+    cache.save_model(model, 'runs:/run1/models/training_model_3')
+    assert cache.is_cached('runs:/run1/models/training_model_3')
+    assert cache.verify('runs:/run1/models/training_model_3')
+    loaded = cache.load_model('runs:/run1/models/training_model_3')
+    assert np.allclose(loaded.predict(X), model.predict(X))
+
+# Verifying that the offline mode never contacts the remote tracking server
+def test_offline_cache_miss_raises(tmp_path):
+    config = ModelCacheConfig(
+        cache_dir=str(tmp_path),
+        tracking_uri='https://dagshub.com/abbeymaj/podcast.mlflow',
+        offline=True
+    )
+    with pytest.raises(CustomException):
+        ModelCache(config).resolve('runs:/missing/models/training_model_3')
+
+# Creating a module to restore the global MLflow tracking uri after a test
+@pytest.fixture
+def restore_tracking_uri():
+    tracking_uri = mlflow.get_tracking_uri()
+    yield
+    mlflow.set_tracking_uri(tracking_uri)
+
+# Verifying that a file-based MLflow store can fill the cache in offline mode
+def test_file_store_fills_cache_offline(tmp_path, trained_model, restore_tracking_uri):
+    model, X = trained_model
+    tracking_uri = (tmp_path / 'mlruns').as_uri()
+    mlflow.set_tracking_uri(tracking_uri)
+    with mlflow.start_run():
+        model_info = mlflow.sklearn.log_model(sk_model=model, artifact_path='models/training_model_3')
+    config = ModelCacheConfig(cache_dir=str(tmp_path / 'cache'), tracking_uri=tracking_uri, offline=True)
+    cache = ModelCache(config)
+    loaded = cache.load_model(model_info.model_uri)
+    assert os.path.exists(cache.fetch_cache_path(model_info.model_uri))
+    assert np.allclose(loaded.predict(X), model.predict(X))
+
+# Verifying that a cached model which no longer matches its manifest is downloaded again
+def test_corrupted_cache_is_downloaded_again(tmp_path, trained_model, restore_tracking_uri):
+    model, X = trained_model
+    tracking_uri = (tmp_path / 'mlruns').as_uri()
+    mlflow.set_tracking_uri(tracking_uri)
+    with mlflow.start_run():
+        model_info = mlflow.sklearn.log_model(sk_model=model, artifact_path='models/training_model_3')
+    config = ModelCacheConfig(cache_dir=str(tmp_path / 'cache'), tracking_uri=tracking_uri, offline=True)
+    ModelCache(config).resolve(model_info.model_uri)
+    
+    model_file = os.path.join(ModelCache(config).fetch_cache_path(model_info.model_uri), 'model.pkl')
+    with open(model_file, 'ab') as file_obj:
+        file_obj.write(b'corrupted')
+    cache = ModelCache(config)
+    assert not cache.verify(model_info.model_uri)
+    loaded = cache.load_model(model_info.model_uri)
+    assert cache.verify(model_info.model_uri)
+    assert np.allclose(loaded.predict(X), model.predict(X))
+    
+    # Failing instead of loading the corrupted model when it cannot be downloaded again
+    with open(model_file, 'ab') as file_obj:
+        file_obj.write(b'corrupted')
+    with pytest.raises(CustomException):
+        ModelCache(ModelCacheConfig(cache_dir=str(tmp_path / 'cache'), tracking_uri='https://dagshub.com/abbeymaj/podcast.mlflow', offline=True)).resolve(model_info.model_uri)
@@ -0,0 +1,77 @@
+# Importing packages
+import pytest
+from src.components.config_entity import WriteBehindConfig
+from src.components.config_entity import WarmupConfig
+from src.components.config_entity import DriftSketchConfig
+from src.web_components.create_app import create_app, db
+from src.web_components.models import Data, Predictions
+from src.web_components.prediction_writer import PredictionWriter
+from src.web_components.prediction_writer import persist_predictions
+
+
+# Creating a module to build an app backed by a temporary database
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'podcast.db'}",
+        'WRITE_BEHIND_CONFIG': WriteBehindConfig(enabled=False),
+        'WARMUP_CONFIG': WarmupConfig(enabled=False),
+        'DRIFT_SKETCH_CONFIG': DriftSketchConfig(enabled=True, sketch_dir=str(tmp_path / 'sketches'))
+    })
+    with app.app_context():
+        db.create_all()
+    return app
+
+# Creating a helper to build request rows
+def make_records(n):
+    return [
+        {
+            'Podcast_Name': 'Tech Talks',
+            'Episode_Length_minutes': float(i),
+            'Genre': 'Technology',
+            'Publication_Day': 'Monday',
+            'Publication_Time': 'Morning'
+        }
+        for i in range(n)
+    ]
+
+# Verifying that rows are written synchronously when there is no writer
+def test_persist_predictions_synchronous(app):
+    with app.app_context():
+        persist_predictions(app, make_records(3), [1.0, 2.0, 3.0])
+        assert db.session.query(Data).count() == 3
+        pred = db.session.query(Predictions).filter_by(prediction=2.0).one()
+        assert pred.data.Episode_Length_minutes == 1.0
+
+# Verifying that the write-behind writer drains the queue in batches
+def test_write_behind_writer_flushes_rows(app):
+    writer = PredictionWriter(app, WriteBehindConfig(enabled=True, batch_size=4, flush_interval=0.01))
+    writer.start()
+    app.extensions['prediction_writer'] = writer
+    for i in range(5):
+        persist_predictions(app, make_records(2), [float(i), float(i)])
+    assert writer.flush(timeout=10)
+    writer.stop()
+    stats = writer.stats()
+    assert stats['written'] == 10 and stats['queue_depth'] == 0 and stats['batches'] >= 3
+    with app.app_context():
+        assert db.session.query(Predictions).count() == 10
+
+# Verifying that a full queue rejects the rows instead of blocking
+def test_write_behind_writer_rejects_when_full(app):
+    writer = PredictionWriter(app, WriteBehindConfig(enabled=True, max_queue_size=2))
+    writer.start()
+    assert writer.submit(make_records(3), [1.0, 2.0, 3.0]) is False
+    writer.stop()
+    assert writer.stats()['rejected'] == 3
+
+# Verifying that persisted requests also update the online drift sketches
+def test_persist_predictions_updates_sketches(app):
+    with app.app_context():
+        persist_predictions(app, make_records(3), [10.0, 20.0, 30.0])
+    sketches = app.extensions['drift_sketches']
+    window = sketches.window()
+    assert window.rows == 3
+    assert window.features['Genre'].counts == {'Technology': 3}
+    assert window.features['Listening_Time_minutes'].total == 60.0
+    assert sketches.checkpoint() is True and sketches.checkpoint() is False
@@ -1,11 +1,18 @@
 # Importing packages
 import os
 import pytest
+import numpy as np
 import pandas as pd
-from sklearn.linear_model import BayesianRidge
+from sklearn.linear_model import BayesianRidge, Ridge
+from sklearn.base import clone
+from sklearn.metrics import mean_squared_error
+from sklearn.model_selection import GridSearchCV, KFold
 from src.components.config_entity import CreateFeatureStoreConfig
+from src.components.config_entity import ModelSearchConfig
 from src.components.find_best_model import FindBestModel
+from src.components.bayesian_ridge_solver import SufficientStatistics, BayesianRidgeSolver
 from src.components.train_model import TrainModel
+from src.components.transform_data import TransformData
 
 # Creating a module to fetch the transformed train dataset
 @pytest.fixture(scope='module')
@@ -71,4 +78,178 @@ def test_model_training():
     best_model, best_params, metric = model.initiate_model_training(make_prediction=True)
     assert best_model is not None
     assert best_params is not None
-    assert metric is not None
\ No newline at end of file
+    assert metric is not None
+
+# Creating a helper to build a small regression dataset on which the priors matter
+def make_regression_dataset(n_rows=60, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n_rows, 4)), columns=['a', 'b', 'c', 'd'])
+    y = pd.Series(X.to_numpy() @ np.array([3.0, -2.0, 0.5, 0.0]) + 40.0 + rng.normal(scale=4.0, size=n_rows))
+    return X, y
+
+# Verifying that the solver fits the same model as BayesianRidge from the statistics
+def test_bayesian_ridge_solver_matches_estimator():
+    X, y = make_regression_dataset()
+    stats = SufficientStatistics.from_arrays(X.iloc[:25], y.iloc[:25]).merge(
+        SufficientStatistics.from_arrays(X.iloc[25:], y.iloc[25:])
+    )
+    candidates = [{'lambda_2': 1e-06, 'tol': 1e-3}, {'lambda_2': 100.0, 'alpha_2': 10.0, 'max_iter': 2}]
+    fitted = BayesianRidgeSolver(stats).fit(candidates)
+    for index, params in enumerate(candidates):
+        model = BayesianRidge(**params).fit(X, y)
+        assert fitted['coef'][index] == pytest.approx(model.coef_, rel=1e-8)
+        assert fitted['intercept'][index] == pytest.approx(model.intercept_, rel=1e-8)
+        assert fitted['n_iter'][index] == model.n_iter_
+    sse = stats.sum_squared_errors(fitted['coef'], fitted['intercept'])
+    assert sse[0] == pytest.approx(np.sum((y - BayesianRidge(**candidates[0]).fit(X, y).predict(X)) ** 2))
+
+# Verifying that the factorized search agrees with a grid search over the same folds
+def test_factorized_search_matches_grid_search():
+    X, y = make_regression_dataset()
+    params = {
+        'alpha_2': [1e-06, 10.0, 1000.0],
+        'lambda_2': [1e-06, 100.0, 10000.0],
+        'max_iter': [2, 300]
+    }
+    bst = FindBestModel()
+    best_model, best_params = bst.find_best_model(BayesianRidge(), params, X, y, cv=3)
+    grid_search = GridSearchCV(BayesianRidge(), params, cv=3, scoring='neg_mean_squared_error').fit(X, y)
+    assert bst.search_summary['method'] == 'factorized'
+    assert best_params == grid_search.best_params_
+    assert bst.cv_results['mean_test_score'] == pytest.approx(grid_search.cv_results_['mean_test_score'], rel=1e-8)
+    assert best_model.coef_ == pytest.approx(grid_search.best_estimator_.coef_)
+
+# Verifying that candidates which only differ after convergence are fitted once
+def test_factorized_search_skips_equivalent_candidates():
+    X, y = make_regression_dataset()
+    params = {
+        'max_iter': [300, 400, 500],
+        'tol': [0.01, 0.001],
+        'lambda_2': [1e-06, 100.0]
+    }
+    bst = FindBestModel()
+    bst.find_best_model(BayesianRidge(), params, X, y, cv=3)
+    summary = bst.search_summary
+    n_iter = bst.cv_results['split_n_iter']
+    assert (n_iter < 300).all()
+    distinct = len({(c['lambda_2'], tuple(iters)) for c, iters in zip(bst.cv_results['params'], n_iter)})
+    assert summary['distinct_models'] == distinct < summary['candidates']
+    assert summary['skipped_fits'] == (summary['candidates'] - distinct) * 3
+    for index, equivalent in enumerate(bst.cv_results['equivalent_to']):
+        assert bst.cv_results['mean_test_score'][index] == bst.cv_results['mean_test_score'][equivalent]
+
+# Verifying that every search strategy stays within its fit budget and traces its progress
+@pytest.mark.parametrize('strategy', ['halving', 'random', 'bayesian'])
+def test_search_strategies_respect_fit_budget(strategy):
+    X, y = make_regression_dataset(n_rows=300)
+    params = {'alpha': [0.01, 0.1, 1.0, 10.0, 100.0, 1000.0], 'fit_intercept': [True, False]}
+    config = ModelSearchConfig(strategy=strategy, max_fits=24, n_candidates=10, n_initial=3, n_jobs=1)
+    bst = FindBestModel(config)
+    best_model, best_params = bst.find_best_model(Ridge(), params, X, y, cv=3)
+    summary = bst.search_summary
+    assert summary['method'] == 'cross_validation'
+    assert summary['evaluated'] * 3 <= 24
+    assert isinstance(best_model, Ridge) and best_params in bst.cv_results['params']
+    trace = bst.search_trace
+    assert len(trace) == summary['evaluated']
+    assert all(a['seconds'] <= b['seconds'] and a['fits'] <= b['fits'] for a, b in zip(trace, trace[1:]))
+    most_rows = max(point['n_samples'] for point in trace)
+    full = [point['best_score'] for point in trace if point['n_samples'] == most_rows]
+    assert full == sorted(full) and full[-1] == summary['best_score']
+
+# Verifying that halving scores the survivors on more rows and that a spent time budget stops the search
+def test_halving_rounds_and_time_budget():
+    X, y = make_regression_dataset(n_rows=900)
+    params = {'alpha': [0.01, 0.1, 1.0, 10.0, 100.0, 1000.0, 10000.0, 100000.0, 1000000.0]}
+    bst = FindBestModel(ModelSearchConfig(strategy='halving', n_jobs=1))
+    bst.find_best_model(Ridge(), params, X, y, cv=3)
+    assert list(np.unique(bst.cv_results['n_samples'])) == [100, 300, 900]
+    assert list(bst.cv_results['n_samples']).count(900) == 1
+    assert bst.search_summary['fits'] == (9 + 3 + 1) * 3 + 1
+    
+    bst = FindBestModel(ModelSearchConfig(strategy='random', max_seconds=0.0, n_jobs=1))
+    best_model, best_params = bst.find_best_model(Ridge(), params, X, y, cv=3)
+    assert bst.search_summary['evaluated'] == 1 and bst.search_summary['budget_exhausted'] is True
+    assert best_model.alpha == best_params['alpha']
+
+# Verifying that the model-based search finds a near-best BayesianRidge within few candidates
+def test_bayesian_search_on_factorized_evaluator():
+    X, y = make_regression_dataset()
+    params = {'alpha_2': [1e-06, 1.0, 10.0, 100.0, 1000.0], 'lambda_2': [1e-06, 1.0, 10.0, 100.0, 1000.0, 10000.0]}
+    exhaustive = FindBestModel()
+    exhaustive.find_best_model(BayesianRidge(), params, X, y, cv=3)
+    bst = FindBestModel(ModelSearchConfig(strategy='bayesian', n_candidates=12, n_initial=4))
+    bst.find_best_model(BayesianRidge(), params, X, y, cv=3)
+    assert bst.search_summary['method'] == 'factorized' and bst.search_summary['evaluated'] == 12
+    scores = np.sort(exhaustive.cv_results['mean_test_score'])[::-1]
+    assert bst.search_summary['best_score'] >= scores[5]
+
+# Creating a helper to build a small raw dataset with the podcast features
+def make_raw_dataset(n_rows=240, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame({
+        'Podcast_Name': rng.choice([f"Podcast {i}" for i in range(8)], n_rows),
+        'Episode_Length_minutes': rng.uniform(5.0, 120.0, n_rows),
+        'Genre': rng.choice(['Technology', 'News', 'Comedy'], n_rows),
+        'Pub_Day_Time': rng.choice(['Monday_Morning', 'Friday_Night'], n_rows)
+    })
+    y = pd.Series(0.7 * X['Episode_Length_minutes'] + rng.normal(scale=8.0, size=n_rows), name='Listening_Time_minutes')
+    return X, y
+
+# Verifying that the preprocessor is fitted once per fold and the scores match a leak-free cross-validation
+def test_fold_preprocessing_scores_without_leakage(tmp_path):
+    X, y = make_raw_dataset()
+    preprocessor = TransformData().create_preprocessor_obj(X)
+    params = {'lambda_2': [1e-06, 100.0, 10000.0], 'tol': [0.01, 0.001]}
+    config = ModelSearchConfig(n_jobs=1, preprocessing_cache_dir=str(tmp_path / 'cache'))
+    bst = FindBestModel(config)
+    best_model, best_params = bst.find_best_model(BayesianRidge(), params, X, y, cv=3, preprocessor=preprocessor)
+    summary = bst.search_summary
+    assert summary['method'] == 'factorized' and summary['evaluated'] == 6
+    assert summary['preprocessor_fits'] == 3 + 1 and summary['preprocessing_cache_hits'] == 0
+    
+    # Scoring the best candidate with the preprocessor refitted inside every fold
+    scores = []
+    for train, test in KFold(n_splits=3).split(X):
+        fitted = clone(preprocessor).fit(X.iloc[train], y.iloc[train])
+        model = BayesianRidge(**best_params).fit(fitted.transform(X.iloc[train]), y.iloc[train])
+        scores.append(-mean_squared_error(y.iloc[test], model.predict(fitted.transform(X.iloc[test]))))
+    assert summary['best_score'] == pytest.approx(np.mean(scores), rel=1e-8)
+    assert best_model.coef_ == pytest.approx(
+        BayesianRidge(**best_params).fit(clone(preprocessor).fit_transform(X, y), y).coef_
+    )
+    
+    # Reusing the transformed folds from the cache in a second search with other candidates
+    config.strategy = 'random'
+    bst = FindBestModel(config)
+    bst.find_best_model(Ridge(), {'alpha': [0.1, 1.0, 10.0]}, X, y, cv=3, preprocessor=preprocessor)
+    assert bst.search_summary['preprocessing_cache_hits'] == 3
+    assert bst.search_summary['preprocessor_fits'] == 1
+
+# Verifying that the out-of-core training matches the in-memory search on streamed row groups
+def test_out_of_core_training_matches_in_memory(tmp_path):
+    X, y = make_regression_dataset(n_rows=100)
+    data = X.assign(Listening_Time_minutes=y)
+    train_path, test_path = str(tmp_path / 'train.parquet'), str(tmp_path / 'test.parquet')
+    data.iloc[:70].to_parquet(train_path, index=False, row_group_size=20)
+    data.iloc[70:].to_parquet(test_path, index=False, row_group_size=20)
+    
+    model = TrainModel()
+    model.feature_store_config = CreateFeatureStoreConfig(xform_train_data=train_path, xform_test_data=test_path)
+    model.search_config = ModelSearchConfig(n_jobs=1)
+    model.out_of_core_config.enabled = True
+    model.out_of_core_config.batch_size = 13
+    model.create_search_params = lambda: {'lambda_2': [1e-06, 100.0, 10000.0], 'alpha_2': [1e-06, 10.0]}
+    best_model, best_params, metric = model.initiate_model_training(make_prediction=True)
+    
+    # Comparing with the factorized search and the model fitted on the rows in memory
+    bst = FindBestModel(ModelSearchConfig(n_jobs=1))
+    expected_model, expected_params = bst.find_best_model(
+        BayesianRidge(), model.create_search_params(), X.iloc[:70], y.iloc[:70], cv=3
+    )
+    assert best_params == expected_params
+    assert best_model.coef_ == pytest.approx(expected_model.coef_, rel=1e-8)
+    assert best_model.intercept_ == pytest.approx(expected_model.intercept_, rel=1e-8)
+    assert best_model.sigma_ == pytest.approx(BayesianRidge(**best_params).fit(X.iloc[:70], y.iloc[:70]).sigma_, rel=1e-6)
+    assert list(best_model.feature_names_in_) == list(X.columns)
+    assert metric == pytest.approx(np.sqrt(mean_squared_error(y.iloc[70:], expected_model.predict(X.iloc[70:]))), rel=1e-8)
@@ -0,0 +1,70 @@
+# Importing packages
+import pytest
+from src.components.config_entity import WriteBehindConfig
+from src.components.config_entity import WarmupConfig
+from src.components.config_entity import DriftSketchConfig
+from src.web_components.create_app import create_app
+from src.web_components.routes import main_bp
+from src.web_components.warmup import AppWarmup
+
+
+# Creating a predictor which records the warmup calls and can be made to fail
+class RecordingPredictor():
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+
+    def warm_up(self, features, batch_rows=64):
+        self.calls.append((len(features), batch_rows))
+        if self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError('Model not available.')
+        return 'runs:/test/models/model'
+
+# Creating a module to build an app backed by a temporary database without warmup
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'podcast.db'}",
+        'WRITE_BEHIND_CONFIG': WriteBehindConfig(enabled=False),
+        'WARMUP_CONFIG': WarmupConfig(enabled=False),
+        'DRIFT_SKETCH_CONFIG': DriftSketchConfig(enabled=False)
+    })
+    app.register_blueprint(main_bp)
+    return app
+
+# Verifying that the app is ready when the warmup is disabled
+def test_healthz_and_readyz_without_warmup(app):
+    client = app.test_client()
+    assert client.get('/healthz').status_code == 200
+    response = client.get('/readyz')
+    assert response.status_code == 200
+    assert response.get_json()['warmup'] == 'disabled'
+
+# Verifying that /readyz reports ready only after the warmup has succeeded
+def test_readyz_after_warmup(app):
+    predictor = RecordingPredictor()
+    warmup = AppWarmup(app, WarmupConfig(background=False, batch_rows=8), predictor)
+    app.extensions['warmup'] = warmup
+    client = app.test_client()
+    assert client.get('/readyz').status_code == 503
+    assert client.get('/healthz').status_code == 200
+    
+    warmup.start()
+    response = client.get('/readyz')
+    assert response.status_code == 200
+    assert response.get_json()['model_uri'] == 'runs:/test/models/model'
+    assert predictor.calls == [(1, 8)]
+    assert set(warmup.status()['step_seconds']) == {'database', 'predictions'}
+
+# Verifying that the warmup retries and reports a failure
+def test_warmup_retries_and_fails(app):
+    predictor = RecordingPredictor(failures=5)
+    warmup = AppWarmup(app, WarmupConfig(background=True, max_attempts=2, retry_interval=0.0), predictor)
+    app.extensions['warmup'] = warmup
+    warmup.start()
+    assert warmup.wait(timeout=10) is False
+    assert warmup.status()['state'] == 'failed' and warmup.attempts == 2
+    response = app.test_client().get('/readyz')
+    assert response.status_code == 503
+    assert 'Model not available.' in response.get_json()['error']
@@ -2,13 +2,19 @@
 import sys
 import os
 import json
+import hashlib
+import itertools
 from pathlib import Path
 import pandas as pd
-import sqlite3
+import pyarrow as pa
+import pyarrow.dataset as ds
 from datetime import datetime
 from src.logger import logging
 from src.exception import CustomException
 from src.components.config_entity import DatabaseConfig
+from src.components.config_entity import StreamingReaderConfig
+from src.components.config_entity import ArchiveConfig
+from src.components.database import get_read_pool
 
 # Creating a function to drop all rows that have a listing time of 0
 def drop_zero_listening_time(df:pd.DataFrame)->pd.DataFrame:
@@ -102,8 +108,8 @@ def load_run_params(directory='run_config'):
         latest_file = None
         latest_date = None
         for file_name in json_files:
-            date_str = file_name.split('_')[2].split('.')[0]
-            file_date = datetime.strptime(date_str, '%Y%m%d')
+            date_str = '_'.join(file_name.split('_')[2:4]).split('.')[0]
+            file_date = datetime.strptime(date_str, '%Y%m%d_%H-%M-%S')
             if not latest_date or file_date > latest_date:
                 latest_date = file_date
                 latest_file = dir_path / file_name
@@ -157,8 +163,140 @@ def get_current_time():
     except Exception as e:
         raise CustomException(e, sys)
 
+# Creating a function to compute the digest of a file
+def compute_file_digest(file_path:str)->str:
+    '''
+    This function computes the sha256 digest of a file, reading it in blocks so that
+    large datasets are never loaded into memory at once.
+    ========================================================================================
+    ---------------------
+    Parameters:
+    ---------------------
+    file_path : str - This is the path to the file.
+    
+    ---------------------
+    Returns:
+    ---------------------
+    digest : str - The hexadecimal sha256 digest of the file.
+    ========================================================================================
+    '''
+    try:
+        sha = hashlib.sha256()
+        with open(file_path, 'rb') as file_obj:
+            for block in iter(lambda: file_obj.read(1 << 20), b''):
+                sha.update(block)
+        return sha.hexdigest()
+    
+    except Exception as e:
+        raise CustomException(e, sys)
+
+# The archived columns which make up each table and the prediction log
+ARCHIVE_COLUMNS = {
+    'data': {
+        'id': 'id',
+        'Podcast_Name': 'Podcast_Name',
+        'Episode_Length_minutes': 'Episode_Length_minutes',
+        'Genre': 'Genre',
+        'Publication_Day': 'Publication_Day',
+        'Publication_Time': 'Publication_Time',
+        'created_at': 'created_at'
+    },
+    'predictions': {
+        'pred_id': 'pred_id',
+        'data_id': 'id',
+        'prediction': 'prediction',
+        'created_at': 'prediction_created_at'
+    },
+    'prediction_log': {
+        'Podcast_Name': 'Podcast_Name',
+        'Episode_Length_minutes': 'Episode_Length_minutes',
+        'Genre': 'Genre',
+        'Publication_Day': 'Publication_Day',
+        'Publication_Time': 'Publication_Time',
+        'Listening_Time_minutes': 'prediction'
+    }
+}
+
+# Creating a function to stream the archived prediction log
+def stream_archive(columns:dict, start=None, end=None, archive_dir:str=None, chunk_size:int=None,
+                   required_column:str=None):
+    '''
+    This function yields the archived rows of the prediction log, optionally restricted
+    to a created_at range, in chunks of at most chunk_size rows. Only the day partitions
+    which overlap the range are read. Nothing is yielded when there is no archive.
+    ========================================================================================
+    ---------------------
+    Parameters:
+    ---------------------
+    columns : dict - The columns to return, mapped to the archived columns they are read
+    from, for example one of the entries of ARCHIVE_COLUMNS.
+    start : datetime or str - Only requests created at or after this time are returned.
+    end : datetime or str - Only requests created before this time are returned.
+    archive_dir : str - This is the folder of the archive. Defaults to ArchiveConfig.archive_dir.
+    chunk_size : int - This is the number of rows per chunk.
+    required_column : str - Only rows in which this archived column is set are returned.
+    
+    ---------------------
+    Returns:
+    ---------------------
+    chunks : iterator of Pandas dataframes - The archived rows.
+    ========================================================================================
+    '''
+    try:
+        archive_dir = archive_dir or ArchiveConfig().archive_dir
+        if not os.path.isdir(archive_dir):
+            return
+        dataset = ds.dataset(
+            archive_dir,
+            format='parquet',
+            partitioning=ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+        )
+        if not dataset.files:
+            return
+        
+        # Pruning the day partitions first, then filtering on the exact creation time
+        conditions = []
+        if start is not None:
+            start = pd.Timestamp(format_db_timestamp(start))
+            conditions.append(ds.field('date') >= start.strftime('%Y-%m-%d'))
+            conditions.append(ds.field('created_at') >= pa.scalar(start.to_pydatetime(), type=pa.timestamp('us')))
+        if end is not None:
+            end = pd.Timestamp(format_db_timestamp(end))
+            conditions.append(ds.field('date') <= end.strftime('%Y-%m-%d'))
+            conditions.append(ds.field('created_at') < pa.scalar(end.to_pydatetime(), type=pa.timestamp('us')))
+        if required_column is not None:
+            conditions.append(ds.field(required_column).is_valid())
+        condition = None
+        for expression in conditions:
+            condition = expression if condition is None else condition & expression
+        
+        for batch in dataset.to_batches(
+            columns={name: ds.field(archived) for name, archived in columns.items()},
+            filter=condition,
+            batch_size=chunk_size or StreamingReaderConfig().chunk_size
+        ):
+            if batch.num_rows:
+                yield batch.to_pandas()
+    
+    except Exception as e:
+        raise CustomException(e, sys)
+
+# Creating a function to list the days in the archive
+def fetch_archive_days(archive_dir:str=None)->list:
+    '''
+    This function returns the sorted days, as YYYY-MM-DD, which have a partition in the
+    archive of the prediction log.
+    '''
+    archive_dir = archive_dir or ArchiveConfig().archive_dir
+    if not os.path.isdir(archive_dir):
+        return []
+    return sorted(
+        name[len('date='):] for name in os.listdir(archive_dir)
+        if name.startswith('date=') and os.listdir(os.path.join(archive_dir, name))
+    )
+
 # Creating a function to read the data in the SQLite database
-def read_sql_data(table='data'):
+def read_sql_data(table='data', include_archive:bool=True):
     '''
     This function reads the data from the SQLite database and returns it as a pandas
     dataframe.
@@ -168,6 +306,7 @@ def read_sql_data(table='data'):
     ---------------------
     table : str - This is the name of the table in the database. The default value is 'data'.
     Allowed values are 'data' and 'predictions'.
+    include_archive : bool - This determines whether the archived rows are included.
     
     ---------------------
     Returns:
@@ -177,25 +316,254 @@ def read_sql_data(table='data'):
     =========================================================================================
     '''
     try:
-        # Reading the path to the database
-        db_config = DatabaseConfig()
-        db_path = db_config.db_path
-        
-        # Creating a connection to the database
-        conn = sqlite3.connect(db_path)
+        # Validating the table name, as it cannot be passed as a query parameter
+        if table not in ('data', 'predictions'):
+            raise ValueError(f"Unknown table {table}. Allowed values are 'data' and 'predictions'.")
         
-        # Creating the query to read the data
-        query = f"SELECT * FROM {table}"
+        # Reading the data through the shared read-only connection pool
+        with get_read_pool(DatabaseConfig().db_path).connection() as conn:
+            df = pd.read_sql_query(f"SELECT * FROM {table}", con=conn)
         
-        # Reading the data into a dataframe
-        df = pd.read_sql_query(query, con=conn)
-        
-        # Closing the connection
-        conn.close()
+        # Adding the archived rows, with created_at in the format of the live table
+        if include_archive:
+            archived = list(stream_archive(
+                ARCHIVE_COLUMNS[table], required_column='pred_id' if table == 'predictions' else None
+            ))
+            if archived:
+                archived_df = pd.concat(archived, ignore_index=True)
+                archived_df['created_at'] = archived_df['created_at'].dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+                df = pd.concat([archived_df, df], ignore_index=True)[df.columns]
         
         return df
     
     except Exception as e:
         raise CustomException(e, sys)
     
-    
\ No newline at end of file
+# Creating a function to convert a timestamp to the format stored in the database
+def format_db_timestamp(value)->str:
+    '''
+    This function converts a datetime, a date or an ISO string into the text format in
+    which SQLAlchemy stores DateTime columns in SQLite, so that it can be compared with
+    the created_at columns. Timezone-aware values are converted to UTC first, as the
+    timestamps are stored in UTC.
+    '''
+    try:
+        timestamp = pd.Timestamp(value)
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+        return timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')
+    
+    except Exception as e:
+        raise CustomException(e, sys)
+
+# Creating a function to build the query for the prediction log
+def build_prediction_log_query(start=None, end=None):
+    '''
+    This function builds the query which joins the logged requests with their
+    predictions in SQLite and only returns the columns used for drift detection, with the
+    prediction renamed to Listening_Time_minutes.
+    ========================================================================================
+    ---------------------
+    Parameters:
+    ---------------------
+    start : datetime or str - Only requests created at or after this time are returned.
+    end : datetime or str - Only requests created before this time are returned.
+    
+    ---------------------
+    Returns:
+    ---------------------
+    query : str - The SQL query.
+    params : tuple - The parameters of the query.
+    ========================================================================================
+    '''
+    query = (
+        "SELECT d.Podcast_Name, d.Episode_Length_minutes, d.Genre, d.Publication_Day, "
+        "d.Publication_Time, p.prediction AS Listening_Time_minutes "
+        "FROM data d LEFT JOIN predictions p ON p.data_id = d.id"
+    )
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("d.created_at >= ?")
+        params.append(format_db_timestamp(start))
+    if end is not None:
+        conditions.append("d.created_at < ?")
+        params.append(format_db_timestamp(end))
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query, tuple(params)
+
+# Creating a function to read the prediction log from the SQLite database
+def read_prediction_log(start=None, end=None, db_path:str=None, include_archive:bool=True,
+                        archive_dir:str=None)->pd.DataFrame:
+    '''
+    This function reads the logged requests joined with their predictions in a single
+    query, optionally restricted to a created_at range, so that only the requested
+    period and columns are loaded into memory. The archived requests of the period come
+    first, followed by the live ones.
+    ========================================================================================
+    ---------------------
+    Parameters:
+    ---------------------
+    start : datetime or str - Only requests created at or after this time are returned.
+    end : datetime or str - Only requests created before this time are returned.
+    db_path : str - This is the path to the database. Defaults to DatabaseConfig.db_path.
+    include_archive : bool - This determines whether the archived requests are included.
+    archive_dir : str - This is the folder of the archive. Defaults to ArchiveConfig.archive_dir.
+    
+    ---------------------
+    Returns:
+    ---------------------
+    df : Pandas dataframe - The requests and their predictions.
+    ========================================================================================
+    '''
+    try:
+        query, params = build_prediction_log_query(start, end)
+        with get_read_pool(db_path or DatabaseConfig().db_path).connection() as conn:
+            df = pd.read_sql_query(query, con=conn, params=params)
+        if include_archive:
+            archived = list(stream_archive(ARCHIVE_COLUMNS['prediction_log'], start, end, archive_dir))
+            if archived:
+                df = pd.concat(archived + [df], ignore_index=True)
+        return df
+    
+    except Exception as e:
+        raise CustomException(e, sys)
+
+# Creating a function to stream the result of a query in typed chunks
+def stream_sql_query(query:str, params:tuple=(), dtypes:dict=None, parse_dates:list=None,
+                     chunk_size:int=None, as_arrow:bool=False, db_path:str=None):
+    '''
+    This function runs a query on a pooled read-only connection and yields the result in
+    chunks of at most chunk_size rows, so that arbitrarily large results are processed
+    with bounded memory. Every chunk has the given dtypes. With as_arrow set, every chunk
+    is yielded as an Arrow record batch instead, with the categoricals dictionary encoded.
+    
+    The pooled connection is held until the generator is exhausted or closed. Callers
+    which stop early must call close() on the generator, or use contextlib.closing, so
+    that the connection is returned to the pool.
+    ========================================================================================
+    ---------------------
+    Parameters:
+    ---------------------
+    query : str - This is the SQL query.
+    params : tuple - These are the parameters of the query.
+    dtypes : dict - These are the dtypes of the columns, for example {'Genre': 'category'}.
+    parse_dates : list - These are the columns which are parsed as datetimes.
+    chunk_size : int - This is the number of rows per chunk. Defaults to
+    StreamingReaderConfig.chunk_size.
+    as_arrow : bool - This determines whether Arrow record batches are yielded.
+    db_path : str - This is the path to the database. Defaults to DatabaseConfig.db_path.
+    
+    ---------------------
+    Returns:
+    ---------------------
+    chunks : iterator of Pandas dataframes or Arrow record batches - The result of the query.
+    ========================================================================================
+    '''
+    try:
+        chunk_size = chunk_size or StreamingReaderConfig().chunk_size
+        with get_read_pool(db_path or DatabaseConfig().db_path).connection() as conn:
+            chunks = pd.read_sql_query(
+                query, con=conn, params=params, chunksize=chunk_size, dtype=dtypes, parse_dates=parse_dates
+            )
+            yield from (to_record_batches(chunks) if as_arrow else chunks)
+    
+    except Exception as e:
+        raise CustomException(e, sys)
+
+# Creating a function to convert dataframe chunks into Arrow record batches
+def to_record_batches(chunks):
+    '''
+    This function converts a stream of dataframe chunks into Arrow record batches. The
+    schema is fixed on the first chunk, with the categoricals dictionary encoded, so that
+    every batch has the same types.
+    '''
+    schema = None
+    for chunk in chunks:
+        if schema is None:
+            schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+            schema = pa.schema([
+                pa.field(f.name, pa.dictionary(pa.int32(), pa.string()))
+                if pa.types.is_dictionary(f.type) else f
+                for f in schema
+            ])
+        yield pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False)
+
+# Creating a function to stream a table of the SQLite database
+def stream_sql_data(table='data', chunk_size:int=None, as_arrow:bool=False, db_path:str=None,
+                    include_archive:bool=True, archive_dir:str=None):
+    '''
+    This function is the streaming variant of read_sql_data. It yields the table in
+    chunks of at most chunk_size rows, with categoricals for the text columns, float32 for
+    the numeric columns and datetimes for created_at. The archived rows come first.
+    ========================================================================================
+    ---------------------
+    Parameters:
+    ---------------------
+    table : str - This is the name of the table in the database. The default value is 'data'.
+    Allowed values are 'data' and 'predictions'.
+    chunk_size : int - This is the number of rows per chunk.
+    as_arrow : bool - This determines whether Arrow record batches are yielded.
+    db_path : str - This is the path to the database. Defaults to DatabaseConfig.db_path.
+    include_archive : bool - This determines whether the archived rows are included.
+    archive_dir : str - This is the folder of the archive. Defaults to ArchiveConfig.archive_dir.
+    
+    ---------------------
+    Returns:
+    ---------------------
+    chunks : iterator of Pandas dataframes or Arrow record batches - The rows of the table.
+    ========================================================================================
+    '''
+    if table not in ('data', 'predictions'):
+        raise CustomException(
+            ValueError(f"Unknown table {table}. Allowed values are 'data' and 'predictions'."), sys
+        )
+    dtypes = StreamingReaderConfig().table_dtypes[table]
+    chunks = stream_sql_query(
+        f"SELECT * FROM {table}",
+        dtypes=dtypes,
+        parse_dates=['created_at'],
+        chunk_size=chunk_size,
+        db_path=db_path
+    )
+    if include_archive:
+        archived = stream_archive(
+            ARCHIVE_COLUMNS[table], archive_dir=archive_dir, chunk_size=chunk_size,
+            required_column='pred_id' if table == 'predictions' else None
+        )
+        chunks = itertools.chain((chunk.astype(dtypes) for chunk in archived), chunks)
+    return to_record_batches(chunks) if as_arrow else chunks
+
+# Creating a function to stream the prediction log
+def stream_prediction_log(start=None, end=None, chunk_size:int=None, as_arrow:bool=False, db_path:str=None,
+                          include_archive:bool=True, archive_dir:str=None):
+    '''
+    This function is the streaming variant of read_prediction_log. It yields the logged
+    requests joined with their predictions, optionally restricted to a created_at range,
+    in typed chunks of at most chunk_size rows. The archived requests come first.
+    ========================================================================================
+    ---------------------
+    Parameters:
+    ---------------------
+    start : datetime or str - Only requests created at or after this time are returned.
+    end : datetime or str - Only requests created before this time are returned.
+    chunk_size : int - This is the number of rows per chunk.
+    as_arrow : bool - This determines whether Arrow record batches are yielded.
+    db_path : str - This is the path to the database. Defaults to DatabaseConfig.db_path.
+    include_archive : bool - This determines whether the archived requests are included.
+    archive_dir : str - This is the folder of the archive. Defaults to ArchiveConfig.archive_dir.
+    
+    ---------------------
+    Returns:
+    ---------------------
+    chunks : iterator of Pandas dataframes or Arrow record batches - The requests and their
+    predictions.
+    ========================================================================================
+    '''
+    query, params = build_prediction_log_query(start, end)
+    dtypes = StreamingReaderConfig().prediction_log_dtypes
+    chunks = stream_sql_query(query, params=params, dtypes=dtypes, chunk_size=chunk_size, db_path=db_path)
+    if include_archive:
+        archived = stream_archive(ARCHIVE_COLUMNS['prediction_log'], start, end, archive_dir, chunk_size)
+        chunks = itertools.chain((chunk.astype(dtypes) for chunk in archived), chunks)
+    return to_record_batches(chunks) if as_arrow else chunks
@@ -1,12 +1,21 @@
 import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from src.components.config_entity import DatabaseConfig
+from src.components.database import apply_sqlite_pragmas, create_engine_options, create_indexes
+from src.components.config_entity import WriteBehindConfig
+from src.components.config_entity import CoalescerConfig
+from src.components.config_entity import WarmupConfig
+from src.components.config_entity import DriftSketchConfig
+from src.components.coalesce_predictions import PredictionCoalescer
+from src.components.drift_sketches import OnlineDriftSketches
 
 # Creating the database instance
 db = SQLAlchemy()
 
 # Creating the app function
-def create_app():
+def create_app(test_config=None):
 
     # Get the root directory (where app.py is located)
     root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -24,8 +33,62 @@ def create_app():
     db_path = os.path.join(db_dir, 'podcast.db')
     app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = create_engine_options()
+
+    # Applying any overrides, for example a separate database for testing
+    if test_config is not None:
+        app.config.update(test_config)
 
     # Registering the models
     db.init_app(app)
 
+    # Applying the WAL journal and cache settings to every new SQLite connection
+    database_config = app.config.get('DATABASE_CONFIG', DatabaseConfig())
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(
+                db.engine,
+                'connect',
+                lambda dbapi_conn, _: apply_sqlite_pragmas(dbapi_conn, database_config)
+            )
+
+            # Adding the prediction log indexes to databases created before they existed
+            raw_conn = db.engine.raw_connection()
+            try:
+                create_indexes(raw_conn.driver_connection)
+            finally:
+                raw_conn.close()
+
+    # Starting the write-behind writer for the request and prediction rows
+    write_behind_config = app.config.get('WRITE_BEHIND_CONFIG', WriteBehindConfig())
+    if write_behind_config.enabled:
+        # Imported here, as the writer depends on the models, which depend on db
+        from src.web_components.prediction_writer import PredictionWriter
+        writer = PredictionWriter(app, write_behind_config)
+        writer.start()
+        app.extensions['prediction_writer'] = writer
+
+    # Starting the coalescer which batches concurrent single-row predictions
+    coalescer_config = app.config.get('COALESCER_CONFIG', CoalescerConfig())
+    if coalescer_config.window_ms > 0:
+        coalescer = PredictionCoalescer(coalescer_config)
+        coalescer.start()
+        app.extensions['prediction_coalescer'] = coalescer
+
+    # Starting the online drift sketches, which are updated with every served request
+    sketch_config = app.config.get('DRIFT_SKETCH_CONFIG', DriftSketchConfig())
+    if sketch_config.enabled:
+        sketches = OnlineDriftSketches(sketch_config)
+        sketches.start()
+        app.extensions['drift_sketches'] = sketches
+
+    # Warming up the prediction pipeline, /readyz reports ready once this has finished
+    warmup_config = app.config.get('WARMUP_CONFIG', WarmupConfig())
+    if warmup_config.enabled:
+        # Imported here, as the warmup depends on db
+        from src.web_components.warmup import AppWarmup
+        warmup = AppWarmup(app, warmup_config)
+        app.extensions['warmup'] = warmup
+        warmup.start()
+
     return app
\ No newline at end of file
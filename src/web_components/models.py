@@ -9,6 +9,8 @@ class Data(db.Model):
     by the user on the web page.
     '''
     __tablename__ = 'data'
+    # The ids are never reused, so the archived requests keep unique ids
+    __table_args__ = {'sqlite_autoincrement': True}
     
     id = db.Column(db.Integer, primary_key=True)
     Podcast_Name = db.Column(db.String(30), nullable=False)
@@ -16,7 +18,7 @@ class Data(db.Model):
     Genre = db.Column(db.String(30), nullable=False)
     Publication_Day = db.Column(db.String(30), nullable=False)
     Publication_Time = db.Column(db.String(30), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
     preds = db.relationship('Predictions', backref='data', lazy=True)
     
     # Creating a method to return the string representation of the class.
@@ -33,11 +35,12 @@ class Predictions(db.Model):
     This class defines the table to store the predictions made by the model.
     '''
     __tablename__ = 'predictions'
+    __table_args__ = {'sqlite_autoincrement': True}
     
     pred_id = db.Column(db.Integer, primary_key=True)
-    data_id = db.Column(db.Integer, db.ForeignKey('data.id'), nullable=False)
+    data_id = db.Column(db.Integer, db.ForeignKey('data.id'), nullable=False, index=True)
     prediction = db.Column(db.Float, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     
     # Creating a method to return the string representation of the class.
     def __repr__(self):
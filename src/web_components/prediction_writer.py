@@ -0,0 +1,260 @@
+# Importing packages
+import sys
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from src.web_components.create_app import db
+from src.web_components.models import Data, Predictions
+from src.components.config_entity import WriteBehindConfig
+from src.exception import CustomException
+from src.logger import logging
+from src.metrics import stage_timer
+
+# Creating a function to insert request and prediction rows in one transaction
+def insert_prediction_rows(records:list, preds:list):
+    '''
+    This function inserts the request rows into the data table and the matching
+    predictions into the predictions table, using one multi-row insert per table, and
+    commits both in a single transaction. It must be called inside an app context.
+    =========================================================================================
+    ---------------------
+    Parameters:
+    ---------------------
+    records : list - The request rows, as dictionaries with the columns of the data table.
+    preds : list - The prediction for every request row.
+    =========================================================================================
+    '''
+    try:
+        with stage_timer('database', 'flush'):
+            data_ids = db.session.scalars(
+                insert(Data).returning(Data.id, sort_by_parameter_order=True),
+                records
+            ).all()
+            db.session.execute(
+                insert(Predictions),
+                [
+                    {'data_id': data_id, 'prediction': pred, 'created_at': record['created_at']}
+                    for data_id, pred, record in zip(data_ids, preds, records)
+                ]
+            )
+        with stage_timer('database', 'commit'):
+            db.session.commit()
+    
+    except Exception as e:
+        db.session.rollback()
+        raise CustomException(e, sys)
+
+
+# Creating a class to persist request and prediction rows in the background
+class PredictionWriter():
+    '''
+    This class persists the request and prediction rows from a background thread. Requests
+    push their rows onto a bounded in-process queue, and the writer drains the queue in
+    batches, writing each batch with multi-row inserts in one transaction. This keeps the
+    SQLite write lock out of the request path. The queue is flushed on shutdown.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, app, config:WriteBehindConfig=None):
+        '''
+        This is the constructor for the PredictionWriter class.
+        '''
+        self.app = app
+        self.config = config or WriteBehindConfig()
+        self.queue = queue.Queue(maxsize=self.config.max_queue_size)
+        self._stop_event = threading.Event()
+        self._submit_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._thread = None
+        self._exit_registered = False
+        self.enqueued = 0
+        self.rejected = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.total_write_seconds = 0.0
+        self.max_write_seconds = 0.0
+        self.last_write_seconds = 0.0
+    
+    # Creating a method to start the background writer
+    def start(self):
+        '''
+        This method starts the background writer thread and registers a flush on shutdown.
+        '''
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='prediction-writer', daemon=True)
+        self._thread.start()
+        if not self._exit_registered:
+            atexit.register(self.stop)
+            self._exit_registered = True
+    
+    # Creating a method to queue rows for writing
+    def submit(self, records:list, preds:list)->bool:
+        '''
+        This method queues request rows and their predictions for writing. It never blocks:
+        if the queue does not have room for the rows, nothing is queued and False is
+        returned, so the caller can write the rows synchronously instead.
+        =========================================================================================
+        ---------------------
+        Parameters:
+        ---------------------
+        records : list - The request rows, as dictionaries with the columns of the data table.
+        preds : list - The prediction for every request row.
+        
+        ---------------------
+        Returns:
+        ---------------------
+        queued : bool - True if the rows were queued.
+        =========================================================================================
+        '''
+        if self._thread is None or self._stop_event.is_set():
+            return False
+        # A request's rows are queued together, so a request is never half-written. Only
+        # the writer thread removes rows, so the room cannot shrink while the lock is held.
+        with self._submit_lock:
+            if self.queue.maxsize - self.queue.qsize() < len(records):
+                with self._stats_lock:
+                    self.rejected += len(records)
+                return False
+            for record, pred in zip(records, preds):
+                self.queue.put_nowait((record, pred))
+        with self._stats_lock:
+            self.enqueued += len(records)
+        return True
+    
+    # Creating a method to take the next batch from the queue
+    def _next_batch(self, timeout:float)->list:
+        '''
+        This method waits up to timeout seconds for a row and then drains up to batch_size
+        rows from the queue without waiting.
+        '''
+        batch = []
+        try:
+            batch.append(self.queue.get(timeout=timeout))
+        except queue.Empty:
+            return batch
+        while len(batch) < self.config.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    # Creating a method to write one batch
+    def _write_batch(self, batch:list):
+        '''
+        This method writes one batch of rows and records the write latency.
+        '''
+        start = time.perf_counter()
+        try:
+            with self.app.app_context():
+                insert_prediction_rows([record for record, _ in batch], [pred for _, pred in batch])
+            elapsed = time.perf_counter() - start
+            with self._stats_lock:
+                self.written += len(batch)
+                self.batches += 1
+                self.last_write_seconds = elapsed
+                self.total_write_seconds += elapsed
+                self.max_write_seconds = max(self.max_write_seconds, elapsed)
+        except Exception as e:
+            with self._stats_lock:
+                self.failed += len(batch)
+            logging.error(f"The prediction writer failed to write {len(batch)} rows: {e}")
+        finally:
+            for _ in batch:
+                self.queue.task_done()
+    
+    # Creating the loop of the background writer
+    def _run(self):
+        '''
+        This method is the loop of the background writer thread. It keeps writing until
+        it is stopped and the queue is empty.
+        '''
+        while True:
+            batch = self._next_batch(self.config.flush_interval)
+            if batch:
+                self._write_batch(batch)
+            elif self._stop_event.is_set():
+                break
+    
+    # Creating a method to wait for the queued rows to be written
+    def flush(self, timeout:float=None)->bool:
+        '''
+        This method waits until every queued row has been written, or until the timeout
+        has passed. It returns True if the queue was fully drained.
+        '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+    
+    # Creating a method to stop the background writer
+    def stop(self):
+        '''
+        This method stops accepting rows, writes everything still queued and stops the
+        background writer thread.
+        '''
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(self.config.shutdown_timeout)
+        if self._thread.is_alive():
+            logging.error(f"The prediction writer did not finish within {self.config.shutdown_timeout}s, "
+                          f"{self.queue.qsize()} rows were not written.")
+        self._thread = None
+    
+    # Creating a method to report the writer metrics
+    def stats(self)->dict:
+        '''
+        This method returns the queue depth, row counters and write latencies.
+        '''
+        with self._stats_lock:
+            return {
+                'queue_depth': self.queue.qsize(),
+                'max_queue_size': self.config.max_queue_size,
+                'enqueued': self.enqueued,
+                'rejected': self.rejected,
+                'written': self.written,
+                'failed': self.failed,
+                'batches': self.batches,
+                'last_write_seconds': self.last_write_seconds,
+                'mean_write_seconds': self.total_write_seconds / self.batches if self.batches else 0.0,
+                'max_write_seconds': self.max_write_seconds
+            }
+
+
+# Creating a function to persist request and prediction rows
+def persist_predictions(app, records:list, preds:list):
+    '''
+    This function stores request rows and their predictions. When the app has a running
+    write-behind writer, the rows are queued for it; otherwise, or if the queue is full,
+    they are written synchronously in one short transaction. The online drift sketches of
+    the app, if any, are updated first.
+    =========================================================================================
+    ---------------------
+    Parameters:
+    ---------------------
+    app : Flask app - The application whose database the rows are written to.
+    records : list - The request rows, as dictionaries with the columns of the data table.
+    preds : list - The prediction for every request row.
+    =========================================================================================
+    '''
+    created_at = datetime.now(timezone.utc)
+    records = [dict(record, created_at=created_at) for record in records]
+    
+    sketches = app.extensions.get('drift_sketches')
+    if sketches is not None:
+        sketches.update(records, preds)
+    
+    writer = app.extensions.get('prediction_writer')
+    if writer is not None and writer.submit(records, preds):
+        return
+    insert_prediction_rows(records, preds)
@@ -1,10 +1,11 @@
 # Import packages
 import pandas as pd
-from flask import Blueprint, render_template, request, jsonify
-from src.web_components.create_app import db
-from src.web_components.models import Data, Predictions
+from flask import Blueprint, render_template, request, jsonify, current_app, Response
+from src.web_components.prediction_writer import persist_predictions
 from src.components.create_custom_data import CreateCustomData
-from src.components.make_predictions import MakePredictions
+from src.components.create_custom_data import CreateCustomBatchData
+from src.components.make_predictions import MakePredictions, prediction_cache
+from src.metrics import stage_metrics, stage_timer
 
 # Defining the blueprint
 main_bp = Blueprint('main', __name__)
@@ -31,7 +32,17 @@ def predict_datapoint():
     
     # If the method is "POST", then run the prediction
     elif request.method == "POST":
-        # Capturing the data entered by the user
+        with stage_timer('predict', 'total'):
+            return _predict_form()
+
+# Creating a function to run the prediction for the data entered on the website
+def _predict_form():
+    '''
+    This function runs the prediction for the data entered on the website and times
+    every stage of the request.
+    '''
+    # Capturing the data entered by the user
+    with stage_timer('predict', 'parse_form'):
         data = CreateCustomData(
             Podcast_Name = str(request.form.get('Podcast_Name')),
             Episode_Length_minutes = float(request.form.get('Episode_Length_minutes')),
@@ -39,33 +50,107 @@ def predict_datapoint():
             Publication_Day = str(request.form.get('Publication_Day')),
             Publication_Time = str(request.form.get('Publication_Time'))
         )
-        
-        # Loading the data into the database
-        user_data = Data(
-            Podcast_Name = str(request.form.get('Podcast_Name')),
-            Episode_Length_minutes = float(request.form.get('Episode_Length_minutes')),
-            Genre = str(request.form.get('Genre')),
-            Publication_Day = str(request.form.get('Publication_Day')),
-            Publication_Time = str(request.form.get('Publication_Time'))
-        )
-        db.session.add(user_data)
-        db.session.flush()
-        
-        # Creating a dataframe from the user entered data
+    
+    # Capturing the row to store in the database
+    user_data = {
+        'Podcast_Name': data.Podcast_Name,
+        'Episode_Length_minutes': data.Episode_Length_minutes,
+        'Genre': data.Genre,
+        'Publication_Day': data.Publication_Day,
+        'Publication_Time': data.Publication_Time
+    }
+    
+    # Creating a dataframe from the user entered data
+    with stage_timer('predict', 'create_dataframe'):
         df = data.create_dataframe()
         df.drop(labels=['time'], axis=1, inplace=True)
+    
+    # Making predictions using the user entered data. Concurrent requests are
+    # batched together when the coalescer is enabled.
+    with stage_timer('predict', 'predict'):
+        coalescer = current_app.extensions.get('prediction_coalescer')
+        if coalescer is not None:
+            preds = coalescer.predict(df)
+        else:
+            prediction = MakePredictions()
+            preds = prediction.make_predictions(df)
+    
+    # Storing the user entered data and the prediction in the database. No write
+    # transaction is held open while the prediction is made.
+    with stage_timer('predict', 'persist'):
+        persist_predictions(current_app, [user_data], [preds])
+    
+    # Returning the prediction to the web application
+    return render_template('predict.html', results=preds, pred_df=df)
+
+# Creating a function to make predictions for a batch of episodes
+@main_bp.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    '''
+    This function accepts a JSON array of episodes, makes the predictions for the whole
+    batch in one pass, stores the episodes and predictions in the database using bulk
+    inserts and returns all predictions as JSON.
+    '''
+    with stage_timer('predict_batch', 'total'):
+        # Validating the episodes sent by the client
+        with stage_timer('predict_batch', 'parse_json'):
+            try:
+                batch_data = CreateCustomBatchData(request.get_json(silent=True))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         
-        # Making predictions using the user entered data
-        prediction = MakePredictions()
-        preds = prediction.make_predictions(df)
+        # Creating a single dataframe from the batch of episodes
+        with stage_timer('predict_batch', 'create_dataframe'):
+            df = batch_data.create_dataframe()
+            df.drop(labels=['time'], axis=1, inplace=True)
+            records = df.to_dict(orient='records')
         
-        # Storing the predictions in the database
-        preds_data = Predictions(
-            data_id = user_data.id,
-            prediction = preds
-        )
-        db.session.add(preds_data)
-        db.session.commit()
+        # Making predictions for the whole batch
+        with stage_timer('predict_batch', 'predict'):
+            prediction = MakePredictions()
+            preds = prediction.make_batch_predictions(df).tolist()
+        
+        # Storing the episodes and predictions in the database with bulk inserts
+        with stage_timer('predict_batch', 'persist'):
+            persist_predictions(current_app, records, preds)
         
-        # Returning the prediction to the web application
-        return render_template('predict.html', results=preds, pred_df=df)
\ No newline at end of file
+        # Returning the predictions in the order of the episodes
+        return jsonify({'count': len(preds), 'predictions': preds})
+
+# Creating the liveness endpoint
+@main_bp.route('/healthz')
+def healthz():
+    '''
+    This function reports that the application process is up. It does not depend on
+    the model or the database.
+    '''
+    return jsonify({'status': 'ok'})
+
+# Creating the readiness endpoint
+@main_bp.route('/readyz')
+def readyz():
+    '''
+    This function reports whether the application is ready to receive traffic. It
+    returns 503 until the startup warmup has loaded the model and scored a synthetic
+    episode. When the warmup is disabled the application is always ready.
+    '''
+    warmup = current_app.extensions.get('warmup')
+    if warmup is None:
+        return jsonify({'status': 'ready', 'warmup': 'disabled'})
+    status = warmup.status()
+    return jsonify(dict(status, status='ready' if status['ready'] else 'not ready')), 200 if status['ready'] else 503
+
+# Creating the metrics endpoint
+@main_bp.route('/metrics')
+def metrics():
+    '''
+    This function returns the stage latencies and the statistics of the prediction
+    cache, the write-behind writer, the coalescer, the drift sketches and the warmup in
+    the Prometheus text format.
+    '''
+    gauges = {'prediction_cache': prediction_cache.stats()}
+    for name in ('prediction_writer', 'prediction_coalescer', 'drift_sketches', 'warmup'):
+        component = current_app.extensions.get(name)
+        if component is not None:
+            gauges[name] = component.stats() if hasattr(component, 'stats') else component.status()
+    return Response(stage_metrics.render_prometheus(gauges), mimetype='text/plain; version=0.0.4')
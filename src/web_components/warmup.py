@@ -0,0 +1,140 @@
+# Importing packages
+import time
+import threading
+from sqlalchemy import text
+from src.web_components.create_app import db
+from src.components.config_entity import WarmupConfig
+from src.components.create_custom_data import CreateCustomData
+from src.components.make_predictions import MakePredictions
+from src.logger import logging
+
+# Creating a class to warm up the web application before it receives traffic
+class AppWarmup():
+    '''
+    This class runs the startup warmup of the web application. It opens the database
+    connection, loads the latest model into the model store and scores a synthetic
+    episode through the prediction pipeline. The application reports itself as ready on
+    /readyz only after the warmup has succeeded, so the load balancer never sends traffic
+    to a cold instance.
+    '''
+    # Creating the constructor for the class
+    def __init__(self, app, config:WarmupConfig=None, predictor:MakePredictions=None):
+        '''
+        This is the constructor for the AppWarmup class.
+        '''
+        self.app = app
+        self.config = config or WarmupConfig()
+        self.predictor = predictor or MakePredictions()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.state = 'pending'
+        self.attempts = 0
+        self.error = None
+        self.model_uri = None
+        self.step_seconds = {}
+        self.duration_seconds = None
+    
+    # Creating a property to check whether the warmup has succeeded
+    @property
+    def ready(self)->bool:
+        '''
+        This property returns True once the warmup has succeeded.
+        '''
+        return self.state == 'ready'
+    
+    # Creating a method to build the synthetic episode
+    def create_sample_data(self):
+        '''
+        This method returns the synthetic episode from the configuration as a feature
+        dataframe, built the same way as the data entered on the website.
+        '''
+        df = CreateCustomData(**self.config.sample_episode).create_dataframe()
+        df.drop(labels=['time'], axis=1, inplace=True)
+        return df
+    
+    # Creating a method to run the warmup steps once
+    def _warm_up(self):
+        '''
+        This method runs every warmup step once and records how long each step took.
+        '''
+        step_seconds = {}
+        
+        # Opening the database connection, which also applies the connection settings
+        start = time.perf_counter()
+        with self.app.app_context():
+            db.session.execute(text('SELECT 1'))
+            db.session.remove()
+        step_seconds['database'] = time.perf_counter() - start
+        
+        # Loading the model and exercising the prediction pipeline
+        start = time.perf_counter()
+        self.model_uri = self.predictor.warm_up(self.create_sample_data(), self.config.batch_rows)
+        step_seconds['predictions'] = time.perf_counter() - start
+        
+        self.step_seconds = step_seconds
+    
+    # Creating a method to run the warmup with retries
+    def run(self)->bool:
+        '''
+        This method runs the warmup, retrying failed attempts up to max_attempts times.
+        It returns True if the warmup succeeded.
+        '''
+        with self._lock:
+            self.state = 'warming'
+            start = time.perf_counter()
+            while self.attempts < self.config.max_attempts:
+                self.attempts += 1
+                try:
+                    self._warm_up()
+                    self.state = 'ready'
+                    self.error = None
+                    self.duration_seconds = time.perf_counter() - start
+                    logging.info(f"The warmup finished in {self.duration_seconds:.2f}s with model {self.model_uri}.")
+                    return True
+                except Exception as e:
+                    self.error = str(e)
+                    logging.error(f"Warmup attempt {self.attempts} of {self.config.max_attempts} failed: {e}")
+                    if self.attempts < self.config.max_attempts:
+                        time.sleep(self.config.retry_interval)
+            self.state = 'failed'
+            self.duration_seconds = time.perf_counter() - start
+            return False
+    
+    # Creating a method to start the warmup
+    def start(self):
+        '''
+        This method starts the warmup, in a background thread when the configuration asks
+        for it, so that the application can answer /healthz while it is warming up.
+        '''
+        if not self.config.background:
+            self.run()
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.run, name='app-warmup', daemon=True)
+        self._thread.start()
+    
+    # Creating a method to wait for the background warmup
+    def wait(self, timeout:float=None)->bool:
+        '''
+        This method waits for the background warmup to finish and returns whether the
+        application is ready.
+        '''
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+    
+    # Creating a method to report the warmup status
+    def status(self)->dict:
+        '''
+        This method returns the state of the warmup.
+        '''
+        return {
+            'ready': self.ready,
+            'state': self.state,
+            'attempts': self.attempts,
+            'error': self.error,
+            'model_uri': self.model_uri,
+            'duration_seconds': self.duration_seconds,
+            'step_seconds': dict(self.step_seconds)
+        }